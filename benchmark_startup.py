@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+B站音乐提取器启动性能测试
+测量主窗口模块的导入耗时和第一次绘制窗口的时间，
+并检查第一次绘制之前没有导入yt-dlp等按需加载的模块
+
+用法: python benchmark_startup.py [--runs N] [--budget 毫秒] [--history 文件]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent / 'src'
+
+# 这些模块导入较慢，只应在第一次使用时导入
+DEFERRED_MODULES = ('yt_dlp', 'numpy', 'pypinyin', 'requests')
+
+# 在子进程中运行：创建主窗口，记录第一次绘制的时间和当时已导入的模块
+FIRST_PAINT_SCRIPT = r'''
+import sys, time, json
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, QEvent
+app = QApplication(sys.argv)
+from ui.main_window import MainWindow
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            result = {
+                'first_paint_ms': (time.perf_counter() - start) * 1000,
+                'loaded': [name for name in DEFERRED if name in sys.modules],
+            }
+            print(json.dumps(result))
+            app.removeEventFilter(self)
+            app.quit()
+        return False
+
+DEFERRED = %r
+watcher = FirstPaint()
+window = MainWindow()
+app.installEventFilter(watcher)
+window.show()
+app.exec_()
+window.close()
+'''
+
+def run_python(args, env=None):
+    """在src目录中运行Python子进程，返回 (标准输出, 标准错误)"""
+    result = subprocess.run([sys.executable] + args, cwd=SRC_DIR, env=env,
+                            capture_output=True, text=True, encoding='utf-8')
+    if result.returncode != 0:
+        raise Exception(f"子进程运行失败:\n{result.stderr[-2000:]}")
+    return result.stdout, result.stderr
+
+def parse_importtime(output):
+    """解析 -X importtime 的输出，返回 {模块: (自身微秒, 累计微秒)}"""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+def measure_import():
+    """主窗口模块的导入耗时（毫秒）和最慢的顶层依赖"""
+    _, stderr = run_python(['-X', 'importtime', '-c', 'import ui.main_window'])
+    modules = parse_importtime(stderr)
+    total = modules.get('ui.main_window', (0, 0))[1] / 1000
+    # 只统计顶层包，避免同一依赖的子模块重复出现
+    packages = {}
+    for name, (_, cumulative) in modules.items():
+        top = name.split('.')[0]
+        packages[top] = max(packages.get(top, 0), cumulative)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:10]
+    return total, [(name, us / 1000) for name, us in slowest], [m for m in DEFERRED_MODULES if m in modules]
+
+def measure_first_paint():
+    """从进程启动到主窗口第一次绘制的耗时（毫秒）和当时已导入的慢模块"""
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    stdout, _ = run_python(['-c', FIRST_PAINT_SCRIPT % (DEFERRED_MODULES,)], env)
+    for line in stdout.splitlines():
+        if line.startswith('{'):
+            result = json.loads(line)
+            return result['first_paint_ms'], result['loaded']
+    raise Exception("没有检测到窗口绘制")
+
+def main():
+    parser = argparse.ArgumentParser(description="测量启动耗时")
+    parser.add_argument('--runs', type=int, default=3, help="测量次数，取最小值")
+    parser.add_argument('--budget', type=float, default=None, help="导入耗时上限（毫秒），超出时返回非零")
+    parser.add_argument('--history', default=None, help="把结果追加到JSON Lines文件，便于跟踪变化")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    import_ms, slowest, imported = min(imports, key=lambda result: result[0])
+    paints = [measure_first_paint() for _ in range(args.runs)]
+    paint_ms, loaded = min(paints, key=lambda result: result[0])
+
+    print(f"导入 ui.main_window: {import_ms:.1f} ms")
+    for name, ms in slowest:
+        print(f"    {name:<24} {ms:8.1f} ms")
+    print(f"第一次绘制: {paint_ms:.1f} ms")
+
+    failed = False
+    if imported:
+        print(f"导入主窗口时加载了应按需导入的模块: {', '.join(imported)}")
+        failed = True
+    if loaded:
+        print(f"第一次绘制前加载了应按需导入的模块: {', '.join(loaded)}")
+        failed = True
+    if args.budget is not None and import_ms > args.budget:
+        print(f"导入耗时超出上限 {args.budget:.0f} ms")
+        failed = True
+
+    if args.history:
+        record = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'import_ms': round(import_ms, 1),
+            'first_paint_ms': round(paint_ms, 1),
+            'loaded_before_paint': loaded,
+        }
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
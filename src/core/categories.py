@@ -0,0 +1,224 @@
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from core.content_index import LIBRARY_DB
+
+# 第一次使用时创建的分类：名称 -> 自动归类规则（匹配的风格标签）
+DEFAULT_CATEGORIES = (
+    ("流行", "流行, pop"),
+    ("摇滚", "摇滚, rock"),
+    ("电子", "电子, electronic, edm"),
+    ("古典", "古典, classical"),
+    ("爵士", "爵士, jazz"),
+    ("说唱", "说唱, rap, hip-hop"),
+)
+
+# 歌曲归属的来源
+MANUAL = 0      # 手动加入
+RULE = 1        # 按风格规则自动加入
+EXCLUDED = -1   # 手动移出，规则不再自动加入
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    genre_rule TEXT NOT NULL DEFAULT '',
+    position INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS category_tracks (
+    category_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    state INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (category_id, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS category_tracks_path ON category_tracks (path);
+"""
+
+TERM_SEPARATORS = re.compile(r'[,;/，；、]')
+
+def split_terms(text):
+    """把规则或风格标签拆成小写的词（"Pop; Rock" -> {"pop", "rock"}）"""
+    return {term.strip().lower() for term in TERM_SEPARATORS.split(text or '') if term.strip()}
+
+class CategoryStore:
+    """分类和歌曲归属（保存在音乐库数据库中）
+
+    归属表以 (分类, 路径) 为主键，按分类取歌曲直接走主键索引；
+    另有路径索引，删除或改名文件时不需要扫描整张表。
+    批量加入、移出和规则归类都在一个事务中完成。
+    """
+    
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or LIBRARY_DB)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'categories'"
+            ).fetchone()
+            self._conn.executescript(SCHEMA)
+            if not exists:
+                self._conn.executemany(
+                    "INSERT INTO categories (name, genre_rule, position) VALUES (?, ?, ?)",
+                    [(name, rule, position) for position, (name, rule) in enumerate(DEFAULT_CATEGORIES)]
+                )
+                
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            
+    # ---- 分类 ----
+    
+    def categories(self):
+        """所有分类：[(名称, 规则, 歌曲数)]，按添加顺序"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT c.name, c.genre_rule, "
+                "(SELECT COUNT(*) FROM category_tracks t WHERE t.category_id = c.id AND t.state >= 0) "
+                "FROM categories c ORDER BY c.position, c.id"
+            ).fetchall()
+            
+    def rule(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT genre_rule FROM categories WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else ''
+        
+    def add_category(self, name, rule=''):
+        """添加分类，同名分类已存在时抛出异常"""
+        with self._lock, self._conn:
+            try:
+                self._conn.execute(
+                    "INSERT INTO categories (name, genre_rule, position) "
+                    "VALUES (?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM categories))",
+                    (name, rule)
+                )
+            except sqlite3.IntegrityError:
+                raise Exception(f"分类已存在: {name}")
+                
+    def edit_category(self, name, new_name, rule):
+        """修改分类名称和规则；规则改变时清除旧规则加入的歌曲，返回规则是否改变"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id, genre_rule FROM categories WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                raise Exception(f"分类不存在: {name}")
+            category_id, old_rule = row
+            try:
+                self._conn.execute("UPDATE categories SET name = ?, genre_rule = ? WHERE id = ?",
+                                   (new_name, rule, category_id))
+            except sqlite3.IntegrityError:
+                raise Exception(f"分类已存在: {new_name}")
+            changed = split_terms(rule) != split_terms(old_rule)
+            if changed:
+                self._conn.execute("DELETE FROM category_tracks WHERE category_id = ? AND state = ?",
+                                   (category_id, RULE))
+        return changed
+        
+    def delete_category(self, name):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id FROM categories WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return
+            self._conn.execute("DELETE FROM category_tracks WHERE category_id = ?", row)
+            self._conn.execute("DELETE FROM categories WHERE id = ?", row)
+            
+    def _category_id(self, name):
+        row = self._conn.execute("SELECT id FROM categories WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise Exception(f"分类不存在: {name}")
+        return row[0]
+        
+    # ---- 歌曲归属 ----
+    
+    def members(self, name):
+        """分类中的歌曲路径集合（按主键索引查询）"""
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                "SELECT t.path FROM categories c JOIN category_tracks t ON t.category_id = c.id "
+                "WHERE c.name = ? AND t.state >= 0", (name,)
+            )}
+            
+    def assign(self, name, paths):
+        """把歌曲加入分类（一个事务），返回处理的歌曲数"""
+        paths = [str(p) for p in paths]
+        with self._lock, self._conn:
+            category_id = self._category_id(name)
+            self._conn.executemany(
+                "INSERT INTO category_tracks (category_id, path, state) VALUES (?, ?, ?) "
+                "ON CONFLICT(category_id, path) DO UPDATE SET state = excluded.state",
+                [(category_id, path, MANUAL) for path in paths]
+            )
+        return len(paths)
+        
+    def unassign(self, name, paths):
+        """把歌曲移出分类（一个事务）；记录为排除，规则不会再把它们加回来"""
+        paths = [str(p) for p in paths]
+        with self._lock, self._conn:
+            category_id = self._category_id(name)
+            self._conn.executemany(
+                "INSERT INTO category_tracks (category_id, path, state) VALUES (?, ?, ?) "
+                "ON CONFLICT(category_id, path) DO UPDATE SET state = excluded.state",
+                [(category_id, path, EXCLUDED) for path in paths]
+            )
+        return len(paths)
+        
+    def apply_rules(self, tracks, replace_all=False):
+        """按风格规则自动归类，返回自动加入的记录数
+
+        只改动规则加入的记录，手动加入或移出的歌曲保持不变。
+        replace_all为True时（完整扫描后）先清空所有规则记录，否则只重新计算给定的歌曲。
+        """
+        with self._lock:
+            rules = [(category_id, split_terms(rule)) for category_id, rule in
+                     self._conn.execute("SELECT id, genre_rule FROM categories WHERE genre_rule != ''")]
+        rules = [(category_id, terms) for category_id, terms in rules if terms]
+        
+        paths = []
+        rows = []
+        genre_terms = {}
+        for track in tracks:
+            paths.append((track.path, RULE))
+            # 大量歌曲的风格相同，拆分结果按原文缓存
+            terms = genre_terms.get(track.genre)
+            if terms is None:
+                terms = genre_terms[track.genre] = split_terms(track.genre)
+            if terms:
+                rows.extend((category_id, track.path, RULE)
+                            for category_id, rule_terms in rules if terms & rule_terms)
+                            
+        with self._lock, self._conn:
+            if replace_all:
+                self._conn.execute("DELETE FROM category_tracks WHERE state = ?", (RULE,))
+            else:
+                self._conn.executemany("DELETE FROM category_tracks WHERE path = ? AND state = ?", paths)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO category_tracks (category_id, path, state) VALUES (?, ?, ?)", rows
+            )
+        return len(rows)
+        
+    def remove(self, paths):
+        """文件删除后清除它的归属"""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM category_tracks WHERE path = ?", [(str(p),) for p in paths])
+            
+    def rename(self, old_path, new_path):
+        """文件改名或移动后保留归属"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM category_tracks WHERE path = ?", (str(new_path),))
+            self._conn.execute("UPDATE category_tracks SET path = ? WHERE path = ?",
+                               (str(new_path), str(old_path)))
+
+_default_store = None
+_default_lock = threading.Lock()
+
+def default_category_store():
+    """进程内共享的分类存储"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = CategoryStore()
+        return _default_store
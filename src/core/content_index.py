@@ -0,0 +1,326 @@
+import os
+import mmap
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QThread, pyqtSignal
+
+LIBRARY_DB = Path.home() / '.bilibili_music_extractor' / 'library.db'
+
+# 部分哈希读取文件开头和结尾各64KB（标签和音频数据的差异通常在两端）
+PARTIAL_BLOCK_SIZE = 64 * 1024
+HASH_BUFFER_SIZE = 1024 * 1024
+HASH_WORKERS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    partial_hash TEXT,
+    full_hash TEXT,
+    verified REAL,
+    problem TEXT,
+    checked REAL
+);
+CREATE INDEX IF NOT EXISTS content_size ON content (size);
+CREATE INDEX IF NOT EXISTS content_full_hash ON content (full_hash);
+CREATE TABLE IF NOT EXISTS transcodes (
+    source TEXT NOT NULL,
+    output TEXT NOT NULL,
+    preset TEXT NOT NULL,
+    source_size INTEGER NOT NULL,
+    source_mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (source, output)
+);
+"""
+
+# 旧版数据库缺少的列
+MIGRATIONS = (
+    ('problem', "ALTER TABLE content ADD COLUMN problem TEXT"),
+    ('checked', "ALTER TABLE content ADD COLUMN checked REAL"),
+)
+
+def new_hash():
+    return hashlib.blake2b(digest_size=16)
+
+def partial_hash(path, size=None):
+    """文件开头和结尾的哈希（小文件直接计算完整哈希）"""
+    if size is None:
+        size = os.path.getsize(path)
+    if size <= PARTIAL_BLOCK_SIZE * 2:
+        return full_hash(path)
+    digest = new_hash()
+    with open(path, 'rb') as f:
+        digest.update(f.read(PARTIAL_BLOCK_SIZE))
+        f.seek(-PARTIAL_BLOCK_SIZE, os.SEEK_END)
+        digest.update(f.read(PARTIAL_BLOCK_SIZE))
+    return digest.hexdigest()
+
+def full_hash(path):
+    """完整文件的哈希：内存映射后分块计算，映射失败时退回大缓冲区读取"""
+    digest = new_hash()
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # 空文件或不支持映射的文件系统
+            for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+                digest.update(chunk)
+            return digest.hexdigest()
+        with mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(view), HASH_BUFFER_SIZE):
+                    digest.update(view[offset:offset + HASH_BUFFER_SIZE])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+class ContentIndex:
+    """文件内容哈希索引（SQLite）
+
+    按大小分组，只有大小相同的文件才计算部分哈希，部分哈希也相同时才读取整个文件，
+    所以大多数文件从不需要完整读取。大小或修改时间变化后旧哈希作废。
+    完整哈希同时作为之后校验文件是否损坏的依据。
+    """
+    
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or LIBRARY_DB)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(content)")}
+        for column, statement in MIGRATIONS:
+            if column not in columns:
+                self._conn.execute(statement)
+        self._lock = threading.Lock()
+        
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            
+    def update(self, paths):
+        """按当前的大小和修改时间同步记录，内容可能变化的文件清除哈希；返回仍存在的路径"""
+        existing = []
+        rows = []
+        for path in paths:
+            path = str(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            existing.append(path)
+            rows.append((path, st.st_size, st.st_mtime_ns))
+            
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO content (path, size, mtime_ns) VALUES (?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                "partial_hash = NULL, full_hash = NULL, verified = NULL, problem = NULL, checked = NULL "
+                "WHERE size != excluded.size OR mtime_ns != excluded.mtime_ns",
+                rows
+            )
+        return existing
+        
+    def remove(self, paths):
+        """删除记录"""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM content WHERE path = ?", [(str(p),) for p in paths])
+            
+    def rename(self, old_path, new_path):
+        """文件改名或移动后保留哈希"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM content WHERE path = ?", (str(new_path),))
+            self._conn.execute("UPDATE content SET path = ? WHERE path = ?", (str(new_path), str(old_path)))
+            
+    def get(self, path):
+        """返回 (大小, 修改时间, 部分哈希, 完整哈希, 校验时间)，没有记录时返回None"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT size, mtime_ns, partial_hash, full_hash, verified FROM content WHERE path = ?",
+                (str(path),)
+            ).fetchone()
+            
+    def record_hashes(self, rows):
+        """直接写入已知的哈希：(路径, 大小, 修改时间, 部分哈希, 完整哈希)，哈希可以为None"""
+        if not rows:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO content (path, size, mtime_ns, partial_hash, full_hash, verified) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [row + ((now if row[4] else None),) for row in rows]
+            )
+            
+    def unchecked(self, paths):
+        """还没有检查过完整性的文件（新增或修改过）"""
+        with self._lock:
+            checked = {path for path, in self._conn.execute(
+                "SELECT path FROM content WHERE checked IS NOT NULL")}
+        return [str(p) for p in paths if str(p) not in checked]
+        
+    def record_checks(self, results):
+        """记录完整性检查结果：(路径, 问题描述或None)"""
+        if not results:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE content SET problem = ?, checked = ? WHERE path = ?",
+                [(problem, now, path) for path, problem in results]
+            )
+            
+    def problems(self, paths=None):
+        """检查发现问题的文件，返回 路径 -> 问题描述"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, problem FROM content WHERE problem IS NOT NULL").fetchall()
+        if paths is None:
+            return dict(rows)
+        wanted = {str(p) for p in paths}
+        return {path: problem for path, problem in rows if path in wanted}
+        
+    def transcoded(self, pairs, preset):
+        """已经转换过的输出文件：记录的预设和源文件大小、修改时间都一致，并且输出文件仍然存在"""
+        with self._lock:
+            records = {(source, output): (record_preset, size, mtime_ns)
+                       for source, output, record_preset, size, mtime_ns in self._conn.execute(
+                           "SELECT source, output, preset, source_size, source_mtime_ns FROM transcodes")}
+        done = set()
+        for source, output in pairs:
+            record = records.get((str(source), str(output)))
+            if record is None or record[0] != preset:
+                continue
+            try:
+                st = os.stat(source)
+            except OSError:
+                continue
+            if record[1:] == (st.st_size, st.st_mtime_ns) and os.path.exists(output):
+                done.add(str(output))
+        return done
+        
+    def record_transcode(self, source, output, preset):
+        """记录转换完成的文件"""
+        st = os.stat(source)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcodes VALUES (?, ?, ?, ?, ?)",
+                (str(source), str(output), preset, st.st_size, st.st_mtime_ns)
+            )
+            
+    def find_duplicates(self, paths=None, progress=None, should_stop=None):
+        """查找内容完全相同的文件，返回路径分组（每组至少两个文件）"""
+        with self._lock:
+            if paths is None:
+                rows = self._conn.execute(
+                    "SELECT path, size, partial_hash, full_hash FROM content WHERE size > 0 AND size IN "
+                    "(SELECT size FROM content GROUP BY size HAVING COUNT(*) > 1)"
+                ).fetchall()
+            else:
+                wanted = {str(p) for p in paths}
+                by_size = {}
+                for row in self._conn.execute("SELECT path, size, partial_hash, full_hash FROM content"):
+                    # 空文件不算重复（交给完整性检查）
+                    if row[1] > 0 and row[0] in wanted:
+                        by_size.setdefault(row[1], []).append(row)
+                rows = [row for group in by_size.values() if len(group) > 1 for row in group]
+                
+        # 第一步：大小相同的文件计算部分哈希
+        need_partial = [path for path, _, partial, _ in rows if partial is None]
+        partials = self._hash_all(need_partial, partial_hash, 'partial_hash', progress, should_stop)
+        candidates = {}
+        for path, size, partial, full in rows:
+            partial = partials.get(path, partial)
+            if partial is not None:
+                candidates.setdefault((size, partial), []).append((path, full))
+                
+        # 第二步：部分哈希也相同的文件计算完整哈希
+        rows = [row for group in candidates.values() if len(group) > 1 for row in group]
+        need_full = [path for path, full in rows if full is None]
+        fulls = self._hash_all(need_full, full_hash, 'full_hash', progress, should_stop)
+        groups = {}
+        for path, full in rows:
+            full = fulls.get(path, full)
+            if full is not None:
+                groups.setdefault(full, []).append(path)
+        return sorted(sorted(group) for group in groups.values() if len(group) > 1)
+        
+    def _hash_all(self, paths, hash_func, column, progress=None, should_stop=None):
+        """在线程池中计算哈希并写回数据库，返回 路径 -> 哈希"""
+        results = {}
+        if not paths:
+            return results
+            
+        def run(path):
+            if should_stop is not None and should_stop():
+                return None
+            try:
+                return hash_func(path)
+            except OSError as e:
+                logging.warning(f"计算文件哈希失败 {path}: {e}")
+                return None
+                
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+            for done, (path, digest) in enumerate(zip(paths, executor.map(run, paths)), 1):
+                if digest is not None:
+                    results[path] = digest
+                if progress:
+                    progress(done, len(paths))
+                    
+        now = time.time()
+        with self._lock, self._conn:
+            if column == 'full_hash':
+                self._conn.executemany(
+                    "UPDATE content SET full_hash = ?, verified = ? WHERE path = ?",
+                    [(digest, now, path) for path, digest in results.items()]
+                )
+            else:
+                self._conn.executemany(
+                    "UPDATE content SET partial_hash = ? WHERE path = ?",
+                    [(digest, path) for path, digest in results.items()]
+                )
+        return results
+
+class ExactDuplicateThread(QThread):
+    """查找内容完全相同的文件"""
+    progress = pyqtSignal(int, int)
+    finished_scan = pyqtSignal(list)  # 重复分组
+    error = pyqtSignal(str)
+    
+    def __init__(self, index, paths, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.paths = [str(p) for p in paths]
+        self._is_running = True
+        
+    def stop(self):
+        self._is_running = False
+        
+    def run(self):
+        try:
+            paths = self.index.update(self.paths)
+            groups = self.index.find_duplicates(paths, self.progress.emit, lambda: not self._is_running)
+            if self._is_running:
+                self.finished_scan.emit(groups)
+        except Exception as e:
+            logging.error(f"查找相同文件失败: {e}")
+            self.error.emit(str(e))
+
+_default_index = None
+_default_lock = threading.Lock()
+
+def default_content_index():
+    """进程内共享的内容哈希索引"""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = ContentIndex()
+        return _default_index
@@ -0,0 +1,284 @@
+import os
+import mmap
+import struct
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from core.metadata import read_cover
+
+COVER_DIR = Path.home() / '.bilibili_music_extractor' / 'covers'
+
+# 缩略图边长（列表行高24像素，按2倍存储以适应高分屏）
+THUMBNAIL_SIZE = 40
+THUMBNAIL_FORMAT = QImage.Format_ARGB32_Premultiplied
+
+# 缓存文件：魔数 + 宽 + 高，后面是未压缩的像素，读取时直接内存映射
+HEADER = struct.Struct('<4sHH')
+MAGIC = b'BMC1'
+
+def scale_cover(data):
+    """把封面图片缩小为缩略图，无法解码时返回None"""
+    image = QImage.fromData(data)
+    if image.isNull():
+        return None
+    image = image.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image.convertToFormat(THUMBNAIL_FORMAT)
+
+class CoverCache:
+    """磁盘缩略图缓存
+
+    每首歌一个文件，保存缩小后的原始像素，读取时内存映射后直接构造QImage，
+    不需要解码。总大小超过上限时按最近使用时间淘汰。
+    """
+    
+    def __init__(self, cache_dir=None, max_bytes=64 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir or COVER_DIR)
+        self.max_bytes = max_bytes
+        self._entries = None      # 文件名 -> 大小，按使用时间排序
+        self._total = 0
+        self._lock = threading.Lock()
+        
+    def get(self, path):
+        """读取缩略图，没有缓存时返回None"""
+        cache_file = self._cache_file(path)
+        try:
+            with open(cache_file, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, width, height = HEADER.unpack_from(mapped)
+                if magic != MAGIC or len(mapped) != HEADER.size + width * height * 4:
+                    raise ValueError("缓存文件损坏")
+                # 直接在映射的内存上构造，复制一份后即可关闭映射
+                pixels = memoryview(mapped)[HEADER.size:]
+                try:
+                    image = QImage(pixels, width, height, width * 4, THUMBNAIL_FORMAT).copy()
+                finally:
+                    pixels.release()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            logging.warning(f"读取封面缓存失败 {cache_file}: {e}")
+            self._discard(cache_file)
+            return None
+            
+        self._touch(cache_file)
+        return image
+        
+    def put(self, path, data):
+        """缩小封面图片并写入缓存，返回缩略图（无法解码时返回None）"""
+        image = scale_cover(data)
+        if image is None:
+            return None
+            
+        cache_file = self._cache_file(path)
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        payload = HEADER.pack(MAGIC, image.width(), image.height()) + bytes(bits)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            temp_file = cache_file.with_suffix('.tmp')
+            with open(temp_file, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            logging.warning(f"写入封面缓存失败 {cache_file}: {e}")
+            return image
+            
+        with self._lock:
+            entries = self._load_entries()
+            self._total -= entries.pop(cache_file.name, 0)
+            entries[cache_file.name] = len(payload)
+            self._total += len(payload)
+            self._evict()
+        return image
+        
+    def remove(self, path):
+        """删除某首歌的缓存"""
+        self._discard(self._cache_file(path))
+        
+    def rename(self, old_path, new_path):
+        """歌曲改名后迁移缓存"""
+        old_file = self._cache_file(old_path)
+        new_file = self._cache_file(new_path)
+        try:
+            os.replace(old_file, new_file)
+        except OSError:
+            return
+        with self._lock:
+            entries = self._load_entries()
+            size = entries.pop(old_file.name, 0)
+            self._total -= entries.pop(new_file.name, 0)
+            entries[new_file.name] = size
+            
+    def _cache_file(self, path):
+        digest = hashlib.sha1(str(path).encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{digest}.thumb"
+        
+    def _touch(self, cache_file):
+        """标记为最近使用"""
+        with self._lock:
+            entries = self._load_entries()
+            if cache_file.name in entries:
+                entries.move_to_end(cache_file.name)
+        try:
+            os.utime(cache_file)
+        except OSError:
+            pass
+            
+    def _discard(self, cache_file):
+        try:
+            cache_file.unlink()
+        except OSError:
+            pass
+        with self._lock:
+            if self._entries is not None:
+                self._total -= self._entries.pop(cache_file.name, 0)
+                
+    def _load_entries(self):
+        """第一次使用时按修改时间恢复LRU顺序（调用者持有锁）"""
+        if self._entries is None:
+            files = []
+            try:
+                with os.scandir(self.cache_dir) as it:
+                    for entry in it:
+                        if entry.name.endswith('.thumb'):
+                            st = entry.stat()
+                            files.append((st.st_mtime, entry.name, st.st_size))
+            except OSError:
+                pass
+            files.sort()
+            self._entries = OrderedDict((name, size) for _, name, size in files)
+            self._total = sum(self._entries.values())
+        return self._entries
+        
+    def _evict(self):
+        """超过容量时删除最久未用的缩略图（调用者持有锁）"""
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                (self.cache_dir / name).unlink()
+            except OSError:
+                pass
+
+class CoverFetcher:
+    """封面下载：共享连接池，在线程池中并发获取"""
+    MAX_WORKERS = 4
+    
+    def __init__(self, session=None):
+        # requests导入较慢，只在真正需要下载封面时加载
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.MAX_WORKERS, pool_maxsize=self.MAX_WORKERS)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+        self._futures = {}
+        self._lock = threading.RLock()  # 已完成的Future会在add_done_callback中立即回调
+        
+    def fetch(self, url):
+        """下载封面图片，返回 (数据, MIME类型)，失败返回None"""
+        if not url:
+            return None
+        try:
+            response = self.session.get(url, timeout=10)
+            response.raise_for_status()
+        except Exception as e:
+            logging.warning(f"下载封面失败 {url}: {e}")
+            return None
+        mime = response.headers.get('Content-Type', 'image/jpeg').split(';')[0]
+        if not mime.startswith('image/'):
+            return None
+        return response.content, mime
+        
+    def prefetch(self, url):
+        """在后台开始下载，返回Future（同一链接正在下载时共用）"""
+        with self._lock:
+            future = self._futures.get(url)
+            if future is None:
+                future = self._executor.submit(self.fetch, url)
+                self._futures[url] = future
+                future.add_done_callback(lambda _: self._forget(url))
+            return future
+            
+    def fetch_many(self, urls):
+        """并发下载多张封面，返回 链接 -> 结果"""
+        futures = {url: self.prefetch(url) for url in set(urls) if url}
+        return {url: future.result() for url, future in futures.items()}
+        
+    def _forget(self, url):
+        with self._lock:
+            self._futures.pop(url, None)
+
+class ThumbnailLoader(QThread):
+    """后台加载缩略图
+
+    列表只为可见行请求缩略图，后请求的先处理（滚动时优先显示当前位置），
+    积压过多时丢弃最早的请求。先查磁盘缓存，没有时从文件内嵌封面生成。
+    """
+    loaded = pyqtSignal(str, QImage)  # 路径, 缩略图（没有封面时为空图片）
+    
+    MAX_QUEUE = 200
+    
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._queue = deque()
+        self._queued = set()
+        self._condition = threading.Condition()
+        self._is_running = True
+        
+    def request(self, path):
+        """请求加载缩略图"""
+        with self._condition:
+            if path in self._queued:
+                return
+            self._queue.append(path)
+            self._queued.add(path)
+            if len(self._queue) > self.MAX_QUEUE:
+                self._queued.discard(self._queue.popleft())
+            self._condition.notify()
+            
+    def stop(self):
+        with self._condition:
+            self._is_running = False
+            self._condition.notify()
+            
+    def run(self):
+        while True:
+            with self._condition:
+                while self._is_running and not self._queue:
+                    self._condition.wait()
+                if not self._is_running:
+                    return
+                path = self._queue.pop()
+                self._queued.discard(path)
+                
+            image = self.cache.get(path)
+            if image is None:
+                try:
+                    data = read_cover(path)
+                except Exception as e:
+                    logging.warning(f"读取封面失败 {path}: {e}")
+                    data = None
+                image = self.cache.put(path, data) if data else None
+            self.loaded.emit(path, image if image is not None else QImage())
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def default_cover_cache():
+    """进程内共享的缩略图缓存"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = CoverCache()
+        return _default_cache
@@ -0,0 +1,551 @@
+import os
+import logging
+import itertools
+from collections import Counter
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from core.download_scheduler import get_policy, DEFAULT_POLICY
+
+# 下载任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+PAUSED = 'paused'
+FINISHED = 'finished'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+STATE_NAMES = {
+    QUEUED: "等待中",
+    RUNNING: "下载中",
+    PAUSED: "已暂停",
+    FINISHED: "完成",
+    FAILED: "失败",
+    CANCELLED: "已取消",
+}
+
+# 各状态可用的操作（界面按这个顺序显示按钮）
+ACTIONS = {
+    QUEUED: ('pause', 'cancel'),
+    RUNNING: ('pause', 'cancel'),
+    PAUSED: ('resume', 'cancel'),
+    FINISHED: (),
+    FAILED: ('retry',),
+    CANCELLED: ('retry',),
+}
+
+# 用户设置的优先级（按优先级调度时使用）
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -1
+
+PRIORITY_NAMES = {
+    PRIORITY_HIGH: "高",
+    PRIORITY_NORMAL: "普通",
+    PRIORITY_LOW: "低",
+}
+
+class DownloadJob:
+    """下载队列中的一项（只在界面线程中读写）
+
+    批量下载时队列中可能有上千个任务，使用__slots__减少内存。
+    """
+    __slots__ = ('id', 'url', 'download_path', 'title', 'state', 'progress',
+                 'message', 'file_path', 'partial_path', 'error', 'attempts',
+                 'duration', 'uploader', 'priority', 'pinned', 'position', 'thread')
+                 
+    _ids = itertools.count(1)
+    
+    def __init__(self, url, download_path):
+        self.id = next(self._ids)
+        self.url = url
+        self.download_path = str(download_path)
+        self.title = ""         # 解析到视频信息后填写
+        self.state = QUEUED
+        self.progress = 0
+        self.message = ""       # 下载线程汇报的状态文字
+        self.file_path = None
+        self.partial_path = None  # 下载中的.part文件，继续下载时yt-dlp从这里接着下载
+        self.error = None
+        self.attempts = 0
+        self.duration = None    # 视频时长（秒），解析到视频信息后填写
+        self.uploader = None
+        self.priority = PRIORITY_NORMAL
+        self.pinned = False     # 置顶的任务不论调度策略总是最先开始
+        self.position = 0       # 队列中的手动顺序，加入时由队列分配
+        self.thread = None
+        
+    @property
+    def display_title(self):
+        return self.title or self.url
+        
+    @property
+    def display_state(self):
+        if self.state == RUNNING and self.message:
+            return self.message
+        if self.state == FAILED and self.error:
+            return f"失败: {self.error}"
+        return STATE_NAMES[self.state]
+        
+    @property
+    def active(self):
+        """还没有结束（等待、下载中或暂停）"""
+        return self.state in (QUEUED, RUNNING, PAUSED)
+        
+    def can_pause(self):
+        return self.state in (QUEUED, RUNNING)
+        
+    def can_resume(self):
+        return self.state == PAUSED
+        
+    def can_cancel(self):
+        return self.active
+        
+    def can_retry(self):
+        return self.state in (FAILED, CANCELLED)
+        
+    def actions(self):
+        return ACTIONS[self.state]
+        
+    def apply_info(self, info):
+        """记录解析到的视频信息（extract_video_info的结果）"""
+        self.title = info.get('title') or self.title
+        self.duration = info.get('duration_seconds') or self.duration
+        self.uploader = info.get('uploader') or self.uploader
+        
+    def __repr__(self):
+        return f"DownloadJob({self.id}, {self.url}, {self.state})"
+
+class DownloadQueue(QObject):
+    """下载队列：每个任务由一个下载线程执行，同时下载的数量有上限
+
+    下载线程的进度和状态只写入任务对象，变化的任务每隔UPDATE_INTERVAL_MS
+    合并成一次jobs_updated通知，界面不会被每个数据块的进度回调淹没。
+    完成的任务在同一次通知后移出队列，只累计到完成计数中，
+    队列的内存和界面的刷新量取决于未完成的任务数，与下载历史无关。
+    暂停即停止下载线程，继续时重新开始，yt-dlp会接着未完成的.part文件下载。
+    线程工厂thread_factory(job)返回尚未启动的下载线程，
+    队列本身不导入下载模块，创建队列不会拖慢启动。
+    指定store（DownloadStore）时任务先保存再下载，变化随合并更新一起保存，
+    restore()在重新启动后恢复上次未完成的任务。
+    等待中的任务按调度策略（core.download_scheduler）决定开始的顺序，
+    策略需要时长或UP主时，由resolver_factory(urls)创建的解析线程提前分批解析，
+    还没解析到的任务先不开始；一批解析完（或超过RESOLVE_GRACE_MS）之前
+    未置顶的任务都不开始，最先解析到的长视频不会抢在同一批的短视频前面。
+    """
+    jobs_added = pyqtSignal(list)        # 新加入的DownloadJob
+    jobs_updated = pyqtSignal(list)      # 状态或进度变化的DownloadJob
+    jobs_removed = pyqtSignal(list)      # 从队列中移除的DownloadJob
+    jobs_reordered = pyqtSignal()        # 手动调整了队列顺序（jobs按新顺序排列）
+    job_finished = pyqtSignal(object)    # 下载完成的DownloadJob
+    
+    MAX_CONCURRENT = 2
+    UPDATE_INTERVAL_MS = 100
+    RESOLVE_BATCH = 20      # 解析线程每次解析的链接数
+    RESOLVE_GRACE_MS = 3000  # 最多等一批解析这么久，之后按已解析到的任务调度
+    
+    def __init__(self, thread_factory, store=None, resolver_factory=None, parent=None):
+        super().__init__(parent)
+        self.thread_factory = thread_factory
+        self.store = store
+        self.resolver_factory = resolver_factory
+        self.policy = get_policy(DEFAULT_POLICY)
+        self.jobs = []              # 按手动顺序（position）排列
+        self.finished_count = 0     # 已完成并移出队列的任务数
+        self._dirty = {}            # 任务id -> 任务（dict保持顺序）
+        self._collapsed = []        # 下次合并更新时移出队列的已完成任务
+        self._stopping = set()      # 已要求停止、还没有退出的下载线程
+        self._resolver = None       # 正在运行的视频信息解析线程
+        self._resolving = {}        # 链接 -> 等待解析结果的任务
+        self._resolved_ids = set()  # 已解析过（成功或失败）的任务id，不再重复解析
+        self._served = Counter()    # 各UP主已开始下载的任务数（队列空闲时清零），按UP主轮流时使用
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(self.UPDATE_INTERVAL_MS)
+        self._update_timer.timeout.connect(self.flush_updates)
+        self._grace_timer = QTimer(self)
+        self._grace_timer.setSingleShot(True)
+        self._grace_timer.setInterval(self.RESOLVE_GRACE_MS)
+        self._grace_timer.timeout.connect(self.schedule)
+        
+    # ---- 队列操作 ----
+    
+    def add(self, url, download_path):
+        """把链接加入队列，返回DownloadJob"""
+        return self.add_many([url], download_path)[0]
+        
+    def add_many(self, urls, download_path):
+        """批量加入队列（一次插入通知），返回DownloadJob列表"""
+        jobs = [DownloadJob(url, download_path) for url in urls]
+        position = self.jobs[-1].position if self.jobs else 0
+        for job in jobs:
+            position += 1
+            job.position = position
+        if jobs:
+            if self.store is not None:
+                self.store.add(jobs)
+            self.jobs.extend(jobs)
+            self.jobs_added.emit(jobs)
+            self.schedule()
+        return jobs
+        
+    def restore(self):
+        """恢复上次保存的队列，返回恢复的任务数
+
+        上次关闭或崩溃时正在下载的任务重新排队，yt-dlp会从保存的.part文件接着下载；
+        已完成的任务只恢复计数，不会重新解析。
+        """
+        if self.store is None:
+            return 0
+        jobs, self.finished_count = self.store.load()
+        for job in jobs:
+            if job.state == RUNNING:
+                job.state = QUEUED
+        if jobs:
+            self.jobs.extend(jobs)
+            self.jobs_added.emit(jobs)
+            self.schedule()
+        self._changed(None)
+        logging.info(f"恢复下载队列: {len(jobs)} 个任务")
+        return len(jobs)
+        
+    def pause(self, jobs):
+        for job in jobs:
+            if job.can_pause():
+                self._stop_thread(job)
+                job.state = PAUSED
+                self._changed(job)
+        self.schedule()
+        
+    def resume(self, jobs):
+        for job in jobs:
+            if job.can_resume():
+                job.state = QUEUED
+                self._changed(job)
+        self.schedule()
+        
+    def cancel(self, jobs):
+        for job in jobs:
+            if job.can_cancel():
+                running = job.thread is not None
+                self._stop_thread(job)
+                job.state = CANCELLED
+                if not running:
+                    # 正在下载的任务等线程退出后再删除未完成的文件
+                    self._discard_partial(job)
+                self._changed(job)
+        self.schedule()
+        
+    def retry(self, jobs):
+        for job in jobs:
+            if job.can_retry():
+                job.state = QUEUED
+                job.progress = 0
+                job.message = ""
+                job.error = None
+                self._changed(job)
+        self.schedule()
+        
+    def move(self, jobs, where):
+        """调整任务在队列中的顺序，where为'top'、'up'、'down'或'bottom'"""
+        selected = set(jobs)
+        order = list(self.jobs)
+        if where == 'top':
+            order = [job for job in order if job in selected] + [job for job in order if job not in selected]
+        elif where == 'bottom':
+            order = [job for job in order if job not in selected] + [job for job in order if job in selected]
+        elif where == 'up':
+            for i in range(1, len(order)):
+                if order[i] in selected and order[i - 1] not in selected:
+                    order[i - 1], order[i] = order[i], order[i - 1]
+        elif where == 'down':
+            for i in range(len(order) - 2, -1, -1):
+                if order[i] in selected and order[i + 1] not in selected:
+                    order[i], order[i + 1] = order[i + 1], order[i]
+        else:
+            raise Exception(f"未知的移动方式: {where}")
+            
+        for position, job in enumerate(order, 1):
+            if job.position != position:
+                job.position = position
+                self._changed(job)
+        self.jobs = order
+        self.jobs_reordered.emit()
+        self.schedule()
+        
+    def pin(self, jobs, pinned=True):
+        """置顶或取消置顶"""
+        for job in jobs:
+            if job.pinned != pinned:
+                job.pinned = pinned
+                self._changed(job)
+        self.schedule()
+        
+    def set_priority(self, jobs, priority):
+        for job in jobs:
+            if job.priority != priority:
+                job.priority = priority
+                self._changed(job)
+        self.schedule()
+        
+    def set_policy(self, name):
+        """切换调度策略（只影响之后开始的任务，正在下载的不会被打断）"""
+        self.policy = get_policy(name)
+        logging.info(f"下载调度策略: {self.policy.label}")
+        self.schedule()
+        
+    def remove_finished(self):
+        """移除已取消的任务并清零完成计数，返回清除的数量"""
+        removed = [job for job in self.jobs if job.state == CANCELLED and job.thread is None]
+        self._remove(removed)
+        if self.store is not None:
+            self.store.remove_finished()
+        count = len(removed) + self.finished_count
+        self.finished_count = 0
+        self._changed(None)
+        return count
+        
+    def _remove(self, removed):
+        if removed:
+            gone = set(removed)
+            self.jobs = [job for job in self.jobs if job not in gone]
+            for job in removed:
+                self._dirty.pop(job.id, None)
+            self.jobs_removed.emit(removed)
+            
+    def counts(self):
+        """各状态的任务数（完成数包括已移出队列的任务）"""
+        counts = dict.fromkeys(STATE_NAMES, 0)
+        for job in self.jobs:
+            counts[job.state] += 1
+        counts[FINISHED] += self.finished_count
+        return counts
+        
+    def overall_progress(self):
+        """未结束任务的平均进度，没有时返回None"""
+        active = [job.progress for job in self.jobs if job.active]
+        if not active:
+            return None
+        return sum(active) // len(active)
+        
+    def stop_all(self, timeout=1000):
+        """关闭程序时停止所有下载线程"""
+        for job in self.jobs:
+            if job.state == RUNNING:
+                self._stop_thread(job)
+        if self._resolver is not None:
+            self._resolver.stop()
+            self._resolver.wait(timeout)
+        for thread in list(self._stopping):
+            thread.wait(timeout)
+        # 保存最后的进度，下次启动时从这里继续
+        self.flush_updates()
+        
+    # ---- 调度 ----
+    
+    def running_count(self):
+        # 已要求停止但还没退出的线程仍占用名额，避免同一文件被两个线程同时写入
+        return sum(1 for job in self.jobs if job.state == RUNNING) + len(self._stopping)
+        
+    def schedule(self):
+        """按调度策略启动等待中的任务，直到达到同时下载数上限"""
+        queued = [job for job in self.jobs if job.state == QUEUED and job.thread is None]
+        if not queued and not self.running_count():
+            self._served.clear()
+        # 在_resolve开始下一批之前判断：上一批刚解析完时应该开始任务
+        holding = self._holding()
+        waiting = self._resolve(queued)
+        free = self.MAX_CONCURRENT - self.running_count()
+        if free <= 0 or not queued:
+            return
+        if holding:
+            queued = [job for job in queued if job.pinned]
+        elif waiting:
+            queued = [job for job in queued if job.pinned or job.id not in waiting]
+        for job in self.policy.select(queued, self._served, free):
+            self._start(job)
+            
+    # ---- 提前解析视频信息 ----
+    
+    def _holding(self):
+        """是否在等待当前一批解析完成（只有置顶的任务可以开始）"""
+        return self.policy.needs_info and self._resolver is not None and self._grace_timer.isActive()
+        
+    def _resolve(self, queued):
+        """策略需要的信息还不知道的任务交给解析线程，返回正在等待解析的任务id"""
+        if not self.policy.needs_info or self.resolver_factory is None:
+            return set()
+        unknown = [job for job in queued
+                   if job.id not in self._resolved_ids and not self.policy.known(job)]
+        if unknown and self._resolver is None:
+            self._start_resolver(unknown[:self.RESOLVE_BATCH])
+        if self._resolver is None:
+            # 解析线程无法创建时不再等待，按已知的信息调度
+            return set()
+        return {job.id for job in unknown}
+        
+    def _start_resolver(self, jobs):
+        self._resolving = {}
+        for job in jobs:
+            self._resolving.setdefault(job.url, []).append(job)
+        try:
+            resolver = self.resolver_factory(list(self._resolving))
+        except Exception as e:
+            logging.error(f"创建视频信息解析任务失败: {e}")
+            self._resolved_ids.update(job.id for job in jobs)
+            self._resolving = {}
+            return
+        self._resolver = resolver
+        self._grace_timer.start()
+        resolver.resolved.connect(self.on_resolved)
+        resolver.failed.connect(self.on_resolve_failed)
+        resolver.finished.connect(lambda: self.on_resolver_done(resolver))
+        resolver.start()
+        
+    def on_resolved(self, url, info):
+        for job in self._resolving.pop(url, []):
+            self._resolved_ids.add(job.id)
+            job.apply_info(info)
+            self._changed(job)
+        self.schedule()
+        
+    def on_resolve_failed(self, url, message):
+        logging.warning(f"解析视频信息失败 {url}: {message}")
+        for job in self._resolving.pop(url, []):
+            self._resolved_ids.add(job.id)
+        self.schedule()
+        
+    def on_resolver_done(self, resolver):
+        """解析线程退出：有剩下的任务时开始下一批"""
+        if resolver is not self._resolver:
+            return
+        self._resolver = None
+        self._resolving = {}
+        resolver.wait()
+        resolver.deleteLater()
+        self.schedule()
+        
+    def _start(self, job):
+        try:
+            thread = self.thread_factory(job)
+        except Exception as e:
+            logging.error(f"创建下载任务失败 {job.url}: {e}")
+            job.state = FAILED
+            job.error = str(e)
+            self._changed(job)
+            return
+        job.thread = thread
+        job.state = RUNNING
+        job.attempts += 1
+        job.message = ""
+        self._served[job.uploader or ''] += 1
+        thread.video_info.connect(lambda _, info: self.on_video_info(job, thread, info))
+        thread.progress.connect(lambda _, percent: self.on_progress(job, thread, percent))
+        thread.partial_file.connect(lambda _, path: self.on_partial_file(job, thread, path))
+        thread.status.connect(lambda _, message: self.on_status(job, thread, message))
+        thread.finished.connect(lambda _, path: self.on_finished(job, thread, path))
+        thread.error.connect(lambda _, message: self.on_error(job, thread, message))
+        thread.done.connect(lambda _: self.on_thread_done(job, thread))
+        self._changed(job)
+        thread.start()
+        
+    def _stop_thread(self, job):
+        thread = job.thread
+        if thread is not None:
+            job.thread = None
+            self._stopping.add(thread)
+            thread.stop()
+            
+    # ---- 下载线程的信号（界面线程中执行） ----
+    
+    def _current(self, job, thread):
+        """信号是否来自任务当前的下载线程（暂停、取消后旧线程的信号忽略）"""
+        return job.state == RUNNING and job.thread is thread
+        
+    def on_video_info(self, job, thread, info):
+        if self._current(job, thread):
+            job.apply_info(info)
+            self._resolved_ids.add(job.id)
+            self._changed(job)
+            
+    def on_progress(self, job, thread, percent):
+        if self._current(job, thread) and percent != job.progress:
+            job.progress = percent
+            self._changed(job)
+            
+    def on_partial_file(self, job, thread, path):
+        if self._current(job, thread) and path != job.partial_path:
+            job.partial_path = path
+            self._changed(job)
+            
+    def on_status(self, job, thread, message):
+        if self._current(job, thread) and message != job.message:
+            job.message = message
+            self._changed(job)
+            
+    def on_finished(self, job, thread, path):
+        if self._current(job, thread):
+            job.state = FINISHED
+            job.progress = 100
+            job.file_path = path
+            job.partial_path = None
+            self.finished_count += 1
+            self._collapsed.append(job)
+            self._changed(job)
+            self.job_finished.emit(job)
+            
+    def on_error(self, job, thread, message):
+        if self._current(job, thread):
+            logging.warning(f"下载失败 {job.url}: {message}")
+            job.state = FAILED
+            job.error = message
+            self._changed(job)
+            
+    def on_thread_done(self, job, thread):
+        """下载线程退出：释放名额，启动下一个任务"""
+        self._stopping.discard(thread)
+        if job.state == CANCELLED and job.thread is None:
+            self._discard_partial(job)
+        if job.thread is thread:
+            job.thread = None
+            if job.state == RUNNING:
+                # 被停止的线程可能不发出结果
+                job.state = FAILED
+                job.error = job.error or "下载意外中止"
+                self._changed(job)
+        # done在run()的最后发出，这里等待线程真正退出后再释放
+        thread.wait()
+        thread.deleteLater()
+        self.schedule()
+        
+    def _discard_partial(self, job):
+        """删除已取消任务的未完成文件"""
+        if job.partial_path:
+            try:
+                os.remove(job.partial_path)
+            except OSError:
+                pass
+            job.partial_path = None
+            self._changed(job)
+            
+    # ---- 合并更新 ----
+    
+    def _changed(self, job):
+        """登记变化的任务（job为None时只刷新计数）"""
+        if job is not None:
+            self._dirty[job.id] = job
+        if not self._update_timer.isActive():
+            self._update_timer.start()
+            
+    def flush_updates(self):
+        """保存变化的任务，发出合并后的更新通知，并把已完成的任务移出队列"""
+        jobs = list(self._dirty.values())
+        self._dirty.clear()
+        if self.store is not None and jobs:
+            try:
+                self.store.update(jobs)
+            except Exception as e:
+                logging.error(f"保存下载队列失败: {e}")
+        collapsed = [job for job in self._collapsed if job.state == FINISHED]
+        self._collapsed = []
+        self._remove(collapsed)
+        self.jobs_updated.emit(jobs)
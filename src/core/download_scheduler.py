@@ -0,0 +1,101 @@
+import heapq
+
+class SchedulingPolicy:
+    """调度策略：决定等待中的任务按什么顺序开始下载
+
+    置顶的任务总是最先开始（按手动顺序），其余任务由各策略排序。
+    needs_info为True的策略要先知道视频时长或UP主，队列会提前解析等待中的任务。
+    """
+    name = ''
+    label = ''
+    needs_info = False
+    
+    def select(self, queued, served, count):
+        """返回接下来最先开始的至多count个任务；served为各UP主已开始下载的任务数
+
+        调度时空闲名额很少，只选出需要的几个，不对整个队列排序。
+        """
+        pinned = heapq.nsmallest(count, (job for job in queued if job.pinned),
+                                 key=lambda job: job.position)
+        if len(pinned) >= count:
+            return pinned
+        others = [job for job in queued if not job.pinned]
+        return pinned + self.select_unpinned(others, served, count - len(pinned))
+        
+    def select_unpinned(self, jobs, served, count):
+        return heapq.nsmallest(count, jobs, key=lambda job: job.position)
+        
+    def known(self, job):
+        """任务是否已有策略需要的信息"""
+        return True
+
+class FifoPolicy(SchedulingPolicy):
+    """按加入（或手动调整后）的顺序"""
+    name = 'fifo'
+    label = "先来先下"
+
+class ShortestFirstPolicy(SchedulingPolicy):
+    """时长短的先下载：一批任务的平均完成时间最短
+
+    时长未知的任务排在已知的之后，等解析出时长再参与排序；
+    刚开始时最先解析到的任务可能先开始，之后总是从已知时长中选最短的。
+    """
+    name = 'shortest'
+    label = "短的优先"
+    needs_info = True
+    
+    def select_unpinned(self, jobs, served, count):
+        return heapq.nsmallest(count, jobs, key=lambda job: (job.duration is None, job.duration or 0, job.position))
+        
+    def known(self, job):
+        return job.duration is not None
+
+class FairSharePolicy(SchedulingPolicy):
+    """按UP主轮流下载，一个UP主的大量视频不会挡住其他UP主
+
+    每次选择已开始和已选中的任务最少的UP主，同一UP主内按顺序。
+    """
+    name = 'fair'
+    label = "按UP主轮流"
+    needs_info = True
+    
+    def select_unpinned(self, jobs, served, count):
+        by_uploader = {}
+        for job in jobs:
+            by_uploader.setdefault(job.uploader or '', []).append(job)
+        # 每个UP主最多选出count个，只需要各自最靠前的count个任务
+        heads = []
+        for uploader, uploader_jobs in by_uploader.items():
+            uploader_jobs = heapq.nsmallest(count, uploader_jobs, key=lambda job: job.position)
+            by_uploader[uploader] = uploader_jobs
+            heads.append((served.get(uploader, 0), uploader_jobs[0].position, uploader, 0))
+        heapq.heapify(heads)
+        
+        selected = []
+        while heads and len(selected) < count:
+            share, _, uploader, index = heapq.heappop(heads)
+            uploader_jobs = by_uploader[uploader]
+            selected.append(uploader_jobs[index])
+            if index + 1 < len(uploader_jobs):
+                heapq.heappush(heads, (share + 1, uploader_jobs[index + 1].position, uploader, index + 1))
+        return selected
+        
+    def known(self, job):
+        return bool(job.uploader)
+
+class PriorityPolicy(SchedulingPolicy):
+    """按用户设置的优先级，同一优先级内按顺序"""
+    name = 'priority'
+    label = "按优先级"
+    
+    def select_unpinned(self, jobs, served, count):
+        return heapq.nsmallest(count, jobs, key=lambda job: (-job.priority, job.position))
+
+POLICIES = {policy.name: policy for policy in
+            (FifoPolicy(), ShortestFirstPolicy(), FairSharePolicy(), PriorityPolicy())}
+
+DEFAULT_POLICY = 'fifo'
+
+def get_policy(name):
+    """按名称取得调度策略，未知名称时返回默认策略"""
+    return POLICIES.get(name) or POLICIES[DEFAULT_POLICY]
@@ -0,0 +1,104 @@
+import sqlite3
+from pathlib import Path
+
+from core.content_index import LIBRARY_DB
+from core.download_queue import DownloadJob, FINISHED, CANCELLED
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS download_jobs (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    download_path TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    state TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    file_path TEXT,
+    partial_path TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    duration INTEGER,
+    uploader TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    pinned INTEGER NOT NULL DEFAULT 0,
+    position INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS download_jobs_state ON download_jobs (state);
+"""
+
+# 旧版数据库缺少的列（调度信息）
+MIGRATIONS = (
+    ('duration', "ALTER TABLE download_jobs ADD COLUMN duration INTEGER"),
+    ('uploader', "ALTER TABLE download_jobs ADD COLUMN uploader TEXT"),
+    ('priority', "ALTER TABLE download_jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0"),
+    ('pinned', "ALTER TABLE download_jobs ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0"),
+    ('position', "ALTER TABLE download_jobs ADD COLUMN position INTEGER NOT NULL DEFAULT 0"),
+)
+
+# 随任务变化保存的字段
+FIELDS = ('title', 'state', 'progress', 'file_path', 'partial_path', 'error', 'attempts',
+          'duration', 'uploader', 'priority', 'pinned', 'position')
+
+class DownloadStore:
+    """下载队列的持久化（保存在音乐库数据库中）
+
+    加入队列时先写入数据库再开始下载，状态变化随队列的合并更新一起写入，
+    程序关闭或崩溃后重新启动时从这里恢复。已完成的任务保留为下载记录，
+    恢复时只统计数量，不会重新加入队列。
+    """
+    
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or LIBRARY_DB)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(download_jobs)")}
+        for column, statement in MIGRATIONS:
+            if column not in columns:
+                self._conn.execute(statement)
+                
+    def close(self):
+        self._conn.close()
+        
+    def load(self):
+        """读取未完成的任务（按队列顺序）和已完成的任务数，返回 (DownloadJob列表, 已完成数)"""
+        jobs = []
+        for row in self._conn.execute(
+            f"SELECT id, url, download_path, {', '.join(FIELDS)} FROM download_jobs WHERE state != ? ORDER BY position, id",
+            (FINISHED,)
+        ):
+            job = DownloadJob(row[1], row[2])
+            job.id = row[0]
+            for field, value in zip(FIELDS, row[3:]):
+                setattr(job, field, value)
+            job.pinned = bool(job.pinned)
+            jobs.append(job)
+        finished = self._conn.execute(
+            "SELECT COUNT(*) FROM download_jobs WHERE state = ?", (FINISHED,)
+        ).fetchone()[0]
+        return jobs, finished
+        
+    def add(self, jobs):
+        """保存新任务（一个事务），并把数据库分配的编号写回任务"""
+        with self._conn:
+            for job in jobs:
+                cursor = self._conn.execute(
+                    f"INSERT INTO download_jobs (url, download_path, {', '.join(FIELDS)}) "
+                    f"VALUES (?, ?, {', '.join('?' * len(FIELDS))})",
+                    (job.url, job.download_path) + tuple(getattr(job, field) for field in FIELDS)
+                )
+                job.id = cursor.lastrowid
+                
+    def update(self, jobs):
+        """保存任务的当前状态（一个事务）"""
+        with self._conn:
+            self._conn.executemany(
+                f"UPDATE download_jobs SET {', '.join(f'{field} = ?' for field in FIELDS)} WHERE id = ?",
+                [tuple(getattr(job, field) for field in FIELDS) + (job.id,) for job in jobs]
+            )
+            
+    def remove_finished(self):
+        """删除已完成和已取消的任务记录"""
+        with self._conn:
+            self._conn.execute("DELETE FROM download_jobs WHERE state IN (?, ?)", (FINISHED, CANCELLED))
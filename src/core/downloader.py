@@ -3,11 +3,20 @@ import re
 import time
 import yt_dlp
 import requests
+import logging
 import threading
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs
+from yt_dlp.postprocessor import PostProcessor
 from PyQt5.QtCore import QThread, pyqtSignal, QMutex, QObject
 
+from core.metadata import default_metadata_service
+from core.cover_cache import CoverFetcher, default_cover_cache
+from core.tag_writer import write_tags
+from core.integrity import check_file
+from core.track import Track
+from utils.helpers import validate_url
+
 class DownloadProgressHandler(QObject):
     """下载进度处理器"""
     progress = pyqtSignal(str, int)  # url, 进度百分比
@@ -20,12 +29,75 @@ class DownloadProgressHandler(QObject):
         self._mutex = QMutex()
         self._active_downloads = {}
 
+class TagPostProcessor(PostProcessor):
+    """下载后处理：把视频信息写入音频标签
+
+    在音频提取之后运行，标题、UP主、投稿日期、来源链接和封面一次写入文件。
+    写入的内容同时保存为Track记录，音乐库可以直接使用而不必重新解析文件。
+    封面在下载音频的同时已经开始获取，这里只等待结果，并顺便生成缩略图缓存。
+    """
+    
+    def __init__(self, cover=None, cover_cache=None, downloader=None):
+        super().__init__(downloader)
+        self.cover = cover            # 封面下载的Future
+        self.cover_cache = cover_cache
+        self.track = None
+        
+    def run(self, info):
+        file_path = info.get('filepath')
+        if not file_path or not os.path.exists(file_path):
+            return [], info
+            
+        upload_date = info.get('upload_date') or ''
+        if len(upload_date) == 8:
+            upload_date = f"{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:]}"
+        changes = {
+            'title': info.get('title') or '',
+            'artist': info.get('uploader') or '',
+            'year': upload_date,
+            'url': info.get('webpage_url') or '',
+        }
+        changes = {field: value for field, value in changes.items() if value}
+        
+        cover = self.wait_cover()
+        if cover is not None and self.cover_cache is not None:
+            self.cover_cache.put(file_path, cover[0])
+            
+        try:
+            write_tags(file_path, changes, cover)
+            self.track = Track(
+                file_path,
+                title=changes.get('title', ''),
+                artist=changes.get('artist', ''),
+                year=upload_date,
+                duration=info.get('duration') or 0,
+            )
+        except Exception as e:
+            logging.warning(f"写入标签失败 {file_path}: {e}")
+        return [], info
+        
+    def wait_cover(self):
+        """等待封面下载完成，返回 (数据, MIME类型) 或None"""
+        if self.cover is None:
+            return None
+        try:
+            return self.cover.result(timeout=30)
+        except Exception as e:
+            logging.warning(f"下载封面失败: {e}")
+            return None
+
 class DownloadThread(QThread):
     """下载线程"""
     progress = pyqtSignal(str, int)  # url, 进度百分比
     status = pyqtSignal(str, str)    # url, 状态信息
     finished = pyqtSignal(str, str)  # url, 文件路径
     error = pyqtSignal(str, str)     # url, 错误信息
+    video_info = pyqtSignal(str, dict)  # url, 解析到的视频信息
+    partial_file = pyqtSignal(str, str)  # url, 下载中的临时文件（.part），继续下载时从这里接着下载
+    done = pyqtSignal(str)           # url，run()结束前总会发出（无论成功、失败还是被停止）
+    
+    # 下载速度等状态文字的最短汇报间隔（秒），进度只在百分比变化时汇报
+    STATUS_INTERVAL = 0.5
     
     def __init__(self, url, download_path, downloader, parent=None):
         super().__init__(parent)
@@ -36,9 +108,20 @@ class DownloadThread(QThread):
         self._is_paused = False
         self._mutex = QMutex()
         self.current_progress = 0
+        self.track = None
+        self.cover = None
+        self._last_status = 0.0
+        self.partial_path = None
         
     def run(self):
         """主下载逻辑"""
+        try:
+            self.download()
+        finally:
+            self.done.emit(self.url)
+            
+    def download(self):
+        """解析并下载音频，结果通过finished或error信号汇报"""
         try:
             if not self._is_running:
                 return
@@ -59,9 +142,14 @@ class DownloadThread(QThread):
                     self.error.emit(self.url, "无法获取视频信息")
                     return
                     
+                self.video_info.emit(self.url, video_info)
                 self.status.emit(self.url, f"解析成功: {video_info.get('title', '未知标题')}")
                 self.progress.emit(self.url, 20)
                 
+                # 封面与音频同时下载
+                if video_info.get('thumbnail'):
+                    self.cover = self.downloader.covers.prefetch(video_info['thumbnail'])
+                    
             except Exception as e:
                 self.error.emit(self.url, f"视频信息解析失败: {str(e)}")
                 return
@@ -80,13 +168,28 @@ class DownloadThread(QThread):
             file_path = self.download_with_ytdlp(self.url, str(self.download_path))
             
             if self._is_running and file_path and Path(file_path).exists():
-                file_size = Path(file_path).stat().st_size
-                if file_size > 0:
+                # 检查文件是否完整（截断的下载、失败的转码不能进入音乐库）
+                self.status.emit(self.url, "检查文件")
+                problem = check_file(file_path)
+                if problem is None:
+                    # 登记下载时写入的标签（没有则解析一次），音乐库收到新文件后直接命中缓存
+                    try:
+                        if self.track is not None and self.track.path == str(file_path):
+                            self.downloader.metadata.remember(self.track)
+                        else:
+                            self.downloader.metadata.read_track(file_path)
+                    except Exception as e:
+                        logging.warning(f"读取下载文件信息失败 {file_path}: {e}")
                     self.progress.emit(self.url, 100)
                     self.status.emit(self.url, "下载完成")
                     self.finished.emit(self.url, file_path)
                 else:
-                    self.error.emit(self.url, "下载文件为空")
+                    logging.warning(f"下载的文件不完整 {file_path}: {problem}")
+                    try:
+                        os.remove(file_path)
+                    except OSError:
+                        pass
+                    self.error.emit(self.url, f"下载的文件不完整: {problem}")
             else:
                 self.error.emit(self.url, "下载被取消或文件不存在")
                 
@@ -96,19 +199,7 @@ class DownloadThread(QThread):
             
     def validate_url(self, url):
         """验证URL格式"""
-        bilibili_patterns = [
-            r'https?://(www\.)?bilibili\.com/video/[A-Za-z0-9]+',
-            r'https?://(www\.)?b23\.tv/[A-Za-z0-9]+',
-            r'https?://m\.bilibili\.com/video/[A-Za-z0-9]+',
-            r'https?://bilibili\.com/video/BV[a-zA-Z0-9]+',
-            r'https?://www\.bilibili\.com/video/BV[a-zA-Z0-9]+',
-            r'https?://b23\.tv/BV[a-zA-Z0-9]+'
-        ]
-        
-        for pattern in bilibili_patterns:
-            if re.match(pattern, url, re.IGNORECASE):
-                return True
-        return False
+        return validate_url(url)
         
     def download_with_ytdlp(self, url, download_path):
         """使用yt-dlp下载音频"""
@@ -153,13 +244,16 @@ class DownloadThread(QThread):
                 while os.path.exists(expected_path):
                     expected_path = os.path.join(download_path, f"{safe_title}_{counter}.mp3")
                     counter += 1
-                
+                    
                 # 设置最终输出模板
                 ydl_opts['outtmpl'] = os.path.join(download_path, f"{safe_title}.%(ext)s")
                 
                 # 重新创建ydl实例
+                tagger = TagPostProcessor(self.cover, self.downloader.cover_cache)
                 with yt_dlp.YoutubeDL(ydl_opts) as final_ydl:
+                    final_ydl.add_post_processor(tagger, when='post_process')
                     final_ydl.download([url])
+                self.track = tagger.track
                 
                 # 检查文件是否生成
                 if os.path.exists(expected_path):
@@ -170,7 +264,7 @@ class DownloadThread(QThread):
                         possible_path = os.path.join(download_path, f"{safe_title}{ext}")
                         if os.path.exists(possible_path):
                             return possible_path
-                    
+                            
                     return None
                     
         except yt_dlp.DownloadError as e:
@@ -193,6 +287,11 @@ class DownloadThread(QThread):
             raise Exception("下载已取消")
             
         if d['status'] == 'downloading':
+            partial = d.get('tmpfilename')
+            if partial and partial != self.partial_path:
+                self.partial_path = partial
+                self.partial_file.emit(self.url, partial)
+                
             # 计算进度百分比
             if d.get('total_bytes'):
                 percent = int(d['downloaded_bytes'] * 100 / d['total_bytes'])
@@ -203,9 +302,15 @@ class DownloadThread(QThread):
                 
             # 确保进度在合理范围内
             percent = max(30, min(95, percent))
-            self.current_progress = percent
             
-            self.progress.emit(self.url, percent)
+            # 每个数据块都会回调，只在进度变化时汇报，状态文字限制频率
+            if percent != self.current_progress:
+                self.current_progress = percent
+                self.progress.emit(self.url, percent)
+            now = time.monotonic()
+            if now - self._last_status < self.STATUS_INTERVAL:
+                return
+            self._last_status = now
             speed = d.get('speed', 0)
             if speed:
                 speed_str = self.format_speed(speed)
@@ -274,8 +379,39 @@ class DownloadThread(QThread):
         self._mutex.unlock()
         return paused
 
+class VideoInfoThread(QThread):
+    """提前解析一批链接的视频信息（下载队列按时长或UP主调度时使用）"""
+    resolved = pyqtSignal(str, dict)  # url, 视频信息
+    failed = pyqtSignal(str, str)     # url, 错误信息
+    
+    def __init__(self, urls, downloader, parent=None):
+        super().__init__(parent)
+        self.urls = list(urls)
+        self.downloader = downloader
+        self._is_running = True
+        
+    def run(self):
+        for url in self.urls:
+            if not self._is_running:
+                break
+            try:
+                info = self.downloader.extract_video_info(url)
+            except Exception as e:
+                self.failed.emit(url, str(e))
+                continue
+            if info:
+                self.resolved.emit(url, info)
+            else:
+                self.failed.emit(url, "无法获取视频信息")
+                
+    def stop(self):
+        """解析完当前链接后停止"""
+        self._is_running = False
+
 class BilibiliDownloader:
-    def __init__(self):
+    def __init__(self, metadata=None):
+        self.metadata = metadata or default_metadata_service()
+        self.cover_cache = default_cover_cache()
         self.session = requests.Session()
         # 设置请求头模拟浏览器
         self.session.headers.update({
@@ -284,6 +420,8 @@ class BilibiliDownloader:
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'zh-CN,zh;q=0.8,zh-TW;q=0.7,zh-HK;q=0.5,en-US;q=0.3,en;q=0.2',
         })
+        # 封面下载共用同一个会话的连接池
+        self.covers = CoverFetcher(self.session)
         
     def extract_video_info(self, url):
         """提取视频信息"""
@@ -343,18 +481,7 @@ class BilibiliDownloader:
             
     def validate_url(self, url):
         """验证URL格式"""
-        bilibili_patterns = [
-            r'https?://(www\.)?bilibili\.com/video/[A-Za-z0-9]+',
-            r'https?://(www\.)?b23\.tv/[A-Za-z0-9]+',
-            r'https?://m\.bilibili\.com/video/[A-Za-z0-9]+',
-            r'https?://bilibili\.com/video/BV[a-zA-Z0-9]+',
-            r'https?://www\.bilibili\.com/video/BV[a-zA-Z0-9]+',
-        ]
-        
-        for pattern in bilibili_patterns:
-            if re.match(pattern, url, re.IGNORECASE):
-                return True
-        return False
+        return validate_url(url)
         
     def format_duration(self, seconds):
         """格式化时长"""
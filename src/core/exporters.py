@@ -0,0 +1,104 @@
+import io
+import os
+import csv
+import json
+from pathlib import Path
+
+# 写文件时的缓冲区大小，逐行生成的文本在缓冲区中合并后写入
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+CSV_FIELDS = ('title', 'artist', 'album', 'genre', 'year', 'duration', 'size', 'path')
+CSV_HEADERS = ("歌曲名", "歌手", "专辑", "风格", "年份", "时长（秒）", "大小（字节）", "路径")
+
+def track_values(track):
+    """导出的字段值（时长保留到毫秒）"""
+    return [round(track.duration, 3) if field == 'duration' else getattr(track, field)
+            for field in CSV_FIELDS]
+
+def filter_tracks(tracks, paths=None, genre=None):
+    """按路径集合（搜索结果、勾选）或风格筛选，逐条产出，不复制列表"""
+    if paths is not None and not isinstance(paths, (set, frozenset)):
+        paths = {str(p) for p in paths}
+    for track in tracks:
+        if paths is not None and track.path not in paths:
+            continue
+        if genre is not None and track.genre != genre:
+            continue
+        yield track
+
+def m3u8_lines(tracks, base_dir=None):
+    """扩展M3U播放列表（UTF-8），带时长；base_dir给出时使用相对路径"""
+    yield "#EXTM3U\n"
+    for track in tracks:
+        path = track.path
+        if base_dir is not None:
+            try:
+                path = os.path.relpath(path, base_dir)
+            except ValueError:
+                pass  # 不同盘符时保留绝对路径
+        name = f"{track.artist} - {track.title}" if track.artist else track.title
+        yield f"#EXTINF:{int(round(track.duration))},{name}\n{path}\n"
+
+def csv_lines(tracks):
+    """CSV表格，时长和大小为原始数值"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(CSV_HEADERS)
+    for track in tracks:
+        writer.writerow(track_values(track))
+        # 每行取出后清空，缓冲区不会增长
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def jsonl_lines(tracks):
+    """JSON Lines，每行一首歌"""
+    for track in tracks:
+        yield json.dumps(dict(zip(CSV_FIELDS, track_values(track))), ensure_ascii=False) + "\n"
+
+# 格式 -> (生成器, 文件扩展名, 文件编码)
+EXPORTERS = {
+    'm3u8': (m3u8_lines, '.m3u8', 'utf-8'),
+    'csv': (csv_lines, '.csv', 'utf-8-sig'),  # 带BOM，Excel才能正确识别中文
+    'jsonl': (jsonl_lines, '.jsonl', 'utf-8'),
+}
+
+def export_format(path):
+    """根据扩展名判断导出格式"""
+    suffix = Path(path).suffix.lower()
+    for name, (_, extension, _) in EXPORTERS.items():
+        if suffix == extension or (name == 'm3u8' and suffix == '.m3u'):
+            return name
+    raise Exception(f"不支持的导出格式: {suffix}")
+
+def export_tracks(tracks, path, export_type=None):
+    """把歌曲逐行写入文件，返回导出的歌曲数
+
+    数据从生成器流式写出（先写临时文件，完成后替换），内存占用与歌曲数量无关。
+    """
+    path = Path(path)
+    export_type = export_type or export_format(path)
+    lines, _, encoding = EXPORTERS[export_type]
+    
+    count = 0
+    def counted(tracks):
+        nonlocal count
+        for track in tracks:
+            count += 1
+            yield track
+            
+    if export_type == 'm3u8':
+        chunks = lines(counted(tracks), path.parent)
+    else:
+        chunks = lines(counted(tracks))
+    temp = path.with_name(path.name + '.tmp')
+    try:
+        with open(temp, 'w', encoding=encoding, newline='', buffering=WRITE_BUFFER_SIZE) as f:
+            f.writelines(chunks)
+        os.replace(temp, path)
+    except BaseException:
+        if temp.exists():
+            temp.unlink()
+        raise
+    return count
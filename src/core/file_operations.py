@@ -0,0 +1,249 @@
+import time
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.library_index import LibraryDelta
+from core.operation_journal import transfer, same_device, rollback, replay
+
+# 与音频文件一起移动的附属文件
+SIDECAR_SUFFIXES = ('.lrc',)
+
+class FileOperation:
+    """单个文件操作"""
+    RENAME = 'rename'
+    MOVE = 'move'
+    DELETE = 'delete'
+    
+    def __init__(self, kind, source, target=None):
+        self.kind = kind
+        self.source = Path(source)
+        self.target = Path(target) if target is not None else None
+        self.error = None
+        
+    def __repr__(self):
+        return f"FileOperation({self.kind}, {self.source} -> {self.target})"
+        
+    @classmethod
+    def rename(cls, source, new_path):
+        return cls(cls.RENAME, source, new_path)
+        
+    @classmethod
+    def move(cls, source, target_dir):
+        return cls(cls.MOVE, source, Path(target_dir) / Path(source).name)
+        
+    @classmethod
+    def delete(cls, source):
+        return cls(cls.DELETE, source)
+        
+    def sidecars(self):
+        """(源, 目标) 形式的附属文件列表"""
+        pairs = []
+        for suffix in SIDECAR_SUFFIXES:
+            sidecar = self.source.with_suffix(suffix)
+            if sidecar.exists():
+                target = self.target.with_suffix(suffix) if self.target else None
+                pairs.append((sidecar, target))
+        return pairs
+        
+    def same_device(self):
+        """源和目标是否在同一设备上（可以直接os.rename）"""
+        if self.target is None:
+            return True
+        return same_device(self.source, self.target.parent)
+
+class BatchExecutor:
+    """批量文件操作执行器（不依赖Qt，可以在任意线程中运行）
+
+    所有操作先确定目标路径并整批写入日志（只落盘一次），然后执行：
+    同一设备上的重命名/移动直接用os.rename，跨设备的移动在线程池中并行复制。
+    有日志时删除操作把文件移入回收站，之后可以撤销。
+    单个操作中途失败时，已经移动的附属文件会退回原处，歌词不会和音频分离。
+    """
+    MAX_COPY_WORKERS = 4
+    
+    def __init__(self, operations, library_root=None, journal=None, progress=None):
+        self.operations = list(operations)
+        self.library_root = Path(library_root) if library_root else None
+        self.journal = journal
+        self.progress = progress
+        self._is_running = True
+        self._done = 0
+        self._last_report = 0.0
+        self._reserved = set()
+        
+    def stop(self):
+        """停止（已开始的文件会完成）"""
+        self._is_running = False
+        
+    def run(self):
+        """执行全部操作，返回 (LibraryDelta, 失败的操作)"""
+        delta = LibraryDelta()
+        failures = []
+        total = len(self.operations)
+        
+        prepared = []
+        for seq, operation in enumerate(self.operations):
+            try:
+                prepared.append((seq, operation) + self._prepare(seq, operation))
+            except Exception as e:
+                operation.error = str(e)
+                logging.error(f"文件操作失败 {operation}: {e}")
+                failures.append(operation)
+                self._report(total)
+                
+        if self.journal is not None:
+            for seq, operation, pairs, _ in prepared:
+                self.journal.begin(seq, operation, pairs[:-1], sync=False)
+            self.journal.sync()
+            
+        local_ops = [item for item in prepared if item[3]]
+        copy_ops = [item for item in prepared if not item[3]]
+        
+        for item in local_ops:
+            if self._execute(*item):
+                self._record(item[1], delta)
+            else:
+                failures.append(item[1])
+            self._report(total)
+            
+        if copy_ops:
+            with ThreadPoolExecutor(max_workers=self.MAX_COPY_WORKERS) as executor:
+                futures = {executor.submit(self._execute, *item): item[1] for item in copy_ops}
+                for future in as_completed(futures):
+                    operation = futures[future]
+                    if future.result():
+                        self._record(operation, delta)
+                    else:
+                        failures.append(operation)
+                    self._report(total)
+                    
+        if self.journal is not None:
+            self.journal.commit()
+        return delta, failures
+        
+    def _report(self, total):
+        """汇报进度（合并高频更新，避免刷屏）"""
+        self._done += 1
+        now = time.monotonic()
+        if self.progress and (self._done == total or now - self._last_report >= 0.1):
+            self._last_report = now
+            self.progress(self._done, total)
+            
+    def _prepare(self, seq, operation):
+        """确定目标路径，返回 (要移动的文件列表, 是否同一设备)"""
+        if operation.kind == FileOperation.DELETE:
+            if self.journal is None:
+                return [(path, None) for path, _ in operation.sidecars()] + [(operation.source, None)], True
+            operation.target = self.journal.trash_path(operation.source, seq)
+            
+        operation.target.parent.mkdir(parents=True, exist_ok=True)
+        operation.target = self._unique_target(operation.target)
+        pairs = operation.sidecars() + [(operation.source, operation.target)]
+        return pairs, operation.same_device()
+        
+    def _unique_target(self, target):
+        """目标已存在（或已被本批次占用）时换一个不冲突的名字"""
+        candidate = target
+        counter = 1
+        while candidate in self._reserved or candidate.exists():
+            candidate = target.parent / f"{target.stem}_{counter}{target.suffix}"
+            counter += 1
+        self._reserved.add(candidate)
+        return candidate
+        
+    def _execute(self, seq, operation, pairs, local):
+        """执行单个操作，返回是否成功"""
+        try:
+            if not self._is_running:
+                raise Exception("操作已取消")
+            moved = []
+            try:
+                for source, target in pairs:
+                    if target is None:
+                        source.unlink()
+                    else:
+                        transfer(source, target, local)
+                        moved.append((source, target))
+            except BaseException:
+                self._restore(moved, local)
+                raise
+        except Exception as e:
+            operation.error = str(e)
+            logging.error(f"文件操作失败 {operation}: {e}")
+            if self.journal is not None:
+                self.journal.failed(seq, e)
+            return False
+            
+        if self.journal is not None:
+            self.journal.done(seq)
+        return True
+        
+    def _restore(self, moved, local):
+        """把已经移动的文件退回原处"""
+        for source, target in reversed(moved):
+            try:
+                transfer(target, source, local)
+            except OSError as e:
+                logging.error(f"无法恢复文件 {target} -> {source}: {e}")
+                
+    def _record(self, operation, delta):
+        """把完成的操作记入增量"""
+        if operation.kind == FileOperation.DELETE:
+            delta.removed.append(operation.source)
+        elif self._in_library(operation.target):
+            delta.renamed.append((operation.source, operation.target))
+        else:
+            delta.removed.append(operation.source)
+            
+    def _in_library(self, path):
+        if self.library_root is None:
+            return True
+        try:
+            path.relative_to(self.library_root)
+            return True
+        except ValueError:
+            return False
+
+class BatchFileOperationThread(QThread):
+    """批量文件操作线程
+
+    在后台运行BatchExecutor，完成后以LibraryDelta的形式返回结果，
+    由界面增量更新索引和列表。
+    """
+    progress = pyqtSignal(int, int)          # 已完成数, 总数
+    finished_batch = pyqtSignal(object, list)  # LibraryDelta, 失败的操作
+    
+    def __init__(self, operations, library_root=None, journal=None, parent=None):
+        super().__init__(parent)
+        self.executor = BatchExecutor(operations, library_root, journal, self.progress.emit)
+        
+    def stop(self):
+        """停止（已开始的文件会完成）"""
+        self.executor.stop()
+        
+    def run(self):
+        delta, failures = self.executor.run()
+        self.finished_batch.emit(delta, failures)
+
+class JournalRecoveryThread(QThread):
+    """按日志回滚（撤销）或继续执行一个批次"""
+    progress = pyqtSignal(int, int)
+    finished_batch = pyqtSignal(object, list)
+    
+    def __init__(self, journal, undo=True, parent=None):
+        super().__init__(parent)
+        self.journal = journal
+        self.undo = undo
+        
+    def stop(self):
+        """回滚过程不能中断，保证文件状态一致"""
+        pass
+        
+    def run(self):
+        if self.undo:
+            delta, failures = rollback(self.journal, self.progress.emit)
+        else:
+            delta, failures = replay(self.journal, self.progress.emit)
+        self.finished_batch.emit(delta, failures)
@@ -0,0 +1,421 @@
+import os
+import json
+import wave
+import shutil
+import logging
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PyQt5.QtCore import QThread, pyqtSignal
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FINGERPRINT_FILE = Path.home() / '.bilibili_music_extractor' / 'fingerprints.npz'
+
+# 解码参数：8kHz单声道，只分析前两分钟
+SAMPLE_RATE = 8000
+MAX_SECONDS = 120
+
+# 频谱参数：每帧64毫秒，约每秒15.6帧
+FFT_SIZE = 1024
+HOP_SIZE = 512
+
+# 在这些频段（FFT频点）内各取一个峰值，覆盖约80Hz~2.3kHz
+PEAK_BANDS = ((10, 40), (40, 80), (80, 160), (160, 300))
+# 峰值需要是前后若干帧内的最大值
+PEAK_NEIGHBORHOOD = 4
+# 每个锚点与其后的几个峰值配对，时间差不超过63帧（6位）
+FAN_OUT = 5
+MAX_DELTA = 63
+
+# 哈希共24位；查重时按最高4位分段建立倒排表，每次只对一段排序
+HASH_BITS = 24
+SEGMENT_BITS = 4
+# 出现在太多歌曲中的哈希没有区分度，查重时跳过
+MAX_BUCKET = 64
+# 按歌曲id分段投票，每段大约这么多个倒排表条目
+VOTE_CHUNK = 2 * 1024 * 1024
+# 投票键中时间偏移的位数（锚点时间为uint16，偏移加上偏置后为正数）
+DELTA_BITS = 17
+DELTA_BIAS = 1 << 16
+
+def require_numpy():
+    if np is None:
+        raise Exception("查找重复歌曲需要安装numpy")
+
+def decode_audio(file_path):
+    """解码为8kHz单声道float32采样（最多MAX_SECONDS秒）"""
+    require_numpy()
+    file_path = Path(file_path)
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        command = [
+            ffmpeg, '-v', 'quiet', '-i', str(file_path), '-t', str(MAX_SECONDS),
+            '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', '-'
+        ]
+        result = subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        )
+        if result.returncode != 0:
+            raise Exception("ffmpeg解码失败")
+        return np.frombuffer(result.stdout, dtype='<i2').astype(np.float32) / 32768.0
+        
+    if file_path.suffix.lower() == '.wav':
+        return decode_wav(file_path)
+    raise Exception("解码音频需要ffmpeg")
+
+def decode_wav(file_path):
+    """没有ffmpeg时直接读取16位PCM的WAV文件"""
+    with wave.open(str(file_path), 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise Exception("只支持16位PCM的WAV文件")
+        rate = wav.getframerate()
+        channels = wav.getnchannels()
+        frames = wav.readframes(min(wav.getnframes(), rate * MAX_SECONDS))
+    samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        positions = np.arange(0, len(samples), rate / SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+def spectrogram(samples):
+    """对数幅度谱（帧 × 频点）"""
+    if len(samples) < FFT_SIZE:
+        return np.zeros((0, FFT_SIZE // 2 + 1), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FFT_SIZE)[::HOP_SIZE]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FFT_SIZE).astype(np.float32), axis=1))
+    return np.log1p(spectrum).astype(np.float32)
+
+def find_peaks(spec):
+    """在每个频段中挑出时间上的局部最大值，返回按时间排序的 (帧, 频点)"""
+    times = []
+    freqs = []
+    window = 2 * PEAK_NEIGHBORHOOD + 1
+    for low, high in PEAK_BANDS:
+        band = spec[:, low:high]
+        if len(band) < window:
+            continue
+        best = band.argmax(axis=1)
+        values = band[np.arange(len(band)), best]
+        padded = np.pad(values, PEAK_NEIGHBORHOOD, mode='constant')
+        local_max = np.lib.stride_tricks.sliding_window_view(padded, window).max(axis=1)
+        # 局部最大且高于该频段平均能量
+        mask = (values >= local_max) & (values > values.mean())
+        times.append(np.nonzero(mask)[0])
+        freqs.append(best[mask] + low)
+    if not times:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    times = np.concatenate(times).astype(np.int32)
+    freqs = np.concatenate(freqs).astype(np.int32)
+    order = np.argsort(times, kind='stable')
+    return times[order], freqs[order]
+
+def peak_hashes(times, freqs):
+    """峰值两两配对生成哈希：锚点频率(9位) | 目标频率(9位) | 时间差(6位)"""
+    hashes = []
+    anchors = []
+    for step in range(1, FAN_OUT + 1):
+        if len(times) <= step:
+            break
+        delta = times[step:] - times[:-step]
+        mask = (delta > 0) & (delta <= MAX_DELTA)
+        f1 = freqs[:-step][mask].astype(np.uint32)
+        f2 = freqs[step:][mask].astype(np.uint32)
+        hashes.append((f1 << 15) | (f2 << 6) | delta[mask].astype(np.uint32))
+        anchors.append(times[:-step][mask])
+    if not hashes:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+    return np.concatenate(hashes), np.concatenate(anchors).astype(np.uint16)
+
+def fingerprint_file(file_path):
+    """计算一个文件的声纹（在进程池中运行），返回 (哈希, 锚点时间)"""
+    samples = decode_audio(file_path)
+    times, freqs = find_peaks(spectrogram(samples))
+    return peak_hashes(times, freqs)
+
+def file_version(file_path):
+    """文件版本（修改时间, 大小），变化后需要重新计算声纹"""
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+def run_starts(values):
+    """已排序数组中每段相同值的起点和长度"""
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(values)) + 1))
+    return starts, np.diff(np.append(starts, len(values)))
+
+class FingerprintIndex:
+    """声纹索引
+
+    保存每首歌的峰值哈希。查重时把所有哈希排序成倒排表，
+    每首歌只查询与自己共享哈希的歌曲，并按时间偏移投票，
+    不需要两两比较。
+    倒排表分段建立，只保存int32的歌曲id、uint16的时间和uint8的同组剩余数；
+    投票按歌曲id分段进行，一段中的配对在这一段内就能计完票，
+    只有达到阈值的配对留下，内存取决于真正的候选而不是偶然的哈希碰撞。
+    """
+    
+    def __init__(self):
+        self.paths = []
+        self.versions = []
+        self.hashes = []
+        self.times = []
+        self._id_of = {}
+        
+    def __len__(self):
+        return len(self.paths)
+        
+    def get(self, path, version):
+        """版本一致时返回已保存的声纹"""
+        track_id = self._id_of.get(str(path))
+        if track_id is None or self.versions[track_id] != tuple(version):
+            return None
+        return self.hashes[track_id], self.times[track_id]
+        
+    def add(self, path, version, hashes, times):
+        """添加或替换一首歌的声纹"""
+        path = str(path)
+        track_id = self._id_of.get(path)
+        if track_id is None:
+            self._id_of[path] = len(self.paths)
+            self.paths.append(path)
+            self.versions.append(tuple(version))
+            self.hashes.append(hashes)
+            self.times.append(times)
+        else:
+            self.versions[track_id] = tuple(version)
+            self.hashes[track_id] = hashes
+            self.times[track_id] = times
+            
+    def subset(self, paths):
+        """只保留给定路径的声纹（丢弃已删除的歌曲）"""
+        index = FingerprintIndex()
+        for path in paths:
+            track_id = self._id_of.get(str(path))
+            if track_id is not None:
+                index.add(self.paths[track_id], self.versions[track_id],
+                          self.hashes[track_id], self.times[track_id])
+        return index
+        
+    def find_duplicates(self, min_matches=20, min_ratio=0.05):
+        """找出重复歌曲，返回分组（每组为路径列表，至少两首）
+
+        两首歌在同一时间偏移上共享至少min_matches个哈希，并且占较短一首的
+        min_ratio以上时视为同一首歌。
+        """
+        require_numpy()
+        if len(self.paths) < 2:
+            return []
+            
+        counts = np.array([len(h) for h in self.hashes], dtype=np.int64)
+        if not counts.sum():
+            return []
+        ids, times, remaining = self._inverted_index(counts)
+        
+        parent = list(range(len(self.paths)))
+        
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+            
+        for a, b, vote in self._vote(ids, times, remaining, min_matches):
+            if vote >= min_ratio * min(counts[a], counts[b]):
+                parent[find(b)] = find(a)
+                
+        groups = {}
+        for track_id in range(len(self.paths)):
+            groups.setdefault(find(track_id), []).append(self.paths[track_id])
+        return [group for group in groups.values() if len(group) > 1]
+        
+    def _inverted_index(self, counts):
+        """按哈希排序的倒排表，只保留出现在2~MAX_BUCKET个位置的哈希
+
+        返回 (歌曲id, 锚点时间, 同一哈希中排在后面的条目数)。
+        同一哈希内的条目按歌曲id从小到大排列。
+        """
+        hashes = np.concatenate(self.hashes).astype(np.uint32, copy=False)
+        times = np.concatenate(self.times).astype(np.uint16, copy=False)
+        bounds = np.cumsum(counts)
+        segments = (hashes >> (HASH_BITS - SEGMENT_BITS)).astype(np.uint8)
+        parts = []
+        for segment in range(1 << SEGMENT_BITS):
+            index = np.flatnonzero(segments == segment)
+            if len(index) < 2:
+                continue
+            # index递增，此时查歌曲id最快
+            segment_ids = np.searchsorted(bounds, index, side='right').astype(np.int32)
+            # 按 (哈希, 段内位置) 排序：同一哈希内位置从小到大，也就是歌曲id从小到大
+            keys = (hashes[index].astype(np.uint64) << np.uint64(32)) | np.arange(len(index), dtype=np.uint64)
+            keys.sort()
+            starts, sizes = run_starts(keys >> np.uint64(32))
+            kept = (sizes > 1) & (sizes <= MAX_BUCKET)
+            order = (keys & np.uint64(0xFFFFFFFF)).astype(np.int64)[np.repeat(kept, sizes)]
+            del keys
+            sizes = sizes[kept]
+            remaining = np.repeat(np.cumsum(sizes), sizes) - np.arange(1, len(order) + 1)
+            parts.append((segment_ids[order], times[index[order]], remaining.astype(np.uint8)))
+        del hashes, times, segments
+        if not parts:
+            return np.zeros(0, np.int32), np.zeros(0, np.uint16), np.zeros(0, np.uint8)
+        return tuple(np.concatenate(columns) for columns in zip(*parts))
+        
+    def _vote(self, ids, times, remaining, min_matches):
+        """按时间偏移投票，返回票数达到min_matches的 (歌曲a, 歌曲b, 票数)，a < b
+
+        每个配对的票都来自较小的歌曲id，按较小id分段投票，
+        每段大约VOTE_CHUNK个条目，计完票只留下达到阈值的配对。
+        """
+        track_count = len(self.paths)
+        id_bits = max(1, (track_count - 1).bit_length())
+        if 2 * id_bits + DELTA_BITS > 63:
+            raise Exception("歌曲太多，无法查找重复")
+        entries = np.cumsum(np.bincount(ids, minlength=track_count))
+        strong = []
+        first_id = 0
+        while first_id < track_count:
+            done = entries[first_id - 1] if first_id else 0
+            last_id = max(first_id + 1, int(np.searchsorted(entries, done + VOTE_CHUNK, side='right')))
+            strong.extend(self._vote_range(ids, times, remaining, first_id, last_id, id_bits, min_matches))
+            first_id = last_id
+        return strong
+        
+    def _vote_range(self, ids, times, remaining, first_id, last_id, id_bits, min_matches):
+        """为较小id在 [first_id, last_id) 中的配对投票"""
+        positions = np.flatnonzero((ids >= first_id) & (ids < last_id))
+        keys = []
+        for distance in range(1, MAX_BUCKET):
+            # 相同哈希的条目是连续的，某个距离上不再同组，更远的距离也不会
+            positions = positions[remaining[positions] >= distance]
+            if not len(positions):
+                break
+            first = ids[positions]
+            second = ids[positions + distance]
+            differ = first != second
+            pair_positions = positions[differ]
+            deltas = times[pair_positions + distance].astype(np.int64) - times[pair_positions]
+            keys.append((first[differ].astype(np.int64) << (id_bits + DELTA_BITS))
+                        | (second[differ].astype(np.int64) << DELTA_BITS) | (deltas + DELTA_BIAS))
+        if not keys:
+            return []
+        keys = np.concatenate(keys)
+        keys.sort()
+        starts, votes = run_starts(keys)
+        strong = votes >= min_matches
+        keys = keys[starts[strong]]
+        id_mask = (1 << id_bits) - 1
+        return zip((keys >> (id_bits + DELTA_BITS)).tolist(),
+                   ((keys >> DELTA_BITS) & id_mask).tolist(),
+                   votes[strong].tolist())
+                   
+    def save(self, file_path=None):
+        """保存为npz文件（所有哈希拼接保存，加载时按数量切分）"""
+        require_numpy()
+        file_path = Path(file_path or FINGERPRINT_FILE)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = file_path.with_name(file_path.name + '.tmp')
+        with open(temp_file, 'wb') as f:
+            np.savez(
+                f,
+                paths=np.array(json.dumps(self.paths, ensure_ascii=False)),
+                versions=np.array(self.versions, dtype=np.int64).reshape(-1, 2),
+                counts=np.array([len(h) for h in self.hashes], dtype=np.int64),
+                hashes=np.concatenate(self.hashes) if self.hashes else np.zeros(0, np.uint32),
+                times=np.concatenate(self.times) if self.times else np.zeros(0, np.uint16),
+            )
+        os.replace(temp_file, file_path)
+        
+    @classmethod
+    def load(cls, file_path=None):
+        """读取保存的声纹，文件不存在或损坏时返回空索引"""
+        require_numpy()
+        index = cls()
+        file_path = Path(file_path or FINGERPRINT_FILE)
+        if not file_path.exists():
+            return index
+        try:
+            with np.load(file_path) as data:
+                paths = json.loads(str(data['paths']))
+                versions = data['versions'].tolist()
+                bounds = np.cumsum(data['counts'])[:-1]
+                hashes = np.split(data['hashes'], bounds)
+                times = np.split(data['times'], bounds)
+        except Exception as e:
+            logging.warning(f"读取声纹缓存失败: {e}")
+            return index
+        for path, version, h, t in zip(paths, versions, hashes, times):
+            index.add(path, version, h, t)
+        return index
+
+class DuplicateScanThread(QThread):
+    """查找重复歌曲
+
+    声纹计算（解码 + FFT）在进程池中并行，结果缓存到磁盘，
+    之后只为新增或修改过的文件重新计算。
+    """
+    progress = pyqtSignal(int, int)
+    finished_scan = pyqtSignal(list)  # 重复分组
+    error = pyqtSignal(str)
+    
+    def __init__(self, paths, parent=None):
+        super().__init__(parent)
+        self.paths = [str(p) for p in paths]
+        self._is_running = True
+        
+    def stop(self):
+        self._is_running = False
+        
+    def run(self):
+        try:
+            require_numpy()
+            index = FingerprintIndex.load().subset(self.paths)
+            todo = []
+            for path in self.paths:
+                try:
+                    version = file_version(path)
+                except OSError:
+                    continue
+                if index.get(path, version) is None:
+                    todo.append((path, version))
+                    
+            total = len(todo)
+            self.progress.emit(0, total)
+            if todo:
+                self._fingerprint(todo, index)
+                index.save()
+            if not self._is_running:
+                return
+            self.finished_scan.emit(index.find_duplicates())
+        except Exception as e:
+            logging.error(f"查找重复歌曲失败: {e}")
+            self.error.emit(str(e))
+            
+    def _fingerprint(self, todo, index):
+        """在进程池中计算声纹"""
+        done = 0
+        executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 2)
+        futures = {}
+        try:
+            futures = {executor.submit(fingerprint_file, path): (path, version)
+                       for path, version in todo}
+            for future in as_completed(futures):
+                if not self._is_running:
+                    break
+                path, version = futures[future]
+                try:
+                    hashes, times = future.result()
+                    index.add(path, version, hashes, times)
+                except Exception as e:
+                    logging.warning(f"计算声纹失败 {path}: {e}")
+                done += 1
+                self.progress.emit(done, len(todo))
+        finally:
+            # 停止时取消还没开始的任务（shutdown的cancel_futures参数需要Python 3.9）
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
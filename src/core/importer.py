@@ -0,0 +1,252 @@
+import os
+import time
+import shutil
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.library_index import LibraryDelta
+from core.operation_journal import COPY_BUFFER_SIZE, same_device
+from core.content_index import PARTIAL_BLOCK_SIZE, new_hash
+from core.file_operations import SIDECAR_SUFFIXES
+from utils.helpers import is_audio_file
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux的FICLONE ioctl：在Btrfs、XFS等文件系统上创建共享数据块的副本（写时复制）
+FICLONE = 0x40049409
+
+def reflink(source, target):
+    """创建写时复制的副本，不支持时抛出OSError"""
+    if fcntl is None:
+        raise OSError("当前系统不支持reflink")
+    with open(source, 'rb') as src, open(target, 'xb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.unlink(target)
+            raise
+    shutil.copystat(source, target)
+
+def hashing_copy(source, target):
+    """复制文件的同时计算哈希，返回 (部分哈希, 完整哈希)
+
+    部分哈希与ContentIndex的算法一致（开头和结尾各64KB），复制过程中顺便取得，
+    导入的文件不需要再读一遍。
+    """
+    digest = new_hash()
+    head = b''
+    tail = b''
+    with open(source, 'rb') as src, open(target, 'xb') as dst:
+        while True:
+            chunk = src.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            dst.write(chunk)
+            if len(head) < PARTIAL_BLOCK_SIZE:
+                head += chunk[:PARTIAL_BLOCK_SIZE - len(head)]
+            tail = chunk[-PARTIAL_BLOCK_SIZE:] if len(chunk) >= PARTIAL_BLOCK_SIZE \
+                else (tail + chunk)[-PARTIAL_BLOCK_SIZE:]
+    shutil.copystat(source, target)
+    
+    full = digest.hexdigest()
+    size = os.path.getsize(target)
+    if size <= PARTIAL_BLOCK_SIZE * 2:
+        return full, full
+    partial = new_hash()
+    partial.update(head)
+    partial.update(tail)
+    return partial.hexdigest(), full
+
+class ImportItem:
+    """一个要导入的文件"""
+    
+    def __init__(self, source, target):
+        self.source = Path(source)
+        self.target = Path(target)
+        self.method = None  # reflink / hardlink / copy
+        self.error = None
+        
+    def __repr__(self):
+        return f"ImportItem({self.source} -> {self.target})"
+
+def collect_imports(sources, library_root):
+    """确定导入目标：单个文件放在音乐库根目录，文件夹保持原有的目录结构
+
+    返回ImportItem列表，歌词等附属文件跟随音频文件一起导入。
+    """
+    library_root = Path(library_root)
+    items = []
+    for source in map(Path, sources):
+        if source.is_dir():
+            for directory, _, names in os.walk(source):
+                relative = Path(directory).relative_to(source.parent)
+                items.extend(ImportItem(Path(directory) / name, library_root / relative / name)
+                             for name in sorted(names) if is_audio_file(name))
+        elif is_audio_file(source):
+            items.append(ImportItem(source, library_root / source.name))
+            
+    sidecars = []
+    for item in items:
+        for suffix in SIDECAR_SUFFIXES:
+            sidecar = item.source.with_suffix(suffix)
+            if sidecar.exists():
+                sidecars.append(ImportItem(sidecar, item.target.with_suffix(suffix)))
+    return items, sidecars
+
+class LibraryImporter:
+    """把外部文件导入音乐库（不依赖Qt）
+
+    同一文件系统上优先用reflink（写时复制），不支持时用硬链接，都不需要复制数据；
+    跨设备时在线程池中用大缓冲区复制，复制的同时计算哈希并直接写入内容索引。
+    导入的歌曲会预先解析标签，界面收到增量后直接命中元数据缓存，不需要重新扫描。
+    注意硬链接与原文件共享数据，在音乐库中修改标签也会改到原文件。
+    """
+    MAX_COPY_WORKERS = 4
+    
+    def __init__(self, sources, library_root, index=None, metadata=None, progress=None):
+        self.sources = list(sources)
+        self.library_root = Path(library_root)
+        self.index = index
+        self.metadata = metadata
+        self.progress = progress
+        self._is_running = True
+        self._reserved = set()
+        self._done = 0
+        self._last_report = 0.0
+        
+    def stop(self):
+        """停止（已开始的文件会完成）"""
+        self._is_running = False
+        
+    def run(self):
+        """执行导入，返回 (LibraryDelta, 失败的ImportItem)"""
+        items, sidecars = collect_imports(self.sources, self.library_root)
+        for item in items:
+            item.target = self._unique_target(item.target)
+        # 附属文件跟随音频文件改名
+        targets = {item.source.with_suffix(''): item.target for item in items}
+        for sidecar in sidecars:
+            target = targets.get(sidecar.source.with_suffix(''))
+            if target is not None:
+                sidecar.target = target.with_suffix(sidecar.target.suffix)
+                
+        delta = LibraryDelta()
+        failures = []
+        hashes = []
+        total = len(items)
+        if not items:
+            return delta, failures
+            
+        with ThreadPoolExecutor(max_workers=self.MAX_COPY_WORKERS) as executor:
+            futures = {executor.submit(self._import, item): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                result = future.result()
+                if result is None:
+                    failures.append(item)
+                else:
+                    delta.added.append(item.target)
+                    hashes.append(result)
+                self._report(total)
+                
+        for sidecar in sidecars:
+            if sidecar.target.parent.exists() and not sidecar.target.exists():
+                try:
+                    shutil.copy2(sidecar.source, sidecar.target)
+                except OSError as e:
+                    logging.warning(f"导入附属文件失败 {sidecar.source}: {e}")
+                    
+        if self.index is not None:
+            self.index.record_hashes(hashes)
+        return delta, failures
+        
+    def _unique_target(self, target):
+        """目标已存在（或已被本批次占用）时换一个不冲突的名字"""
+        candidate = target
+        counter = 1
+        while candidate in self._reserved or candidate.exists():
+            candidate = target.parent / f"{target.stem}_{counter}{target.suffix}"
+            counter += 1
+        self._reserved.add(candidate)
+        return candidate
+        
+    def _import(self, item):
+        """导入单个文件，返回内容索引记录 (路径, 大小, 修改时间, 部分哈希, 完整哈希)，失败返回None"""
+        if not self._is_running:
+            item.error = "导入已取消"
+            return None
+        try:
+            item.target.parent.mkdir(parents=True, exist_ok=True)
+            partial = full = None
+            if same_device(item.source, item.target.parent):
+                item.method = self._link(item.source, item.target)
+            if item.method is None:
+                try:
+                    partial, full = hashing_copy(item.source, item.target)
+                except BaseException:
+                    if item.target.exists():
+                        item.target.unlink()
+                    raise
+                item.method = 'copy'
+        except Exception as e:
+            item.error = str(e)
+            logging.error(f"导入失败 {item.source}: {e}")
+            return None
+            
+        if self.metadata is not None:
+            try:
+                self.metadata.read_track(item.target)
+            except Exception as e:
+                logging.warning(f"读取导入文件信息失败 {item.target}: {e}")
+        st = item.target.stat()
+        return str(item.target), st.st_size, st.st_mtime_ns, partial, full
+        
+    def _link(self, source, target):
+        """不复制数据地导入，返回使用的方式，都不支持时返回None"""
+        try:
+            reflink(source, target)
+            return 'reflink'
+        except OSError:
+            pass
+        try:
+            os.link(source, target)
+            return 'hardlink'
+        except OSError:
+            # FAT等文件系统不支持硬链接
+            return None
+            
+    def _report(self, total):
+        """汇报进度（合并高频更新）"""
+        self._done += 1
+        now = time.monotonic()
+        if self.progress and (self._done == total or now - self._last_report >= 0.1):
+            self._last_report = now
+            self.progress(self._done, total)
+
+class ImportThread(QThread):
+    """后台导入音乐，完成后以LibraryDelta（added）返回结果"""
+    progress = pyqtSignal(int, int)
+    finished_batch = pyqtSignal(object, list)
+    error = pyqtSignal(str)
+    
+    def __init__(self, sources, library_root, index=None, metadata=None, parent=None):
+        super().__init__(parent)
+        self.importer = LibraryImporter(sources, library_root, index, metadata, self.progress.emit)
+        
+    def stop(self):
+        self.importer.stop()
+        
+    def run(self):
+        try:
+            delta, failures = self.importer.run()
+            self.finished_batch.emit(delta, failures)
+        except Exception as e:
+            logging.error(f"导入音乐失败: {e}")
+            self.error.emit(str(e))
@@ -0,0 +1,364 @@
+import os
+import struct
+import shutil
+import logging
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PyQt5.QtCore import QThread, pyqtSignal
+from mutagen import File, MutagenError
+from mutagen.mp3 import MP3
+from mutagen.flac import FLAC
+from mutagen.mp4 import MP4
+from mutagen.ogg import OggFileType
+
+# 检查文件结尾时读取的字节数
+TAIL_SIZE = 64 * 1024
+# 用ffmpeg试解码的结尾秒数
+TAIL_SECONDS = 10
+
+# ---- MP3 ----
+
+# 比特率表（kbps）：(MPEG1, MPEG2/2.5) x (Layer1, Layer2, Layer3)
+MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+# 音频帧之后允许出现的标签
+MP3_TRAILING_TAGS = (b'TAG', b'APETAGEX', b'LYRICS200')
+
+def mp3_frame_length(header):
+    """解析MPEG音频帧头，返回 (帧长度, 每帧采样数, 采样率)，不是合法帧头时返回None"""
+    if header >> 21 != 0x7FF:
+        return None
+    version = (header >> 19) & 3
+    layer = 4 - ((header >> 17) & 3)
+    bitrate_index = (header >> 12) & 15
+    rate_index = (header >> 10) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    padding = (header >> 9) & 1
+    bitrate = MP3_BITRATES[(1 if version == 3 else 2, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 3 and version != 3:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+def id3v2_size(data):
+    """文件开头ID3v2标签的总长度"""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+def check_mp3(path, audio):
+    """逐帧检查帧同步，并与Xing/VBRI头记录的时长比较"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = id3v2_size(data)
+    # 有些文件的ID3v2后面有填充的零字节
+    while offset < len(data) and data[offset] == 0:
+        offset += 1
+        
+    frames = 0
+    samples = 0
+    sample_rate = 0
+    end = len(data)
+    while offset + 4 <= end:
+        parsed = mp3_frame_length(struct.unpack_from('>I', data, offset)[0])
+        if parsed is None:
+            if data.startswith(MP3_TRAILING_TAGS, offset):
+                break
+            if frames == 0:
+                return "找不到MP3音频帧"
+            return f"第 {frames} 帧之后数据损坏"
+        length, frame_samples, sample_rate = parsed
+        if offset + length > end:
+            return "文件被截断（最后一帧不完整）"
+        offset += length
+        frames += 1
+        samples += frame_samples
+        
+    if frames == 0:
+        return "找不到MP3音频帧"
+    # 可变码率文件的时长来自Xing头，实际帧数明显更少说明文件被截断
+    expected = getattr(audio.info, 'length', 0)
+    actual = samples / sample_rate
+    if expected and actual < expected - 1:
+        return f"文件被截断（应为 {expected:.0f} 秒，实际 {actual:.0f} 秒）"
+    return None
+
+# ---- FLAC ----
+
+def crc_table(poly, width):
+    top = 1 << (width - 1)
+    mask = (1 << width) - 1
+    table = []
+    for byte in range(256):
+        crc = byte << (width - 8)
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) if crc & top else (crc << 1)
+        table.append(crc & mask)
+    return table
+
+CRC8_TABLE = crc_table(0x07, 8)
+CRC16_TABLE = crc_table(0x8005, 16)
+
+def crc8(data):
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+def crc16(data):
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ CRC16_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+FLAC_BLOCK_SIZES = {1: 192, 2: 576, 3: 1152, 4: 2304, 5: 4608,
+                    8: 256, 9: 512, 10: 1024, 11: 2048, 12: 4096, 13: 8192, 14: 16384, 15: 32768}
+
+def flac_frame_header(data, offset, min_block_size):
+    """解析FLAC帧头，返回 (第一个采样的序号, 采样数)，CRC不符时返回None"""
+    if offset + 6 > len(data) or data[offset] != 0xFF or data[offset + 1] not in (0xF8, 0xF9):
+        return None
+    block_code = data[offset + 2] >> 4
+    rate_code = data[offset + 2] & 15
+    if block_code == 0 or rate_code == 15 or data[offset + 3] & 1:
+        return None
+        
+    # UTF-8方式编码的帧号（固定块大小）或采样序号（可变块大小）
+    pos = offset + 4
+    first = data[pos]
+    extra = 0
+    while extra < 7 and first & (0x80 >> extra):
+        extra += 1
+    if extra == 1 or extra > 7:
+        return None
+    number = first & (0x7F >> extra) if extra else first
+    for _ in range(max(extra - 1, 0)):
+        pos += 1
+        if pos >= len(data) or data[pos] & 0xC0 != 0x80:
+            return None
+        number = (number << 6) | (data[pos] & 0x3F)
+    pos += 1
+    
+    if block_code == 6:
+        block_size = data[pos] + 1
+        pos += 1
+    elif block_code == 7:
+        block_size = int.from_bytes(data[pos:pos + 2], 'big') + 1
+        pos += 2
+    else:
+        block_size = FLAC_BLOCK_SIZES[block_code]
+    if rate_code == 12:
+        pos += 1
+    elif rate_code in (13, 14):
+        pos += 2
+    if pos >= len(data) or crc8(data[offset:pos]) != data[pos]:
+        return None
+        
+    if data[offset + 1] == 0xF8:
+        number *= min_block_size
+    return number, block_size
+
+def check_flac(path, audio):
+    """检查最后一帧是否完整并且正好结束在STREAMINFO记录的采样数，有ffmpeg时再校验音频MD5"""
+    info = audio.info
+    total = info.total_samples
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(max(size - TAIL_SIZE, 0))
+        tail = f.read()
+        
+    # 从后往前找最后一个合法帧头
+    min_block_size = getattr(info, 'min_blocksize', 0) or 4096
+    offset = len(tail)
+    while True:
+        offset = tail.rfind(b'\xff', 0, offset)
+        if offset < 0:
+            return "找不到FLAC音频帧"
+        header = flac_frame_header(tail, offset, min_block_size)
+        if header is not None:
+            break
+    first, block_size = header
+    if total and first + block_size < total:
+        return f"文件被截断（缺少 {(total - first - block_size) / info.sample_rate:.0f} 秒）"
+    frame = tail[offset:]
+    if crc16(frame[:-2]) != int.from_bytes(frame[-2:], 'big'):
+        return "最后一帧校验失败"
+        
+    md5 = getattr(info, 'md5_signature', 0)
+    if md5 and shutil.which('ffmpeg'):
+        actual = flac_audio_md5(path, info.bits_per_sample)
+        if actual is not None and actual != md5:
+            return "音频MD5校验失败"
+    return None
+
+def flac_audio_md5(path, bits_per_sample):
+    """用ffmpeg解码计算音频数据的MD5（与STREAMINFO中的MD5算法一致）"""
+    sample_format = {8: 's8', 16: 's16le', 24: 's24le', 32: 's32le'}.get(bits_per_sample)
+    if sample_format is None:
+        return None
+    result = run_ffmpeg(['-i', str(path), '-map', '0:a:0', '-c:a', f'pcm_{sample_format}',
+                         '-f', 'md5', '-'])
+    output = result.stdout.decode('ascii', 'replace').strip()
+    if result.returncode != 0 or not output.startswith('MD5='):
+        return None
+    return int(output[4:], 16)
+
+# ---- MP4 ----
+
+def check_mp4(path, audio):
+    """检查顶层atom结构：每个atom都完整，并且有moov和mdat"""
+    size = os.path.getsize(path)
+    found = set()
+    with open(path, 'rb') as f:
+        offset = 0
+        while offset + 8 <= size:
+            f.seek(offset)
+            atom_size, name = struct.unpack('>I4s', f.read(8))
+            if atom_size == 1:
+                atom_size = struct.unpack('>Q', f.read(8))[0]
+            elif atom_size == 0:
+                atom_size = size - offset
+            if atom_size < 8:
+                return f"atom结构损坏（位置 {offset}）"
+            if offset + atom_size > size:
+                return f"文件被截断（{name.decode('latin-1')} 不完整）"
+            found.add(name)
+            offset += atom_size
+    missing = {b'moov', b'mdat'} - found
+    if missing:
+        return f"缺少 {b', '.join(sorted(missing)).decode()}"
+    return None
+
+# ---- Ogg ----
+
+def check_ogg(path, audio):
+    """最后一页应该带有流结束标记"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(max(size - TAIL_SIZE, 0))
+        tail = f.read()
+    offset = tail.rfind(b'OggS')
+    if offset < 0 or offset + 27 > len(tail):
+        return "找不到Ogg页"
+    segments = tail[offset + 26]
+    table = tail[offset + 27:offset + 27 + segments]
+    if offset + 27 + segments + sum(table) > len(tail):
+        return "文件被截断（最后一页不完整）"
+    if not tail[offset + 5] & 0x04:
+        return "文件被截断（没有流结束标记）"
+    return None
+
+# ---- 通用 ----
+
+def run_ffmpeg(arguments):
+    return subprocess.run(
+        [shutil.which('ffmpeg'), '-v', 'error', '-nostdin'] + arguments,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+    )
+
+def check_tail_decodes(path):
+    """用ffmpeg解码最后几秒，有错误时返回第一条错误信息"""
+    result = run_ffmpeg(['-sseof', f'-{TAIL_SECONDS}', '-i', str(path), '-f', 'null', '-'])
+    errors = result.stderr.decode('utf-8', 'replace').strip()
+    if result.returncode != 0 or errors:
+        return f"结尾无法解码: {errors.splitlines()[0] if errors else result.returncode}"
+    return None
+
+STRUCTURE_CHECKS = ((MP3, check_mp3), (FLAC, check_flac), (MP4, check_mp4), (OggFileType, check_ogg))
+
+def check_file(path):
+    """检查音频文件是否完整，正常返回None，否则返回问题描述"""
+    try:
+        if os.path.getsize(path) == 0:
+            return "文件为空"
+        audio = File(path)
+    except (OSError, MutagenError) as e:
+        return f"无法解析: {e}"
+    if audio is None:
+        return "无法识别的音频格式"
+        
+    try:
+        for file_type, check in STRUCTURE_CHECKS:
+            if isinstance(audio, file_type):
+                problem = check(path, audio)
+                if problem:
+                    return problem
+                break
+        if shutil.which('ffmpeg'):
+            return check_tail_decodes(path)
+    except (OSError, struct.error, IndexError) as e:
+        return f"检查失败: {e}"
+    return None
+
+class IntegrityCheckThread(QThread):
+    """检查音乐库中的文件是否完整
+
+    检查在进程池中并行，结果记入内容索引，之后只检查新增或修改过的文件。
+    """
+    progress = pyqtSignal(int, int)
+    finished_check = pyqtSignal(dict)  # 路径 -> 问题描述（只包含有问题的文件）
+    error = pyqtSignal(str)
+    
+    def __init__(self, index, paths, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.paths = [str(p) for p in paths]
+        self._is_running = True
+        
+    def stop(self):
+        self._is_running = False
+        
+    def run(self):
+        try:
+            paths = self.index.update(self.paths)
+            todo = self.index.unchecked(paths)
+            self.progress.emit(0, len(todo))
+            if todo:
+                self._check(todo)
+            if self._is_running:
+                self.finished_check.emit(self.index.problems(paths))
+        except Exception as e:
+            logging.error(f"检查文件失败: {e}")
+            self.error.emit(str(e))
+            
+    def _check(self, todo):
+        """在进程池中检查，每完成一批就写入索引"""
+        results = []
+        executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 2)
+        futures = {}
+        try:
+            futures = {executor.submit(check_file, path): path for path in todo}
+            for done, future in enumerate(as_completed(futures), 1):
+                if not self._is_running:
+                    break
+                path = futures[future]
+                try:
+                    results.append((path, future.result()))
+                except Exception as e:
+                    logging.warning(f"检查文件失败 {path}: {e}")
+                if len(results) >= 200:
+                    self.index.record_checks(results)
+                    results = []
+                self.progress.emit(done, len(todo))
+        finally:
+            # 停止时取消还没开始的任务（shutdown的cancel_futures参数需要Python 3.9）
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self.index.record_checks(results)
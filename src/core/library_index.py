@@ -0,0 +1,78 @@
+from pathlib import Path
+
+class LibraryDelta:
+    """音乐库增量变更"""
+    
+    def __init__(self, added=None, removed=None, modified=None, renamed=None):
+        self.added = list(added or [])        # 新增文件路径
+        self.removed = list(removed or [])    # 删除文件路径
+        self.modified = list(modified or [])  # 内容变化的文件路径
+        self.renamed = list(renamed or [])    # (旧路径, 新路径)
+        
+    def is_empty(self):
+        """是否没有任何变更"""
+        return not (self.added or self.removed or self.modified or self.renamed)
+        
+    def merge(self, other):
+        """合并另一个增量"""
+        self.added.extend(other.added)
+        self.removed.extend(other.removed)
+        self.modified.extend(other.modified)
+        self.renamed.extend(other.renamed)
+        return self
+        
+    def __repr__(self):
+        return (f"LibraryDelta(added={len(self.added)}, removed={len(self.removed)}, "
+                f"modified={len(self.modified)}, renamed={len(self.renamed)})")
+
+class LibraryIndex:
+    """音乐库索引，按路径保存Track记录"""
+    
+    def __init__(self):
+        self._songs = {}
+        
+    def __len__(self):
+        return len(self._songs)
+        
+    def __contains__(self, path):
+        return str(path) in self._songs
+        
+    def __iter__(self):
+        return iter(self._songs.values())
+        
+    def clear(self):
+        """清空索引"""
+        self._songs.clear()
+        
+    def get(self, path):
+        """获取歌曲记录"""
+        return self._songs.get(str(path))
+        
+    def paths(self):
+        """获取所有歌曲路径"""
+        return [Path(p) for p in self._songs]
+        
+    def add(self, track):
+        """添加或更新歌曲"""
+        self._songs[track.path] = track
+        
+    def remove(self, path):
+        """移除歌曲，返回被移除的记录"""
+        return self._songs.pop(str(path), None)
+        
+    def rename(self, old_path, new_path):
+        """更新歌曲路径"""
+        track = self._songs.pop(str(old_path), None)
+        if track is None:
+            return None
+            
+        track.path = str(new_path)
+        self._songs[track.path] = track
+        return track
+        
+    def group_by(self, field):
+        """按字段分组，返回 值 -> 歌曲列表"""
+        groups = {}
+        for track in self._songs.values():
+            groups.setdefault(getattr(track, field), []).append(track)
+        return groups
@@ -0,0 +1,165 @@
+import os
+import mmap
+import struct
+import logging
+from pathlib import Path
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.track import Track
+from core.library_index import LibraryDelta
+from core.library_watcher import scan_tree
+
+LIBRARY_SNAPSHOT = Path.home() / '.bilibili_music_extractor' / 'library.snapshot'
+
+SNAPSHOT_MAGIC = b'BMLS'
+SNAPSHOT_VERSION = 1
+
+# 文件头：魔数, 版本, 歌曲数, 字符串数, 音乐库根目录在字符串表中的序号, 字符串表字节数
+HEADER = struct.Struct('<4sIIIIQ')
+# 定长记录：6个字符串的序号 + 时长 + 大小 + 修改时间
+STRING_FIELDS = ('path', 'title', 'artist', 'album', 'genre', 'year')
+RECORD = struct.Struct('<6IdQd')
+# 字符串表：所有不重复的字符串以\0分隔，UTF-8编码
+STRING_SEPARATOR = '\0'
+
+# 修改时间以浮点秒保存，与纳秒时间戳比较时允许的误差
+MTIME_TOLERANCE = 1e-6
+
+def save_snapshot(root, tracks, path=None):
+    """把音乐库保存为二进制快照：文件头 + 定长记录 + 字符串表
+
+    歌手、专辑、风格等重复的字符串在表中只保存一次。先写临时文件再替换，
+    中断时不会留下损坏的快照。返回保存的歌曲数。
+    """
+    path = Path(path or LIBRARY_SNAPSHOT)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    strings = {}
+    
+    def ref(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+        
+    records = bytearray()
+    count = 0
+    for track in tracks:
+        records += RECORD.pack(*[ref(getattr(track, field)) for field in STRING_FIELDS],
+                               track.duration, track.size, track.mtime)
+        count += 1
+    root_index = ref(str(root))
+    # 标签中偶尔混入的\0会破坏分隔，直接去掉
+    table = STRING_SEPARATOR.join(text.replace(STRING_SEPARATOR, '') for text in strings).encode('utf-8')
+    
+    temp = path.with_name(path.name + '.tmp')
+    try:
+        with open(temp, 'wb') as f:
+            f.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, count, len(strings), root_index, len(table)))
+            f.write(records)
+            f.write(table)
+        os.replace(temp, path)
+    except BaseException:
+        if temp.exists():
+            temp.unlink()
+        raise
+    return count
+
+def load_snapshot(root, path=None):
+    """读取快照中的歌曲记录；快照不存在、已损坏或属于其他目录时返回None
+
+    文件以内存映射方式读取，定长记录直接从映射中解包；
+    字符串表整体解码一次，相同的字符串在所有记录间共享同一个对象。
+    """
+    path = Path(path or LIBRARY_SNAPSHOT)
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                return read_tracks(view, str(root))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, IndexError, struct.error, UnicodeDecodeError) as e:
+        logging.warning(f"读取音乐库快照失败 {path}: {e}")
+        return None
+
+def read_tracks(buffer, root):
+    """从快照内容（memoryview，不复制）中解出Track列表，根目录不符时返回None"""
+    magic, version, count, string_count, root_index, table_size = HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    records_end = HEADER.size + count * RECORD.size
+    if records_end + table_size != len(buffer):
+        raise ValueError("快照文件不完整")
+    strings = str(buffer[records_end:], 'utf-8').split(STRING_SEPARATOR)
+    if len(strings) != string_count:
+        raise ValueError("快照字符串表不完整")
+    if strings[root_index] != root:
+        return None
+        
+    from_values = Track.from_values
+    return [
+        from_values(strings[path], strings[title], strings[artist], strings[album],
+                    strings[genre], strings[year], duration, size, mtime)
+        for path, title, artist, album, genre, year, duration, size, mtime
+        in RECORD.iter_unpack(buffer[HEADER.size:records_end])
+    ]
+
+def snapshot_delta(known, files):
+    """比较快照与扫描结果，返回 (新增, 删除, 修改) 路径列表
+
+    known为快照中的 路径 -> (大小, 修改时间)，files为scan_tree得到的
+    目录 -> {文件名: (大小, 修改时间ns, inode)}。
+    """
+    known = dict(known)
+    added = []
+    modified = []
+    for directory, names in files.items():
+        for name, (size, mtime_ns, _) in names.items():
+            path = os.path.join(directory, name)
+            recorded = known.pop(path, None)
+            if recorded is None:
+                added.append(path)
+            elif recorded[0] != size or abs(recorded[1] - mtime_ns / 1e9) > MTIME_TOLERANCE:
+                modified.append(path)
+    return added, list(known), modified
+
+class LibraryScanThread(QThread):
+    """在后台扫描音乐库目录并与快照比较
+
+    界面先显示快照中的歌曲，扫描完成后只应用差异；新增和修改的歌曲在这里读取标签，
+    目录扫描结果直接交给LibraryWatcher作为监视快照，界面线程不需要再遍历目录。
+    """
+    progress = pyqtSignal(int, int)
+    finished_scan = pyqtSignal(object, object, dict)  # scan_tree结果, LibraryDelta, 路径 -> Track
+    error = pyqtSignal(str)
+    
+    def __init__(self, root, known, metadata, parent=None):
+        super().__init__(parent)
+        self.root = str(root)
+        self.known = known  # 路径 -> (大小, 修改时间)
+        self.metadata = metadata
+        self._is_running = True
+        
+    def stop(self):
+        self._is_running = False
+        
+    def run(self):
+        try:
+            tree = scan_tree(self.root)
+            added, removed, modified = snapshot_delta(self.known, tree[0])
+            changed = added + modified
+            tracks = {}
+            for done, path in enumerate(changed, 1):
+                if not self._is_running:
+                    return
+                try:
+                    tracks[path] = self.metadata.read_track(path)
+                except Exception as e:
+                    logging.error(f"加载歌曲失败 {path}: {e}")
+                if done % 200 == 0:
+                    self.progress.emit(done, len(changed))
+            delta = LibraryDelta(added=map(Path, added), removed=map(Path, removed), modified=map(Path, modified))
+            logging.info(f"音乐库快照校验: {delta}")
+            self.finished_scan.emit(tree, delta, tracks)
+        except Exception as e:
+            logging.error(f"扫描音乐库失败 {self.root}: {e}")
+            self.error.emit(str(e))
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.operation_journal import copy_file
+from core.content_index import full_hash
+from core.file_operations import SIDECAR_SUFFIXES
+
+# 目标目录中的清单文件，记录每个文件同步时源文件的大小和修改时间
+MANIFEST_NAME = '.bilibili_music_sync.json'
+MANIFEST_VERSION = 1
+
+# FAT文件系统的修改时间精度为2秒
+MTIME_TOLERANCE_NS = 2 * 10 ** 9
+
+class SyncManifest:
+    """同步清单：相对路径 -> (源文件大小, 源文件修改时间)
+
+    下次同步时，源文件没有变化的条目直接跳过，不需要访问目标设备，
+    所以比较的开销只和变化的文件数有关。
+    """
+    
+    def __init__(self, target_dir):
+        self.path = Path(target_dir) / MANIFEST_NAME
+        self.files = {}
+        self.exists = False
+        
+    @classmethod
+    def load(cls, target_dir):
+        manifest = cls(target_dir)
+        try:
+            with open(manifest.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                manifest.files = {rel: tuple(value) for rel, value in data.get('files', {}).items()}
+                manifest.exists = True
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取同步清单失败 {manifest.path}: {e}")
+        return manifest
+        
+    def save(self):
+        """原子地写入清单（先写临时文件再替换）"""
+        temp = self.path.with_name(self.path.name + '.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'time': time.time(),
+                       'files': self.files}, f, ensure_ascii=False)
+        os.replace(temp, self.path)
+
+def library_files(paths, library_root):
+    """要同步的文件：相对路径 -> 源文件（包括歌词等附属文件）"""
+    files = {}
+    for path in map(Path, paths):
+        try:
+            relative = path.relative_to(library_root)
+        except ValueError:
+            continue
+        files[relative.as_posix()] = path
+        for suffix in SIDECAR_SUFFIXES:
+            sidecar = path.with_suffix(suffix)
+            if sidecar.exists():
+                files[relative.with_suffix(suffix).as_posix()] = sidecar
+    return files
+
+def same_content(source, target, source_stat, index=None):
+    """没有清单时判断目标文件是否与源文件相同：先比大小和修改时间，再比哈希"""
+    try:
+        target_stat = os.stat(target)
+    except OSError:
+        return False
+    if target_stat.st_size != source_stat.st_size:
+        return False
+    if abs(target_stat.st_mtime_ns - source_stat.st_mtime_ns) <= MTIME_TOLERANCE_NS:
+        return True
+    record = index.get(source) if index is not None else None
+    source_hash = record[3] if record and record[:2] == (source_stat.st_size, source_stat.st_mtime_ns) else None
+    return (source_hash or full_hash(source)) == full_hash(target)
+
+def sync_copy(source, target):
+    """复制到临时文件后替换目标，中断时目标不会是半个文件"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp = target.with_name(target.name + '.part')
+    if temp.exists():
+        temp.unlink()
+    try:
+        copy_file(source, temp)
+        os.replace(temp, target)
+    except BaseException:
+        if temp.exists():
+            temp.unlink()
+        raise
+
+def remove_empty_dirs(path, stop):
+    """删除文件后向上清理空目录（不超过目标根目录）"""
+    path = Path(path)
+    while path != stop and stop in path.parents:
+        try:
+            path.rmdir()
+        except OSError:
+            return
+        path = path.parent
+
+class LibrarySync:
+    """把音乐库增量同步到外部目录或设备（不依赖Qt）
+
+    有清单时只比较源文件的大小和修改时间；没有清单（第一次同步或清单丢失）时
+    才逐个查看目标文件，大小相同但时间不同的再比较哈希。
+    只删除清单中记录过的文件，目标目录中用户自己放的文件不受影响。
+    """
+    MAX_WORKERS = 4
+    SAVE_INTERVAL = 50
+    
+    def __init__(self, paths, library_root, target_dir, index=None, progress=None):
+        self.paths = list(paths)
+        self.library_root = Path(library_root)
+        self.target_dir = Path(target_dir)
+        self.index = index
+        self.progress = progress
+        self._is_running = True
+        
+    def stop(self):
+        self._is_running = False
+        
+    def plan(self, manifest):
+        """比较差异，返回 (要复制的 [(相对路径, 源文件, 源文件状态)], 要删除的相对路径)"""
+        files = library_files(self.paths, self.library_root)
+        copies = []
+        for relative, source in files.items():
+            try:
+                st = os.stat(source)
+            except OSError:
+                continue
+            recorded = manifest.files.get(relative)
+            if recorded == (st.st_size, st.st_mtime_ns):
+                continue
+            if recorded is None and not manifest.exists and \
+                    same_content(source, self.target_dir / relative, st, self.index):
+                # 已经存在相同的文件，只补上清单记录
+                manifest.files[relative] = (st.st_size, st.st_mtime_ns)
+                continue
+            copies.append((relative, source, st))
+        stale = [relative for relative in manifest.files if relative not in files]
+        return copies, stale
+        
+    def run(self):
+        """执行同步，返回 (复制数, 删除数, 失败的 (相对路径, 错误信息))"""
+        self.target_dir.mkdir(parents=True, exist_ok=True)
+        manifest = SyncManifest.load(self.target_dir)
+        copies, stale = self.plan(manifest)
+        total = len(copies) + len(stale)
+        done = 0
+        failures = []
+        
+        deleted = 0
+        for relative in stale:
+            if not self._is_running:
+                break
+            target = self.target_dir / relative
+            try:
+                if target.exists():
+                    target.unlink()
+                remove_empty_dirs(target.parent, self.target_dir)
+                del manifest.files[relative]
+                deleted += 1
+            except OSError as e:
+                failures.append((relative, str(e)))
+            done += 1
+            self._report(done, total)
+            
+        copied = 0
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            futures = {executor.submit(self._copy, source, self.target_dir / relative): (relative, st)
+                       for relative, source, st in copies}
+            try:
+                for future in as_completed(futures):
+                    relative, st = futures[future]
+                    try:
+                        future.result()
+                        manifest.files[relative] = (st.st_size, st.st_mtime_ns)
+                        copied += 1
+                        if copied % self.SAVE_INTERVAL == 0:
+                            manifest.save()
+                    except Exception as e:
+                        logging.warning(f"同步失败 {relative}: {e}")
+                        failures.append((relative, str(e)))
+                    done += 1
+                    self._report(done, total)
+            finally:
+                manifest.save()
+        return copied, deleted, failures
+        
+    def _copy(self, source, target):
+        if not self._is_running:
+            raise Exception("同步已取消")
+        sync_copy(source, target)
+        
+    def _report(self, done, total):
+        if self.progress:
+            self.progress(done, total)
+
+class LibrarySyncThread(QThread):
+    """后台同步音乐库"""
+    progress = pyqtSignal(int, int)
+    finished_sync = pyqtSignal(int, int, list)  # 复制数, 删除数, 失败的 (相对路径, 错误信息)
+    error = pyqtSignal(str)
+    
+    def __init__(self, paths, library_root, target_dir, index=None, parent=None):
+        super().__init__(parent)
+        self.sync = LibrarySync(paths, library_root, target_dir, index, self.progress.emit)
+        
+    def stop(self):
+        self.sync.stop()
+        
+    def run(self):
+        try:
+            copied, deleted, failures = self.sync.run()
+            self.finished_sync.emit(copied, deleted, failures)
+        except Exception as e:
+            logging.error(f"同步音乐库失败: {e}")
+            self.error.emit(str(e))
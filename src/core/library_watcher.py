@@ -0,0 +1,312 @@
+import os
+import logging
+from pathlib import Path
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+from core.library_index import LibraryDelta
+from utils.helpers import is_audio_file
+
+def scan_dir(directory):
+    """扫描单个目录，返回 ({文件名: (大小, 修改时间ns, inode)}, 子目录集合)，无法读取时返回 (None, None)"""
+    files = {}
+    subdirs = set()
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        # 隐藏目录（如回收站）不属于音乐库
+                        if not entry.name.startswith('.'):
+                            subdirs.add(entry.path)
+                    elif entry.is_file() and is_audio_file(entry.name):
+                        st = entry.stat()
+                        files[entry.name] = (st.st_size, st.st_mtime_ns, st.st_ino)
+                except OSError:
+                    continue
+    except OSError:
+        return None, None
+    return files, subdirs
+
+def rename_key(stat):
+    """识别重命名用的 (inode, 大小)；没有inode时返回None
+
+    Windows上DirEntry.stat()的st_ino总是0，不能据此配对，
+    否则任意两个大小相同的文件一删一增都会被当成重命名。
+    """
+    if not stat[2]:
+        return None
+    return (stat[2], stat[0])
+
+def scan_tree(top):
+    """扫描整个目录树（不依赖Qt，可在后台线程中运行）
+
+    返回 (目录 -> 文件, 目录 -> 子目录, 目录 -> 扫描时的修改时间)，
+    可以交给LibraryWatcher.adopt直接作为快照使用。
+    """
+    files = {}
+    subdirs = {}
+    dir_mtimes = {}
+    stack = [str(top)]
+    while stack:
+        directory = stack.pop()
+        if directory in files:
+            continue
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            continue
+        dir_files, dir_subdirs = scan_dir(directory)
+        if dir_files is None:
+            continue
+        files[directory] = dir_files
+        subdirs[directory] = dir_subdirs
+        dir_mtimes[directory] = mtime
+        stack.extend(dir_subdirs)
+    return files, subdirs, dir_mtimes
+
+class LibraryWatcher(QObject):
+    """音乐库目录监视器
+
+    基于QFileSystemWatcher（Linux下为inotify，Windows下为ReadDirectoryChangesW），
+    无法监视的目录退回到定时轮询。目录事件经过去抖后只重新扫描发生变化的目录，
+    与上次快照比较得到增量变更。
+    """
+    changed = pyqtSignal(object)  # LibraryDelta
+    
+    DEBOUNCE_MS = 300
+    POLL_INTERVAL_MS = 5000
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self._watcher = None
+        # 目录 -> {文件名: (大小, 修改时间, inode)}
+        self._files = {}
+        # 目录 -> 子目录集合
+        self._subdirs = {}
+        self._polled_dirs = set()
+        self._pending_dirs = set()
+        # 本轮被删除文件的路径 -> (inode, 大小)，用于识别重命名
+        self._removed_keys = {}
+        
+        self._debounce_timer = QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.timeout.connect(self.flush)
+        
+        self._poll_timer = QTimer(self)
+        self._poll_timer.timeout.connect(self.poll)
+        
+    def watch(self, root):
+        """开始监视音乐库根目录，返回当前所有音频文件"""
+        self.stop()
+        self.root = Path(root)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self.on_directory_changed)
+        
+        audio_files = []
+        for directory in self._walk(str(self.root)):
+            audio_files.extend(
+                Path(directory) / name for name in self._files[directory]
+            )
+        return audio_files
+        
+    def adopt(self, root, files, subdirs, dir_mtimes):
+        """使用后台扫描（scan_tree）的结果开始监视，不在界面线程中重新扫描
+
+        扫描之后又有变化的目录（修改时间不同）会在去抖后重新扫描。
+        """
+        self.stop()
+        self.root = Path(root)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self.on_directory_changed)
+        self._files.update(files)
+        self._subdirs.update(subdirs)
+        for directory, mtime in dir_mtimes.items():
+            self._add_watch(directory)
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    self._pending_dirs.add(directory)
+            except OSError:
+                self._pending_dirs.add(directory)
+        if self._pending_dirs:
+            self._debounce_timer.start(self.DEBOUNCE_MS)
+            
+    def stop(self):
+        """停止监视"""
+        self._debounce_timer.stop()
+        self._poll_timer.stop()
+        if self._watcher is not None:
+            self._watcher.directoryChanged.disconnect(self.on_directory_changed)
+            self._watcher.deleteLater()
+            self._watcher = None
+        self._files.clear()
+        self._subdirs.clear()
+        self._polled_dirs.clear()
+        self._pending_dirs.clear()
+        self._removed_keys.clear()
+        
+    def is_polling(self):
+        """是否有目录处于轮询模式"""
+        return bool(self._polled_dirs)
+        
+    def notify(self, delta):
+        """合并程序自身产生的变更（重命名、移动等），避免重复扫描"""
+        for old_path, new_path in delta.renamed:
+            self._forget(old_path)
+            self._remember(new_path)
+        for path in delta.removed:
+            self._forget(path)
+        for path in delta.added + delta.modified:
+            self._remember(path)
+            
+    def on_directory_changed(self, directory):
+        """目录变化事件（去抖）"""
+        self._pending_dirs.add(directory)
+        self._debounce_timer.start(self.DEBOUNCE_MS)
+        
+    def poll(self):
+        """轮询无法监视的目录"""
+        self._pending_dirs.update(self._polled_dirs)
+        self.flush()
+        
+    def flush(self):
+        """处理积累的目录事件并发出增量"""
+        pending, self._pending_dirs = self._pending_dirs, set()
+        delta = LibraryDelta()
+        
+        for directory in pending:
+            self._rescan(directory, delta)
+            
+        self._pair_renames(delta)
+        self._removed_keys.clear()
+        if not delta.is_empty():
+            logging.info(f"音乐库变更: {delta}")
+            self.changed.emit(delta)
+            
+    def _walk(self, top):
+        """扫描目录树并建立快照，返回新增的目录列表"""
+        directories = []
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            if directory in self._files:
+                continue
+            files, subdirs = scan_dir(directory)
+            if files is None:
+                continue
+            self._files[directory] = files
+            self._subdirs[directory] = subdirs
+            self._add_watch(directory)
+            directories.append(directory)
+            stack.extend(subdirs)
+        return directories
+        
+    def _add_watch(self, directory):
+        """添加目录监视，失败时改为轮询"""
+        if self._watcher.addPath(directory):
+            return
+        if directory not in self._polled_dirs:
+            logging.warning(f"无法监视目录，改为轮询: {directory}")
+            self._polled_dirs.add(directory)
+            if not self._poll_timer.isActive():
+                self._poll_timer.start(self.POLL_INTERVAL_MS)
+                
+    def _drop_tree(self, directory, delta):
+        """目录被删除或移走，移除其下所有文件"""
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            files = self._files.pop(current, {})
+            for name, stat in files.items():
+                self._mark_removed(Path(current) / name, stat, delta)
+            stack.extend(self._subdirs.pop(current, ()))
+            self._polled_dirs.discard(current)
+            if self._watcher is not None:
+                self._watcher.removePath(current)
+                
+    def _rescan(self, directory, delta):
+        """重新扫描目录并与快照比较"""
+        if directory not in self._files:
+            return
+            
+        files, subdirs = scan_dir(directory)
+        if files is None:
+            self._drop_tree(directory, delta)
+            return
+            
+        old_files = self._files[directory]
+        base = Path(directory)
+        for name, stat in files.items():
+            old_stat = old_files.get(name)
+            if old_stat is None:
+                delta.added.append(base / name)
+            elif old_stat[:2] != stat[:2]:
+                delta.modified.append(base / name)
+        for name in old_files.keys() - files.keys():
+            self._mark_removed(base / name, old_files[name], delta)
+        self._files[directory] = files
+        
+        old_subdirs = self._subdirs.get(directory, set())
+        self._subdirs[directory] = subdirs
+        for subdir in old_subdirs - subdirs:
+            self._drop_tree(subdir, delta)
+        for subdir in subdirs - old_subdirs:
+            for new_dir in self._walk(subdir):
+                delta.added.extend(Path(new_dir) / name for name in self._files[new_dir])
+                
+    def _pair_renames(self, delta):
+        """把同一inode的删除+新增合并为重命名"""
+        if not delta.added or not delta.removed:
+            return
+            
+        removed_by_key = {}
+        for path in delta.removed:
+            key = self._removed_keys.get(str(path))
+            if key is not None:
+                removed_by_key[key] = path
+        if not removed_by_key:
+            return
+            
+        still_added = []
+        for path in delta.added:
+            key = self._stat_key(path)
+            old_path = removed_by_key.pop(key, None) if key else None
+            if old_path is not None:
+                delta.renamed.append((old_path, path))
+            else:
+                still_added.append(path)
+                
+        renamed_sources = {str(old) for old, _ in delta.renamed}
+        delta.added = still_added
+        delta.removed = [p for p in delta.removed if str(p) not in renamed_sources]
+        
+    def _mark_removed(self, path, stat, delta):
+        """记录被删除的文件"""
+        delta.removed.append(path)
+        self._removed_keys[str(path)] = rename_key(stat)
+        
+    def _stat_key(self, path):
+        """文件的(inode, 大小)，用于识别重命名"""
+        stat = self._files.get(str(Path(path).parent), {}).get(Path(path).name)
+        if stat is None:
+            return None
+        return rename_key(stat)
+        
+    def _remember(self, path):
+        """把文件加入快照"""
+        path = Path(path)
+        files = self._files.get(str(path.parent))
+        if files is None:
+            return
+        try:
+            st = path.stat()
+        except OSError:
+            return
+        files[path.name] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        
+    def _forget(self, path):
+        """从快照中移除文件"""
+        path = Path(path)
+        files = self._files.get(str(path.parent))
+        if files is not None:
+            files.pop(path.name, None)
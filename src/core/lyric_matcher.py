@@ -1,12 +1,12 @@
 import os
-import requests
 import json
 from pathlib import Path
-from mutagen import File
-from mutagen.id3 import ID3, TIT2, TPE1, TALB, TCON, TDRC
+
+from core.metadata import default_metadata_service
 
 class LyricMatcher:
-    def __init__(self):
+    def __init__(self, metadata=None):
+        self.metadata = metadata or default_metadata_service()
         self.api_sources = [
             self.netease_cloud_music,
             self.qq_music,
@@ -14,73 +14,8 @@ class LyricMatcher:
         ]
         
     def get_song_info(self, file_path):
-        """获取歌曲信息"""
-        try:
-            audio = File(file_path)
-            if audio is None:
-                return self.get_basic_info(file_path)
-                
-            info = {
-                'path': str(file_path),
-                'title': '',
-                'artist': '',
-                'album': '',
-                'genre': '',
-                'year': '',
-                'duration': self.get_duration(audio),
-                'size': self.get_file_size(file_path)
-            }
-            
-            if hasattr(audio, 'tags'):
-                if 'TIT2' in audio.tags:
-                    info['title'] = str(audio.tags['TIT2'])
-                if 'TPE1' in audio.tags:
-                    info['artist'] = str(audio.tags['TPE1'])
-                if 'TALB' in audio.tags:
-                    info['album'] = str(audio.tags['TALB'])
-                if 'TCON' in audio.tags:
-                    info['genre'] = str(audio.tags['TCON'])
-                if 'TDRC' in audio.tags:
-                    info['year'] = str(audio.tags['TDRC'])
-                    
-            # 如果ID3标签中没有信息，使用文件名
-            if not info['title']:
-                info['title'] = file_path.stem
-                
-            return info
-            
-        except Exception as e:
-            return self.get_basic_info(file_path)
-            
-    def get_basic_info(self, file_path):
-        """获取基本信息"""
-        return {
-            'path': str(file_path),
-            'title': file_path.stem,
-            'artist': '未知歌手',
-            'album': '',
-            'genre': '未知风格',
-            'year': '',
-            'duration': '00:00',
-            'size': self.get_file_size(file_path)
-        }
-        
-    def get_duration(self, audio):
-        """获取时长"""
-        if audio is not None and hasattr(audio.info, 'length'):
-            duration = int(audio.info.length)
-            minutes = duration // 60
-            seconds = duration % 60
-            return f"{minutes:02d}:{seconds:02d}"
-        return "00:00"
-        
-    def get_file_size(self, file_path):
-        """获取文件大小"""
-        size = file_path.stat().st_size
-        if size < 1024 * 1024:  # 小于1MB
-            return f"{size/1024:.1f} KB"
-        else:
-            return f"{size/(1024 * 1024):.1f} MB"
+        """获取歌曲信息（与音乐库共用元数据缓存）"""
+        return self.metadata.get_song_info(file_path)
             
     def auto_match_lyrics(self, song_name, artist=""):
         """自动匹配歌词"""
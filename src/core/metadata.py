@@ -0,0 +1,206 @@
+import base64
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from mutagen import File
+from mutagen.id3 import ID3
+from mutagen.mp4 import MP4Tags
+from mutagen.flac import Picture
+
+from core.track import Track
+
+# 各种标签格式的键名：ID3、Vorbis/FLAC、MP4、ASF
+TAG_KEYS = {
+    'title': ('TIT2', 'title', '\xa9nam', 'Title'),
+    'artist': ('TPE1', 'artist', '\xa9ART', 'Author'),
+    'album': ('TALB', 'album', '\xa9alb', 'WM/AlbumTitle'),
+    'genre': ('TCON', 'genre', '\xa9gen', 'WM/Genre'),
+    'year': ('TDRC', 'date', '\xa9day', 'WM/Year'),
+}
+
+# 下载时写入的来源视频链接
+SOURCE_URL_KEYS = ('WOAS', 'website', '----:com.apple.iTunes:SOURCE', 'WM/AudioSourceURL')
+
+def tag_text(value):
+    """把不同格式的标签值转换为字符串"""
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else ''
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'replace')
+    return str(value).strip()
+
+def read_tags(audio):
+    """读取标签，兼容ID3、Vorbis、MP4和ASF的键名"""
+    info = dict.fromkeys(TAG_KEYS, '')
+    tags = getattr(audio, 'tags', None)
+    if tags is None:
+        return info
+        
+    for field, keys in TAG_KEYS.items():
+        for key in keys:
+            try:
+                if key in tags:
+                    info[field] = tag_text(tags[key])
+                    break
+            except (KeyError, ValueError, TypeError):
+                continue
+    return info
+
+def read_cover(file_path):
+    """读取内嵌的封面图片数据，没有封面时返回None"""
+    audio = File(file_path)
+    if audio is None:
+        return None
+    pictures = getattr(audio, 'pictures', None)  # FLAC
+    if pictures:
+        return pictures[0].data
+        
+    tags = audio.tags
+    if tags is None:
+        return None
+    if isinstance(tags, ID3):
+        frames = tags.getall('APIC')
+        return frames[0].data if frames else None
+    if isinstance(tags, MP4Tags):
+        covers = tags.get('covr')
+        return bytes(covers[0]) if covers else None
+    encoded = tags.get('metadata_block_picture') if hasattr(tags, 'get') else None
+    if encoded:  # Ogg
+        return Picture(base64.b64decode(encoded[0])).data
+    return None
+
+def read_source_url(file_path):
+    """读取下载时写入的来源链接，没有时返回空字符串"""
+    audio = File(file_path)
+    tags = getattr(audio, 'tags', None)
+    if tags is None:
+        return ''
+    for key in SOURCE_URL_KEYS:
+        try:
+            if key in tags:
+                return tag_text(tags[key])
+        except (KeyError, ValueError, TypeError):
+            continue
+    return ''
+
+class MetadataService:
+    """歌曲元数据服务
+
+    音乐库、歌词和下载模块共用同一个实例。解析结果按 (路径, 修改时间, 大小)
+    缓存在LRU中，文件没有变化时不会再次打开。
+    """
+    
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()  # 路径 -> ((修改时间, 大小), Track)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+    def read_track(self, file_path):
+        """读取歌曲记录（返回副本，调用者可以自由修改）"""
+        file_path = Path(file_path)
+        stat = file_path.stat()
+        key = str(file_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1].copy()
+                
+        track = self._parse(file_path, stat)
+        
+        with self._lock:
+            self.misses += 1
+            self._store(key, version, track)
+        return track.copy()
+        
+    def remember(self, track):
+        """登记已知的歌曲信息（例如下载时写入的标签），之后读取时不必再解析文件"""
+        stat = Path(track.path).stat()
+        track = track.copy()
+        track.size = stat.st_size
+        track.mtime = stat.st_mtime
+        with self._lock:
+            self._store(track.path, (stat.st_mtime_ns, stat.st_size), track)
+            
+    def _store(self, key, version, track):
+        """写入缓存并淘汰最久未用的条目（调用者持有锁）"""
+        self._cache[key] = (version, track)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            
+    def get_song_info(self, file_path):
+        """获取歌曲信息字典（时长、大小为格式化字符串）"""
+        file_path = Path(file_path)
+        try:
+            return self.read_track(file_path).as_dict()
+        except Exception as e:
+            logging.error(f"读取歌曲信息失败 {file_path}: {e}")
+            return self.get_basic_info(file_path)
+            
+    def get_basic_info(self, file_path):
+        """无法解析时的基本信息"""
+        file_path = Path(file_path)
+        try:
+            size = file_path.stat().st_size
+        except OSError:
+            size = 0
+        return Track(file_path, artist='未知歌手', genre='未知风格', size=size).as_dict()
+        
+    def invalidate(self, file_path):
+        """丢弃某个文件的缓存"""
+        with self._lock:
+            self._cache.pop(str(file_path), None)
+            
+    def rename(self, old_path, new_path):
+        """文件重命名后迁移缓存"""
+        with self._lock:
+            cached = self._cache.pop(str(old_path), None)
+            if cached is not None:
+                version, track = cached
+                track = track.copy()
+                track.path = str(new_path)
+                self._cache[str(new_path)] = (version, track)
+                
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+            
+    def _parse(self, file_path, stat):
+        """打开文件解析标签"""
+        try:
+            audio = File(file_path)
+        except Exception as e:
+            logging.warning(f"无法解析音频文件 {file_path}: {e}")
+            audio = None
+            
+        if audio is None:
+            return Track(file_path, artist='未知歌手', genre='未知风格',
+                         size=stat.st_size, mtime=stat.st_mtime)
+                         
+        length = getattr(audio.info, 'length', 0) or 0
+        return Track(
+            file_path,
+            duration=length,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            **read_tags(audio)
+        )
+
+_default_service = None
+_default_lock = threading.Lock()
+
+def default_metadata_service():
+    """进程内共享的元数据服务"""
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = MetadataService()
+        return _default_service
@@ -0,0 +1,339 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from pathlib import Path
+
+from core.library_index import LibraryDelta
+
+APP_DIR = Path.home() / '.bilibili_music_extractor'
+JOURNAL_DIR = APP_DIR / 'journal'
+
+# 回收站放在音乐库根目录下（同一设备，删除只需重命名），监视器会忽略隐藏目录
+TRASH_DIR_NAME = '.trash'
+TRASH_RETENTION_DAYS = 7
+
+COPY_BUFFER_SIZE = 4 * 1024 * 1024
+
+class JournalEntry:
+    """日志中的一个文件操作"""
+    
+    def __init__(self, seq, kind, source, target, sidecars):
+        self.seq = seq
+        self.kind = kind
+        self.source = Path(source)
+        self.target = Path(target)
+        self.sidecars = [(Path(s), Path(t)) for s, t in sidecars]
+        self.state = 'begin'  # begin / done / failed
+        self.error = None
+        
+    def pairs(self):
+        """该操作涉及的全部 (源, 目标)，附属文件在前"""
+        return self.sidecars + [(self.source, self.target)]
+
+class BatchJournal:
+    """批量文件操作的预写日志（JSON Lines）
+
+    操作执行前先写入begin记录并落盘，完成后追加done记录，整批结束写入commit。
+    恢复时以文件系统的实际状态为准，所以done记录不必逐条落盘，
+    begin记录也可以整批写完后只同步一次。
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.batch_id = self.path.stem
+        self.action = ''
+        self.library_root = None
+        self.created = 0.0
+        self.entries = {}
+        self.committed = False
+        self.rolled_back = False
+        self._file = None
+        self._lock = threading.Lock()
+        
+    @classmethod
+    def create(cls, action, library_root, journal_dir=None):
+        """新建批次日志"""
+        journal_dir = Path(journal_dir or JOURNAL_DIR)
+        journal_dir.mkdir(parents=True, exist_ok=True)
+        batch_id = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:8]
+        journal = cls(journal_dir / f"{batch_id}.jsonl")
+        journal.action = action
+        journal.library_root = Path(library_root)
+        journal.created = time.time()
+        journal._write({
+            'type': 'batch',
+            'action': action,
+            'library_root': str(library_root),
+            'time': journal.created,
+        })
+        return journal
+        
+    @classmethod
+    def load(cls, path):
+        """读取日志（最后一行可能因崩溃而不完整，忽略即可）"""
+        journal = cls(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                journal._apply(record)
+        return journal
+        
+    def trash_path(self, source, seq):
+        """被删除文件在回收站中的位置"""
+        return self.library_root / TRASH_DIR_NAME / self.batch_id / f"{seq}_{Path(source).name}"
+        
+    def begin(self, seq, operation, sidecars, sync=True):
+        """记录即将执行的操作"""
+        self._write({
+            'type': 'begin',
+            'seq': seq,
+            'kind': operation.kind,
+            'source': str(operation.source),
+            'target': str(operation.target),
+            'sidecars': [[str(s), str(t)] for s, t in sidecars],
+        }, sync)
+        
+    def done(self, seq):
+        self._write({'type': 'done', 'seq': seq}, sync=False)
+        
+    def failed(self, seq, error):
+        self._write({'type': 'failed', 'seq': seq, 'error': str(error)}, sync=False)
+        
+    def sync(self):
+        """把已写入的记录落盘"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                
+    def commit(self):
+        self._write({'type': 'commit'})
+        self.close()
+        
+    def mark_rolled_back(self):
+        self._write({'type': 'rolled_back'})
+        self.close()
+        
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                
+    def completed_entries(self):
+        """已完成的操作（按执行顺序）"""
+        return [e for _, e in sorted(self.entries.items()) if e.state == 'done']
+        
+    def _write(self, record, sync=True):
+        """追加一条记录"""
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            self._apply(record)
+            
+    def _apply(self, record):
+        record_type = record.get('type')
+        if record_type == 'batch':
+            self.action = record.get('action', '')
+            self.library_root = Path(record['library_root'])
+            self.created = record.get('time', 0.0)
+        elif record_type == 'begin':
+            self.entries[record['seq']] = JournalEntry(
+                record['seq'], record['kind'], record['source'],
+                record['target'], record.get('sidecars', [])
+            )
+        elif record_type in ('done', 'failed'):
+            entry = self.entries.get(record['seq'])
+            if entry is not None:
+                entry.state = record_type
+        elif record_type == 'commit':
+            self.committed = True
+        elif record_type == 'rolled_back':
+            self.rolled_back = True
+
+def copy_file(source, target):
+    """大缓冲区复制文件并保留时间戳"""
+    with open(source, 'rb') as src, open(target, 'xb') as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+    shutil.copystat(source, target)
+
+def transfer(source, target, same_device):
+    """移动单个文件：同一设备直接重命名，否则复制后删除源文件"""
+    if same_device:
+        os.rename(source, target)
+        return
+    try:
+        copy_file(source, target)
+    except BaseException:
+        if os.path.exists(target):
+            os.unlink(target)
+        raise
+    os.unlink(source)
+
+def same_device(source, target_dir):
+    """源文件和目标目录是否在同一设备上（可以直接os.rename）"""
+    try:
+        return os.stat(source).st_dev == os.stat(target_dir).st_dev
+    except OSError:
+        return False
+
+def move_path(source, target):
+    """移动单个文件，自动判断是否需要跨设备复制"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    transfer(source, target, same_device(source, target.parent))
+
+def entry_delta(entry, delta, forward=True):
+    """把一个操作的结果（正向或回滚）记入增量"""
+    if forward:
+        if entry.kind == 'delete':
+            delta.removed.append(entry.source)
+        else:
+            delta.renamed.append((entry.source, entry.target))
+    else:
+        if entry.kind == 'delete':
+            delta.added.append(entry.source)
+        else:
+            delta.renamed.append((entry.target, entry.source))
+
+def interrupted_copy(entry, source, target):
+    """源和目标都存在时，目标是否是被中断的跨设备复制留下的副本
+
+    只有没有完成的操作才可能留下副本，而且副本不会比源文件大；
+    已完成的操作两者都存在说明原位置后来又有了新文件，不能删除任何一方。
+    """
+    if entry.state == 'done':
+        return False
+    try:
+        return target.stat().st_size <= source.stat().st_size
+    except OSError:
+        return False
+
+def reconcile_entry(entry, forward):
+    """根据文件系统的实际状态，把一个操作推进到完成或退回到执行前
+
+    每一对 (源, 目标) 单独处理：只存在其中一方时按需移动；
+    两者都存在且目标是被中断的复制留下的副本时删除副本。
+    其他两者都存在的情况不覆盖也不删除任何文件，整个操作报告为失败。
+    """
+    pairs = entry.pairs()
+    for source, target in pairs:
+        if source.exists() and target.exists() and not interrupted_copy(entry, source, target):
+            raise Exception(f"文件已存在，未覆盖: {target if forward else source}")
+            
+    for source, target in pairs:
+        source_exists = source.exists()
+        target_exists = target.exists()
+        if source_exists and target_exists:
+            target.unlink()
+            target_exists = False
+        if forward and source_exists:
+            move_path(source, target)
+        elif not forward and target_exists:
+            move_path(target, source)
+
+def rollback(journal, progress=None):
+    """回滚一个批次（撤销或崩溃恢复），返回 (增量, 失败的操作)"""
+    delta = LibraryDelta()
+    failures = []
+    entries = [e for _, e in sorted(journal.entries.items(), reverse=True)]
+    for index, entry in enumerate(entries):
+        try:
+            reconcile_entry(entry, forward=False)
+            if entry.state == 'done':
+                entry_delta(entry, delta, forward=False)
+        except Exception as e:
+            entry.error = str(e)
+            failures.append(entry)
+            logging.error(f"回滚失败 {entry.source}: {e}")
+        if progress:
+            progress(index + 1, len(entries))
+    if journal.library_root is not None:
+        try:
+            (journal.library_root / TRASH_DIR_NAME / journal.batch_id).rmdir()
+        except OSError:
+            pass
+    journal.mark_rolled_back()
+    return delta, failures
+
+def replay(journal, progress=None):
+    """继续执行崩溃时未完成的批次，返回 (增量, 失败的操作)"""
+    delta = LibraryDelta()
+    failures = []
+    entries = [e for _, e in sorted(journal.entries.items())]
+    for index, entry in enumerate(entries):
+        if entry.state == 'failed':
+            continue
+        try:
+            if entry.state != 'done':
+                reconcile_entry(entry, forward=True)
+                journal.done(entry.seq)
+            entry_delta(entry, delta, forward=True)
+        except Exception as e:
+            entry.error = str(e)
+            failures.append(entry)
+            journal.failed(entry.seq, e)
+            logging.error(f"恢复操作失败 {entry.source}: {e}")
+        if progress:
+            progress(index + 1, len(entries))
+    journal.commit()
+    return delta, failures
+
+def list_journals(journal_dir=None):
+    """按时间从新到旧列出所有日志"""
+    journal_dir = Path(journal_dir or JOURNAL_DIR)
+    if not journal_dir.exists():
+        return []
+    return sorted(journal_dir.glob('*.jsonl'), reverse=True)
+
+def pending_journals(journal_dir=None):
+    """崩溃时未提交的批次"""
+    journals = []
+    for path in list_journals(journal_dir):
+        try:
+            journal = BatchJournal.load(path)
+        except OSError as e:
+            logging.error(f"读取操作日志失败 {path}: {e}")
+            continue
+        if not journal.committed and not journal.rolled_back:
+            journals.append(journal)
+    return journals
+
+def last_undoable(journal_dir=None):
+    """最近一个可以撤销的批次"""
+    for path in list_journals(journal_dir):
+        try:
+            journal = BatchJournal.load(path)
+        except OSError:
+            continue
+        if journal.committed and not journal.rolled_back:
+            return journal
+    return None
+
+def purge_journals(journal_dir=None, max_age_days=TRASH_RETENTION_DAYS):
+    """清理过期的日志和回收站中的文件"""
+    deadline = time.time() - max_age_days * 24 * 3600
+    for path in list_journals(journal_dir):
+        try:
+            journal = BatchJournal.load(path)
+        except OSError:
+            continue
+        if not (journal.committed or journal.rolled_back) or journal.created > deadline:
+            continue
+        if journal.library_root is not None:
+            trash = journal.library_root / TRASH_DIR_NAME / journal.batch_id
+            shutil.rmtree(trash, ignore_errors=True)
+        try:
+            path.unlink()
+        except OSError as e:
+            logging.warning(f"删除操作日志失败 {path}: {e}")
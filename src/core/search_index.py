@@ -0,0 +1,250 @@
+import re
+from array import array
+from collections import defaultdict
+
+# pypinyin加载词典需要约0.2秒，第一次转换拼音时才导入（见pinyin_converter）
+_lazy_pinyin = None
+
+# 中日韩字符按单字切分，其余按连续的字母数字切分
+CJK_CHARS = '぀-ヿ㐀-䶿一-鿿가-힯'
+TOKEN_PATTERN = re.compile(f'[{CJK_CHARS}]|[^\\W_{CJK_CHARS}]+')
+WORD_PATTERN = re.compile(f'[^\\W_{CJK_CHARS}]+')
+HAN_PATTERN = re.compile('[㐀-䶿一-鿿]')
+
+FIELD_SEPARATOR = '\x00'
+
+def pinyin_converter():
+    """返回pypinyin.lazy_pinyin，没有安装时返回None"""
+    global _lazy_pinyin
+    if _lazy_pinyin is None:
+        try:
+            from pypinyin import lazy_pinyin
+        except ImportError:
+            lazy_pinyin = False
+        _lazy_pinyin = lazy_pinyin
+    return _lazy_pinyin or None
+
+def is_prefix_term(term):
+    """一两个字母或数字的关键词，按词元前缀匹配"""
+    return len(term) < 3 and WORD_PATTERN.fullmatch(term) is not None
+
+def posting_list():
+    """倒排表，按递增顺序保存文档id"""
+    return array('I')
+
+class SearchIndex:
+    """音乐库搜索索引
+
+    对歌曲名、歌手、专辑、风格和文件名建立词元和三元组倒排表，
+    中文额外索引拼音全拼和首字母（"zjl" 可以搜到 "周杰伦"）。
+    三个字符以上的关键词按子串匹配；一两个字母或数字的关键词按词元前缀匹配
+    （"ab" 匹配 "Abba" 而不匹配 "Cab"），单独搜索和与其他关键词一起搜索时规则相同。
+    连续输入时，如果新关键词是上一次的延伸，只在上一次的结果中继续筛选。
+    """
+    
+    def __init__(self):
+        self._paths = []          # 文档id -> 路径，已删除为None
+        self._haystacks = []      # 文档id -> 用于校验的小写文本
+        self._id_of = {}          # 路径 -> 文档id
+        self._tokens = defaultdict(posting_list)    # 词元 -> 文档id
+        self._trigrams = defaultdict(posting_list)  # 三元组 -> 文档id
+        self._prefixes = defaultdict(posting_list)  # 字母数字词元的前一两个字符 -> 文档id
+        self._dead = 0
+        self._pinyin_cache = {}
+        self._last_query = None
+        self._last_result = None
+        self._pending = {}        # 等待建立索引的歌曲（路径 -> Track）
+        
+    def __len__(self):
+        return len(self._id_of) + len(self._pending)
+        
+    def clear(self):
+        """清空索引"""
+        self.__init__()
+        
+    def build(self, tracks):
+        """重建索引"""
+        self.clear()
+        for track in tracks:
+            self.add(track)
+            
+    def add_later(self, tracks):
+        """登记稍后建立索引的歌曲，由index_pending分批处理，避免阻塞界面"""
+        for track in tracks:
+            self._pending[track.path] = track
+            
+    def has_pending(self):
+        """是否还有未建立索引的歌曲"""
+        return bool(self._pending)
+        
+    def index_pending(self, limit=500):
+        """为最多limit首待处理歌曲建立索引，返回是否还有剩余"""
+        for _ in range(min(limit, len(self._pending))):
+            self.add(self._pending.popitem()[1])
+        return bool(self._pending)
+        
+    def add(self, track):
+        """添加或更新歌曲"""
+        self._pending.pop(track.path, None)
+        if track.path in self._id_of:
+            self.remove(track.path)
+            
+        name = track.path.replace('\\', '/').rsplit('/', 1)[-1]
+        fields = [track.title, track.artist, track.album, track.genre, name]
+        fields = [field.casefold() for field in fields if field]
+        for text in (track.title, track.artist):
+            fields.extend(self._pinyin(text))
+            
+        self._add_document(track.path, FIELD_SEPARATOR.join(fields))
+        self._last_query = None
+        
+    def remove(self, path):
+        """移除歌曲（倒排表中的id在校验时跳过，累积过多时压缩）"""
+        self._pending.pop(str(path), None)
+        doc_id = self._id_of.pop(str(path), None)
+        if doc_id is None:
+            return
+            
+        self._paths[doc_id] = None
+        self._haystacks[doc_id] = ''
+        self._dead += 1
+        self._last_query = None
+        if self._dead > 1000 and self._dead > len(self._id_of):
+            self._compact()
+            
+    def search(self, query):
+        """搜索，返回匹配的路径集合；空关键词返回None表示不过滤"""
+        query = query.casefold().strip()
+        if not query:
+            return None
+            
+        # 还没建完的索引先同步补齐
+        self.index_pending(len(self._pending))
+        
+        terms = query.split()
+        candidates = None
+        if self._last_query and query.startswith(self._last_query) \
+                and min(map(len, self._last_query.split())) >= 3:
+            # 增量缩小：上一次全部按子串匹配时，新结果一定是上一次结果的子集
+            candidates = self._last_result
+            
+        for term in sorted(terms, key=len, reverse=True):
+            candidates = self._match_term(term, candidates)
+            if not candidates:
+                break
+                
+        self._last_query = query
+        self._last_result = candidates or set()
+        return {self._paths[doc_id] for doc_id in self._last_result}
+        
+    def _match_term(self, term, candidates):
+        """匹配单个关键词，返回文档id集合"""
+        if candidates is None:
+            candidates, exact = self._lookup(term)
+            if exact:
+                # 倒排表中可能还有已移除歌曲的id（压缩前），跳过
+                paths = self._paths
+                return {doc_id for doc_id in candidates if paths[doc_id] is not None}
+            if candidates is None:
+                # 无法利用倒排表（例如包含标点的短词），退回线性扫描
+                candidates = range(len(self._haystacks))
+        haystacks = self._haystacks
+        if is_prefix_term(term):
+            # 与_lookup的规则一致：词元以term开头（前面不是字母或数字）
+            pattern = re.compile(f'(?<![^\\W_{CJK_CHARS}]){re.escape(term)}')
+            return {doc_id for doc_id in candidates if pattern.search(haystacks[doc_id])}
+        return {doc_id for doc_id in candidates if term in haystacks[doc_id]}
+        
+    def _lookup(self, term):
+        """通过倒排表找出候选文档，返回 (候选id集合, 是否无需再校验)"""
+        if len(term) >= 3:
+            postings = []
+            for i in range(len(term) - 2):
+                posting = self._trigrams.get(term[i:i + 3])
+                if posting is None:
+                    return set(), True
+                postings.append(posting)
+            # 只有一个三元组时倒排表就是精确结果
+            return self._intersect(postings), len(postings) == 1
+            
+        tokens = TOKEN_PATTERN.findall(term)
+        if not tokens or ''.join(tokens) != term:
+            return None, False
+            
+        if len(tokens) == 1:
+            token = tokens[0]
+            # 短词的前缀倒排表在建立索引时已经算好，不需要遍历词元
+            postings = self._prefixes if is_prefix_term(token) else self._tokens
+            return set(postings.get(token, ())), True
+            
+        postings = []
+        for token in tokens:
+            posting = self._tokens.get(token)
+            if posting is None:
+                return set(), True
+            postings.append(posting)
+        return self._intersect(postings), False
+        
+    def _intersect(self, postings):
+        """求多个倒排表的交集，从最短的开始"""
+        postings = sorted(postings, key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result.intersection_update(posting)
+            if not result:
+                break
+        return result
+        
+    def _pinyin(self, text):
+        """中文的拼音全拼和首字母"""
+        if not text or not HAN_PATTERN.search(text):
+            return []
+        lazy_pinyin = pinyin_converter()
+        if lazy_pinyin is None:
+            return []
+            
+        # 逐字转换并缓存，避免对每个标题做整句分词（多音字取常用读音）
+        syllables = []
+        for token in TOKEN_PATTERN.findall(text.casefold()):
+            if HAN_PATTERN.fullmatch(token):
+                syllable = self._pinyin_cache.get(token)
+                if syllable is None:
+                    syllable = lazy_pinyin(token)[0].casefold()
+                    self._pinyin_cache[token] = syllable
+                syllables.append(syllable)
+            else:
+                syllables.append(token)
+        return [''.join(syllables), ''.join(s[0] for s in syllables)]
+        
+    def _add_document(self, path, haystack):
+        """分配文档id并写入倒排表"""
+        doc_id = len(self._paths)
+        self._paths.append(path)
+        self._haystacks.append(haystack)
+        self._id_of[path] = doc_id
+        
+        # 跨字段的三元组含有分隔符，查询时不会命中，无需单独切分字段
+        token_postings = self._tokens
+        prefixes = set()
+        for token in set(TOKEN_PATTERN.findall(haystack)):
+            token_postings[token].append(doc_id)
+            if len(token) > 1 or WORD_PATTERN.match(token):
+                prefixes.add(token[:1])
+                prefixes.add(token[:2])
+        prefix_postings = self._prefixes
+        for prefix in prefixes:
+            prefix_postings[prefix].append(doc_id)
+        trigram_postings = self._trigrams
+        for gram in {haystack[i:i + 3] for i in range(len(haystack) - 2)}:
+            trigram_postings[gram].append(doc_id)
+            
+    def _compact(self):
+        """丢弃已删除文档，重新编号"""
+        docs = [(path, haystack) for path, haystack in zip(self._paths, self._haystacks)
+                if path is not None]
+        pinyin_cache = self._pinyin_cache
+        self.__init__()
+        self._pinyin_cache = pinyin_cache
+        
+        for path, haystack in docs:
+            self._add_document(path, haystack)
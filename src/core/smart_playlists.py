@@ -0,0 +1,352 @@
+import os
+import json
+import time
+import operator
+import sqlite3
+from pathlib import Path
+
+from core.content_index import LIBRARY_DB
+from core.file_operations import SIDECAR_SUFFIXES
+from core.categories import split_terms
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS smart_playlists (
+    name TEXT PRIMARY KEY,
+    definition TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS track_added (
+    path TEXT PRIMARY KEY,
+    added REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# 条件字段：字段 -> (显示名称, 类型)
+# 下载时UP主写在歌手标签中，所以“UP主”条件也按歌手字段匹配
+FIELDS = {
+    'artist': ("歌手/UP主", 'text'),
+    'title': ("歌曲名", 'text'),
+    'album': ("专辑", 'text'),
+    'genre': ("风格", 'text'),
+    'year': ("年份", 'number'),
+    'duration': ("时长（分钟）", 'number'),
+    'added': ("添加时间", 'days'),
+    'lyrics': ("歌词", 'flag'),
+    'category': ("分类", 'category'),
+}
+
+# 每种类型可用的比较方式：(运算符, 显示名称)
+OPERATORS = {
+    'text': (('in', "是（多个用逗号分隔）"), ('contains', "包含"), ('not_in', "不是")),
+    'number': (('<', "小于"), ('>', "大于"), ('=', "等于")),
+    'days': (('within', "最近几天内"),),
+    'flag': (('yes', "有"), ('no', "没有")),
+    'category': (('in', "属于"), ('not_in', "不属于")),
+}
+
+def to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class EvaluationContext:
+    """一次评估中共享的数据：分类成员、目录中的歌词文件（都按需读取一次）、加入音乐库的时间"""
+    
+    def __init__(self, categories=None, added=None):
+        self.categories = categories
+        self.added = added if added is not None else {}
+        self._members = {}
+        self._listings = {}
+        
+    def category_members(self, name):
+        members = self._members.get(name)
+        if members is None:
+            members = self.categories.members(name) if self.categories is not None else set()
+            self._members[name] = members
+        return members
+        
+    def has_lyrics(self, track):
+        """同目录下有同名歌词文件（每个目录只列一次，不逐个stat）"""
+        directory, name = os.path.split(track.path)
+        names = self._listings.get(directory)
+        if names is None:
+            try:
+                names = set(os.listdir(directory))
+            except OSError:
+                names = set()
+            self._listings[directory] = names
+        stem = os.path.splitext(name)[0]
+        return any(stem + suffix in names for suffix in SIDECAR_SUFFIXES)
+
+def compile_condition(condition, context, now):
+    """把条件编译成判断函数 track -> bool"""
+    field = condition['field']
+    op = condition['op']
+    value = condition.get('value', '')
+    kind = FIELDS[field][1]
+    
+    if kind == 'text':
+        if op == 'contains':
+            needle = str(value).strip().lower()
+            return lambda track: needle in getattr(track, field).lower()
+        values = split_terms(value)
+        if op == 'in':
+            return lambda track: getattr(track, field).lower() in values
+        return lambda track: getattr(track, field).lower() not in values
+        
+    if kind == 'number':
+        number = to_number(value)
+        if number is None:
+            return lambda track: False
+        if field == 'duration':
+            number *= 60
+            get = lambda track: track.duration
+        else:
+            get = lambda track: to_number(getattr(track, field))
+        compare = {'<': operator.lt, '>': operator.gt, '=': operator.eq}[op]
+        def matches(track):
+            current = get(track)
+            return current is not None and compare(current, number)
+        return matches
+        
+    if kind == 'days':
+        cutoff = now - (to_number(value) or 0) * 86400
+        # 按加入音乐库的时间，不用修改时间：写标签、嵌入封面会更新修改时间，硬链接导入保留原文件的
+        return lambda track: context.added.get(track.path, 0) >= cutoff
+        
+    if kind == 'flag':
+        wanted = op == 'yes'
+        return lambda track: context.has_lyrics(track) == wanted
+        
+    # 分类：成员集合在一次评估中只查询一次
+    wanted = op == 'in'
+    return lambda track: (track.path in context.category_members(value)) == wanted
+
+class SmartPlaylist:
+    """按条件自动生成的播放列表"""
+    
+    def __init__(self, name, conditions=None, match_all=True):
+        self.name = name
+        self.conditions = list(conditions or [])  # [{'field', 'op', 'value'}]
+        self.match_all = match_all
+        
+    def uses(self, field):
+        return any(condition['field'] == field for condition in self.conditions)
+        
+    def matcher(self, context, now=None):
+        """返回判断函数 track -> bool；没有条件时匹配所有歌曲"""
+        now = time.time() if now is None else now
+        predicates = [compile_condition(condition, context, now) for condition in self.conditions]
+        if not predicates:
+            return lambda track: True
+        combine = all if self.match_all else any
+        return lambda track: combine(predicate(track) for predicate in predicates)
+        
+    def to_json(self):
+        return json.dumps({'conditions': self.conditions, 'match_all': self.match_all},
+                          ensure_ascii=False)
+                          
+    @classmethod
+    def from_json(cls, name, text):
+        data = json.loads(text)
+        return cls(name, data.get('conditions'), data.get('match_all', True))
+
+class SmartPlaylists:
+    """智能播放列表（定义保存在音乐库数据库中，成员在内存中增量维护）
+
+    完整扫描后整体评估一次，之后只对增量中新增、修改、改名的歌曲重新判断，
+    打开播放列表时直接返回维护好的成员集合。
+    “最近N天”的条件只会让歌曲随时间离开列表，打开时只需复查现有成员。
+    歌词文件和分类的变化不产生音乐库增量，在歌曲本身变化或分类修改时才更新。
+    歌曲第一次出现在音乐库中的时间记录在track_added表中，改名、移动后保留；
+    在快照或完整扫描中第一次见到的歌曲按修改时间估计（升级或切换音乐库目录时
+    不会把整个库算作刚加入），目录监视、下载和导入新增的歌曲记为当前时间。
+    表中可能有多个音乐库目录的记录，清理时只清理当前目录下的。
+    """
+    
+    def __init__(self, library, categories=None, db_path=None):
+        self.library = library
+        self.categories = categories
+        self.db_path = Path(db_path or LIBRARY_DB)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._playlists = {
+            name: SmartPlaylist.from_json(name, definition) for name, definition in
+            self._conn.execute("SELECT name, definition FROM smart_playlists ORDER BY position, rowid")
+        }
+        self._members = {name: set() for name in self._playlists}
+        self._added = dict(self._conn.execute("SELECT path, added FROM track_added"))
+        
+    def close(self):
+        self._conn.close()
+        
+    def names(self):
+        return list(self._playlists)
+        
+    def get(self, name):
+        return self._playlists.get(name)
+        
+    def count(self, name):
+        return len(self._members.get(name, ()))
+        
+    def added_time(self, path):
+        """歌曲加入音乐库的时间，没有记录时返回None"""
+        return self._added.get(str(path))
+        
+    def members(self, name):
+        """播放列表中的歌曲路径集合（副本）"""
+        playlist = self._playlists.get(name)
+        if playlist is None:
+            return set()
+        members = self._members[name]
+        if playlist.uses('added') and members:
+            # 随时间过期的成员：只复查当前成员
+            matches = playlist.matcher(self._context())
+            expired = []
+            for path in members:
+                track = self.library.get(path)
+                if track is None or not matches(track):
+                    expired.append(path)
+            members.difference_update(expired)
+        return set(members)
+        
+    def save(self, playlist, old_name=None):
+        """新建或修改播放列表并评估成员，同名列表已存在时抛出异常"""
+        if playlist.name != old_name and playlist.name in self._playlists:
+            raise Exception(f"播放列表已存在: {playlist.name}")
+        with self._conn:
+            if old_name is not None and old_name in self._playlists:
+                self._conn.execute("UPDATE smart_playlists SET name = ?, definition = ? WHERE name = ?",
+                                   (playlist.name, playlist.to_json(), old_name))
+            else:
+                self._conn.execute(
+                    "INSERT INTO smart_playlists (name, definition, position) "
+                    "VALUES (?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM smart_playlists))",
+                    (playlist.name, playlist.to_json())
+                )
+        if old_name is not None and old_name != playlist.name:
+            # 保持列表顺序
+            self._playlists = {(playlist.name if name == old_name else name): value
+                               for name, value in self._playlists.items()}
+            self._members.pop(old_name, None)
+        self._playlists[playlist.name] = playlist
+        self._evaluate([playlist.name])
+        
+    def delete(self, name):
+        with self._conn:
+            self._conn.execute("DELETE FROM smart_playlists WHERE name = ?", (name,))
+        self._playlists.pop(name, None)
+        self._members.pop(name, None)
+        
+    def rebuild(self, root):
+        """加载音乐库后评估所有播放列表（一次遍历音乐库），root为音乐库目录"""
+        paths = set()
+        new = []
+        for track in self.library:
+            paths.add(track.path)
+            if track.path not in self._added:
+                new.append(track.path)
+        # root下已经不在音乐库中的记录（音乐库为空时可能还没有加载，不清理）
+        stale = []
+        if paths:
+            prefix = os.path.join(str(Path(root)), '')
+            stale = [path for path in self._added if path not in paths and path.startswith(prefix)]
+        self._record_added(new, removed=stale, estimate=True)
+        self._evaluate(list(self._playlists))
+        
+    def apply_delta(self, delta, scanned=False):
+        """按音乐库增量更新成员（在音乐库索引更新之后调用）
+
+        scanned为True表示增量来自完整扫描与快照的比较，新歌曲按修改时间估计加入时间。
+        """
+        self._record_added(delta.added, delta.removed, delta.renamed, estimate=scanned)
+        if not self._playlists:
+            return
+        gone = list(delta.removed) + [old_path for old_path, _ in delta.renamed]
+        for members in self._members.values():
+            members.difference_update(map(str, gone))
+            
+        changed = list(delta.added) + list(delta.modified) + [new_path for _, new_path in delta.renamed]
+        tracks = [track for track in map(self.library.get, changed) if track is not None]
+        if not tracks:
+            return
+        context = self._context()
+        for name, playlist in self._playlists.items():
+            matches = playlist.matcher(context)
+            members = self._members[name]
+            for track in tracks:
+                if matches(track):
+                    members.add(track.path)
+                else:
+                    members.discard(track.path)
+                    
+    def on_categories_changed(self, old_name=None, new_name=None):
+        """分类成员或名称变化后，重新评估引用分类的播放列表"""
+        if old_name is not None:
+            for playlist in self._playlists.values():
+                renamed = False
+                for condition in playlist.conditions:
+                    if condition['field'] == 'category' and condition.get('value') == old_name:
+                        condition['value'] = new_name
+                        renamed = True
+                if renamed:
+                    with self._conn:
+                        self._conn.execute("UPDATE smart_playlists SET definition = ? WHERE name = ?",
+                                           (playlist.to_json(), playlist.name))
+        self._evaluate([name for name, playlist in self._playlists.items() if playlist.uses('category')])
+        
+    def _context(self):
+        return EvaluationContext(self.categories, self._added)
+        
+    def _record_added(self, added=(), removed=(), renamed=(), estimate=False):
+        """记录歌曲加入音乐库的时间（改名、移动保留原来的时间）
+
+        estimate为True时没有记录的歌曲按修改时间估计，否则记为当前时间。
+        """
+        if not (added or removed or renamed):
+            return
+        now = time.time()
+        
+        def first_seen(path):
+            if estimate:
+                track = self.library.get(path)
+                if track is not None and 0 < track.mtime < now:
+                    return track.mtime
+            return now
+            
+        touched = set()
+        for path in map(str, removed):
+            self._added.pop(path, None)
+            touched.add(path)
+        for old_path, new_path in renamed:
+            old_path, new_path = str(old_path), str(new_path)
+            # 从音乐库外移入的文件没有记录，算作新加入
+            self._added[new_path] = self._added.pop(old_path, None) or first_seen(new_path)
+            touched.update((old_path, new_path))
+        for path in map(str, added):
+            if path not in self._added:
+                self._added[path] = first_seen(path)
+                touched.add(path)
+        # 按最终状态保存（同一增量中连续改名时中间的路径不会留下）
+        with self._conn:
+            self._conn.executemany("DELETE FROM track_added WHERE path = ?",
+                                   [(path,) for path in touched if path not in self._added])
+            self._conn.executemany("INSERT OR REPLACE INTO track_added (path, added) VALUES (?, ?)",
+                                   [(path, self._added[path]) for path in touched if path in self._added])
+                                   
+    def _evaluate(self, names):
+        """遍历整个音乐库评估给定的播放列表"""
+        if not names:
+            return
+        context = self._context()
+        matchers = [(self._playlists[name].matcher(context), set()) for name in names]
+        for track in self.library:
+            for matches, members in matchers:
+                if matches(track):
+                    members.add(track.path)
+        for name, (_, members) in zip(names, matchers):
+            self._members[name] = members
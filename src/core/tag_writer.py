@@ -0,0 +1,211 @@
+import time
+import base64
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PyQt5.QtCore import QThread, pyqtSignal
+from mutagen import File
+from mutagen import id3
+from mutagen.id3 import ID3, APIC
+from mutagen.mp4 import MP4Tags, MP4Cover, MP4FreeForm
+from mutagen.asf import ASFTags
+from mutagen.flac import FLAC, Picture
+from mutagen._vorbis import VComment
+
+from core.library_index import LibraryDelta
+from core.metadata import TAG_KEYS, SOURCE_URL_KEYS, tag_text
+
+# 标签类型 -> TAG_KEYS中对应的键名位置
+TAG_FORMATS = ((ID3, 0), (VComment, 1), (MP4Tags, 2), (ASFTags, 3))
+
+# 可写入的字段：音乐库读取的字段之外再加上来源链接
+WRITE_KEYS = dict(TAG_KEYS, url=SOURCE_URL_KEYS)
+
+# 封面图片类型：3 = 封面（正面）
+COVER_PICTURE_TYPE = 3
+
+def keep_padding(info):
+    """沿用原有的填充区：新标签放得下时原地改写，不移动后面的音频数据"""
+    if info.padding >= 0:
+        return info.padding
+    return info.get_default_padding()
+
+def tag_key_index(tags):
+    """标签格式对应的键名位置"""
+    for tag_type, index in TAG_FORMATS:
+        if isinstance(tags, tag_type):
+            return index
+    raise Exception(f"不支持写入的标签格式: {type(tags).__name__}")
+
+def set_tag(tags, key, value):
+    """写入或删除单个标签（value为空字符串时删除）"""
+    if isinstance(tags, ID3):
+        tags.delall(key)
+        if value:
+            frame_type = getattr(id3, key)
+            if issubclass(frame_type, id3.UrlFrame):
+                tags.add(frame_type(url=value))
+            else:
+                tags.add(frame_type(encoding=3, text=value))
+    elif value:
+        if key.startswith('----'):
+            tags[key] = [MP4FreeForm(value.encode('utf-8'))]
+        else:
+            tags[key] = [value]
+    elif key in tags:
+        del tags[key]
+
+def set_cover(audio, data, mime):
+    """嵌入封面图片，返回是否有变化（已是同一张图片时不修改）"""
+    tags = audio.tags
+    if isinstance(tags, ID3):
+        if any(frame.data == data for frame in tags.getall('APIC')):
+            return False
+        tags.delall('APIC')
+        tags.add(APIC(encoding=3, mime=mime, type=COVER_PICTURE_TYPE, desc='Cover', data=data))
+    elif isinstance(tags, MP4Tags):
+        if any(bytes(cover) == data for cover in tags.get('covr', [])):
+            return False
+        image_format = MP4Cover.FORMAT_PNG if mime == 'image/png' else MP4Cover.FORMAT_JPEG
+        tags['covr'] = [MP4Cover(data, imageformat=image_format)]
+    elif isinstance(audio, FLAC):
+        if any(picture.data == data for picture in audio.pictures):
+            return False
+        audio.clear_pictures()
+        audio.add_picture(cover_picture(data, mime))
+    elif isinstance(tags, VComment):
+        # Ogg没有图片块，按规范以base64存放在METADATA_BLOCK_PICTURE中
+        encoded = base64.b64encode(cover_picture(data, mime).write()).decode('ascii')
+        if encoded in tags.get('metadata_block_picture', []):
+            return False
+        tags['metadata_block_picture'] = [encoded]
+    else:
+        logging.warning(f"不支持嵌入封面的格式: {type(audio).__name__}")
+        return False
+    return True
+
+def cover_picture(data, mime):
+    """FLAC/Ogg使用的封面图片块"""
+    picture = Picture()
+    picture.type = COVER_PICTURE_TYPE
+    picture.mime = mime
+    picture.desc = 'Cover'
+    picture.data = data
+    return picture
+
+def write_tags(file_path, changes, cover=None):
+    """修改一个文件的标签，返回是否真的写入了文件
+
+    changes为 字段 -> 新值（字段同WRITE_KEYS，空字符串表示删除该标签），
+    cover为 (图片数据, MIME类型)。与现有值完全相同的文件不会被重写。
+    """
+    audio = File(file_path)
+    if audio is None:
+        raise Exception("无法识别的音频格式")
+    if audio.tags is None:
+        audio.add_tags()
+    tags = audio.tags
+    index = tag_key_index(tags)
+    
+    changed = False
+    for field, value in changes.items():
+        key = WRITE_KEYS[field][index]
+        current = tag_text(tags[key]) if key in tags else ''
+        if current != value:
+            set_tag(tags, key, value)
+            changed = True
+    if cover is not None and set_cover(audio, *cover):
+        changed = True
+    if not changed:
+        return False
+        
+    if isinstance(tags, ID3):
+        # 保持原来的ID3版本
+        version = 3 if tags.version[1] == 3 else 4
+        audio.save(v2_version=version, padding=keep_padding)
+    else:
+        audio.save(padding=keep_padding)
+    return True
+
+class TagEdit:
+    """对单个文件的标签修改"""
+    
+    def __init__(self, path, changes):
+        self.path = Path(path)
+        self.source = self.path
+        self.changes = dict(changes)
+        self.error = None
+        
+    def __repr__(self):
+        return f"TagEdit({self.path}, {self.changes})"
+
+class BatchTagWriter:
+    """批量写入标签（线程池并行，不依赖Qt）"""
+    MAX_WORKERS = 8
+    
+    def __init__(self, edits, progress=None):
+        self.edits = list(edits)
+        self.progress = progress
+        self.skipped = 0
+        self._is_running = True
+        self._done = 0
+        self._last_report = 0.0
+        
+    def stop(self):
+        """停止（已开始的文件会完成）"""
+        self._is_running = False
+        
+    def run(self):
+        """写入全部标签，返回 (LibraryDelta, 失败的修改)"""
+        delta = LibraryDelta()
+        failures = []
+        total = len(self.edits)
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            futures = {executor.submit(self._write, edit): edit for edit in self.edits}
+            for future in as_completed(futures):
+                edit = futures[future]
+                result = future.result()
+                if result is None:
+                    failures.append(edit)
+                elif result:
+                    delta.modified.append(edit.path)
+                else:
+                    self.skipped += 1
+                self._report(total)
+        return delta, failures
+        
+    def _write(self, edit):
+        """写入单个文件，失败返回None"""
+        if not self._is_running:
+            edit.error = "操作已取消"
+            return None
+        try:
+            return write_tags(edit.path, edit.changes)
+        except Exception as e:
+            edit.error = str(e)
+            logging.error(f"写入标签失败 {edit.path}: {e}")
+            return None
+            
+    def _report(self, total):
+        """汇报进度（合并高频更新）"""
+        self._done += 1
+        now = time.monotonic()
+        if self.progress and (self._done == total or now - self._last_report >= 0.1):
+            self._last_report = now
+            self.progress(self._done, total)
+
+class BatchTagWriteThread(QThread):
+    """批量写入标签线程，完成后以LibraryDelta（modified）返回结果"""
+    progress = pyqtSignal(int, int)
+    finished_batch = pyqtSignal(object, list)
+    
+    def __init__(self, edits, parent=None):
+        super().__init__(parent)
+        self.writer = BatchTagWriter(edits, self.progress.emit)
+        
+    def stop(self):
+        self.writer.stop()
+        
+    def run(self):
+        delta, failures = self.writer.run()
+        self.finished_batch.emit(delta, failures)
@@ -0,0 +1,87 @@
+import sys
+from pathlib import Path
+
+from utils.helpers import format_duration, format_file_size
+
+def intern_text(text):
+    """驻留字符串，歌手、风格等大量重复的值只保存一份"""
+    return sys.intern(text) if text else ''
+
+class Track:
+    """音乐库中的一首歌曲
+
+    使用__slots__保存原始数值（字节数、秒数、修改时间），
+    只在显示时才格式化成字符串。
+    """
+    __slots__ = ('path', 'title', 'artist', 'album', 'genre', 'year',
+                 'duration', 'size', 'mtime')
+                 
+    def __init__(self, path, title='', artist='', album='', genre='', year='',
+                 duration=0.0, size=0, mtime=0.0):
+        self.path = str(path)
+        self.title = title or Path(path).stem
+        self.artist = intern_text(artist)
+        self.album = intern_text(album)
+        self.genre = intern_text(genre)
+        self.year = intern_text(year)
+        self.duration = float(duration or 0)
+        self.size = int(size or 0)
+        self.mtime = float(mtime or 0)
+        
+    def __repr__(self):
+        return f"Track({self.path!r})"
+        
+    @classmethod
+    def from_values(cls, path, title, artist, album, genre, year, duration, size, mtime):
+        """用已经规范化的值直接创建记录（读取快照时使用，跳过__init__中的处理）"""
+        track = cls.__new__(cls)
+        track.path = path
+        track.title = title
+        track.artist = artist
+        track.album = album
+        track.genre = genre
+        track.year = year
+        track.duration = duration
+        track.size = size
+        track.mtime = mtime
+        return track
+        
+    def copy(self):
+        """复制一份记录"""
+        track = Track.__new__(Track)
+        track.update(self)
+        return track
+        
+    def update(self, other):
+        """用另一条记录的内容覆盖当前记录"""
+        for name in self.__slots__:
+            setattr(self, name, getattr(other, name))
+            
+    @property
+    def display_artist(self):
+        return self.artist or '未知歌手'
+        
+    @property
+    def display_genre(self):
+        return self.genre or '未知风格'
+        
+    @property
+    def display_duration(self):
+        return format_duration(int(self.duration))
+        
+    @property
+    def display_size(self):
+        return format_file_size(self.size)
+        
+    def as_dict(self):
+        """转换为旧版的歌曲信息字典（时长、大小为格式化字符串）"""
+        return {
+            'path': self.path,
+            'title': self.title,
+            'artist': self.artist,
+            'album': self.album,
+            'genre': self.genre,
+            'year': self.year,
+            'duration': self.display_duration,
+            'size': self.display_size,
+        }
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import shutil
+import logging
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PyQt5.QtCore import QThread, pyqtSignal
+from mutagen import File
+
+from core.metadata import read_tags, read_cover, read_source_url
+from core.tag_writer import write_tags
+
+TRANSCODE_JOB_FILE = Path.home() / '.bilibili_music_extractor' / 'transcode_job.json'
+
+# 预设：名称 -> (显示名称, 编码参数, 扩展名)
+PRESETS = {
+    'opus': ("Opus 128k（手机）", ['-c:a', 'libopus', '-b:a', '128k'], '.opus'),
+    'aac': ("AAC 256k", ['-c:a', 'aac', '-b:a', '256k'], '.m4a'),
+    'mp3': ("MP3 320k", ['-c:a', 'libmp3lame', '-b:a', '320k'], '.mp3'),
+    'flac': ("FLAC 无损", ['-c:a', 'flac'], '.flac'),
+}
+
+def require_ffmpeg():
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise Exception("转换格式需要ffmpeg")
+    return ffmpeg
+
+def output_path(source, library_root, output_dir, preset):
+    """输出文件路径：保持在音乐库中的相对位置，换成预设的扩展名"""
+    source = Path(source)
+    try:
+        relative = source.relative_to(library_root)
+    except ValueError:
+        relative = Path(source.name)
+    return Path(output_dir) / relative.with_suffix(PRESETS[preset][2])
+
+def output_dir_problem(output_dir, library_root, sources):
+    """检查输出目录，不能使用时返回原因，否则返回None
+
+    输出目录在音乐库中或包含源文件时，相同扩展名的预设会让输出文件覆盖源文件。
+    """
+    output = Path(output_dir).resolve()
+    root = Path(library_root).resolve()
+    if output == root or root in output.parents:
+        return "输出目录不能位于音乐库目录中"
+    for source in sources:
+        if output in Path(source).resolve().parents:
+            return "输出目录不能包含要转换的歌曲"
+    return None
+
+def image_mime(data):
+    return 'image/png' if data.startswith(b'\x89PNG') else 'image/jpeg'
+
+def copy_tags(source, target):
+    """把标签、来源链接和封面复制到转换后的文件"""
+    changes = {field: value for field, value in read_tags(File(source)).items() if value}
+    url = read_source_url(source)
+    if url:
+        changes['url'] = url
+    cover = read_cover(source)
+    write_tags(target, changes, (cover, image_mime(cover)) if cover else None)
+
+def transcode_file(source, target, preset):
+    """转换单个文件（在子进程中运行），返回音频时长（秒）
+
+    先写入临时文件，完成并复制标签后才改成最终文件名，
+    中断时不会留下看起来已经完成的输出。
+    """
+    ffmpeg = require_ffmpeg()
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp = target.with_name(f"{target.stem}.part{target.suffix}")
+    command = [
+        ffmpeg, '-v', 'error', '-nostdin', '-y', '-i', str(source),
+        '-map', '0:a:0', '-map_metadata', '-1', '-threads', '1'
+    ] + PRESETS[preset][1] + [str(temp)]
+    try:
+        result = subprocess.run(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        )
+        if result.returncode != 0:
+            errors = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise Exception(f"ffmpeg转换失败: {errors[-1] if errors else result.returncode}")
+        copy_tags(source, temp)
+        os.replace(temp, target)
+    finally:
+        if temp.exists():
+            temp.unlink()
+    audio = File(target)
+    return audio.info.length if audio is not None else 0.0
+
+class TranscodeJob:
+    """一次转换任务，保存在磁盘上，中断后可以继续"""
+    
+    def __init__(self, sources, library_root, output_dir, preset):
+        self.sources = [str(p) for p in sources]
+        self.library_root = str(library_root)
+        self.output_dir = str(output_dir)
+        self.preset = preset
+        
+    def outputs(self):
+        """(源文件, 输出文件) 列表"""
+        return [(source, output_path(source, self.library_root, self.output_dir, self.preset))
+                for source in self.sources]
+                
+    def save(self, path=None):
+        path = Path(path or TRANSCODE_JOB_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix('.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'sources': self.sources,
+                'library_root': self.library_root,
+                'output_dir': self.output_dir,
+                'preset': self.preset,
+            }, f, ensure_ascii=False)
+        os.replace(temp, path)
+        
+    @classmethod
+    def load(cls, path=None):
+        """读取未完成的任务，没有时返回None"""
+        path = Path(path or TRANSCODE_JOB_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(data['sources'], data['library_root'], data['output_dir'], data['preset'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"读取转换任务失败 {path}: {e}")
+            return None
+            
+    @staticmethod
+    def finish(path=None):
+        """任务完成后删除记录"""
+        try:
+            Path(path or TRANSCODE_JOB_FILE).unlink()
+        except OSError:
+            pass
+
+class TranscodeThread(QThread):
+    """批量转换格式
+
+    ffmpeg在进程池中并行（每个进程单线程编码，进程数等于CPU核数）。
+    已经转换过并且源文件没有变化的歌曲按索引跳过，所以中断后重新运行同一任务即可继续。
+    """
+    progress = pyqtSignal(int, int)
+    throughput = pyqtSignal(float, float)   # 每分钟完成的歌曲数, 实时倍率（音频时长/耗时）
+    finished_job = pyqtSignal(int, int, list)  # 转换数, 跳过数, 失败的 (源文件, 错误信息)
+    error = pyqtSignal(str)
+    
+    def __init__(self, job, index, parent=None):
+        super().__init__(parent)
+        self.job = job
+        self.index = index
+        self._is_running = True
+        
+    def stop(self):
+        self._is_running = False
+        
+    def run(self):
+        try:
+            require_ffmpeg()
+            self.job.save()
+            pairs = self.job.outputs()
+            # 输出文件就是源文件时跳过，绝不覆盖原文件
+            conflicts = [(source, "输出文件与源文件相同，已跳过") for source, output in pairs
+                         if Path(output).resolve() == Path(source).resolve()]
+            if conflicts:
+                blocked = {source for source, _ in conflicts}
+                pairs = [(source, output) for source, output in pairs if source not in blocked]
+            done = self.index.transcoded(pairs, self.job.preset)
+            todo = [(source, output) for source, output in pairs if str(output) not in done]
+            skipped = len(pairs) - len(todo)
+            failures = self._transcode(todo)
+            if self._is_running:
+                TranscodeJob.finish()
+                self.finished_job.emit(len(todo) - len(failures), skipped, conflicts + failures)
+        except Exception as e:
+            logging.error(f"转换格式失败: {e}")
+            self.error.emit(str(e))
+            
+    def _transcode(self, todo):
+        """在进程池中转换，返回失败的 (源文件, 错误信息)"""
+        failures = []
+        if not todo:
+            return failures
+            
+        started = time.monotonic()
+        audio_seconds = 0.0
+        self.progress.emit(0, len(todo))
+        executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 2)
+        futures = {}
+        try:
+            futures = {executor.submit(transcode_file, source, str(output), self.job.preset): (source, output)
+                       for source, output in todo}
+            for done, future in enumerate(as_completed(futures), 1):
+                if not self._is_running:
+                    break
+                source, output = futures[future]
+                try:
+                    audio_seconds += future.result()
+                    self.index.record_transcode(source, output, self.job.preset)
+                except Exception as e:
+                    logging.warning(f"转换失败 {source}: {e}")
+                    failures.append((source, str(e)))
+                    
+                elapsed = max(time.monotonic() - started, 1e-6)
+                self.progress.emit(done, len(todo))
+                self.throughput.emit(done * 60 / elapsed, audio_seconds / elapsed)
+        finally:
+            # 停止时取消还没开始的任务（shutdown的cancel_futures参数需要Python 3.9）
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+        return failures
@@ -87,4 +87,7 @@ if __name__ == "__main__":
     # 确保sys在全局可用
     if 'sys' not in globals():
         import sys
+    # 查重使用进程池，打包成exe后子进程需要从这里分流
+    import multiprocessing
+    multiprocessing.freeze_support()
     sys.exit(main())
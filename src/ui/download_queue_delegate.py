@@ -0,0 +1,84 @@
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionProgressBar, QStyleOptionButton, QApplication
+from PyQt5.QtCore import Qt, QRect, QEvent, pyqtSignal
+
+from ui.download_queue_model import DownloadQueueModel, PROGRESS_ROLE, ACTIONS_ROLE
+
+ACTION_LABELS = {
+    'pause': "暂停",
+    'resume': "继续",
+    'cancel': "取消",
+    'retry': "重试",
+}
+
+class DownloadQueueDelegate(QStyledItemDelegate):
+    """下载队列的进度条和操作按钮（直接绘制，不为每一行创建控件）
+
+    视图只为可见行调用paint，上千个任务也只绘制屏幕上的几十行；
+    点击操作列时按位置判断按钮，发出action_triggered(行号, 操作)。
+    """
+    action_triggered = pyqtSignal(int, str)
+    
+    BUTTON_WIDTH = 44
+    BUTTON_SPACING = 4
+    MARGIN = 2
+    
+    def paint(self, painter, option, index):
+        column = index.column()
+        if column == DownloadQueueModel.COLUMN_PROGRESS:
+            self.paint_progress(painter, option, index)
+        elif column == DownloadQueueModel.COLUMN_ACTIONS:
+            self.paint_actions(painter, option, index)
+        else:
+            super().paint(painter, option, index)
+            
+    def paint_background(self, painter, option):
+        """选中行和交替行的背景"""
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+        return style
+        
+    def paint_progress(self, painter, option, index):
+        style = self.paint_background(painter, option)
+        progress = QStyleOptionProgressBar()
+        progress.rect = option.rect.adjusted(self.MARGIN, self.MARGIN + 1, -self.MARGIN, -self.MARGIN - 1)
+        progress.minimum = 0
+        progress.maximum = 100
+        progress.progress = index.data(PROGRESS_ROLE) or 0
+        progress.text = f"{progress.progress}%"
+        progress.textVisible = True
+        progress.textAlignment = Qt.AlignCenter
+        progress.state = option.state | QStyle.State_Horizontal
+        style.drawControl(QStyle.CE_ProgressBar, progress, painter, option.widget)
+        
+    def paint_actions(self, painter, option, index):
+        style = self.paint_background(painter, option)
+        for action, rect in self.button_rects(option.rect, index.data(ACTIONS_ROLE) or ()):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = ACTION_LABELS[action]
+            button.state = QStyle.State_Enabled | QStyle.State_Raised
+            style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+            
+    def button_rects(self, cell, actions):
+        """各操作按钮在单元格中的位置"""
+        rects = []
+        x = cell.left() + self.MARGIN
+        for action in actions:
+            rects.append((action, QRect(x, cell.top() + 1, self.BUTTON_WIDTH, cell.height() - 2)))
+            x += self.BUTTON_WIDTH + self.BUTTON_SPACING
+        return rects
+        
+    def editorEvent(self, event, model, option, index):
+        if index.column() == DownloadQueueModel.COLUMN_ACTIONS and event.type() == QEvent.MouseButtonRelease \
+                and event.button() == Qt.LeftButton:
+            for action, rect in self.button_rects(option.rect, index.data(ACTIONS_ROLE) or ()):
+                if rect.contains(event.pos()):
+                    self.action_triggered.emit(index.row(), action)
+                    return True
+        return super().editorEvent(event, model, option, index)
+        
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        if index.column() == DownloadQueueModel.COLUMN_ACTIONS:
+            size.setWidth(self.MARGIN * 2 + 2 * self.BUTTON_WIDTH + self.BUTTON_SPACING)
+        return size
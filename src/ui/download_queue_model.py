@@ -0,0 +1,174 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QColor
+
+from core.download_queue import FINISHED, FAILED, CANCELLED, PAUSED, PRIORITY_NAMES, PRIORITY_NORMAL
+
+# 委托绘制使用的数据
+PROGRESS_ROLE = Qt.UserRole       # 进度百分比（int）
+ACTIONS_ROLE = Qt.UserRole + 1    # 可用的操作（'pause', 'resume', 'cancel', 'retry'）
+
+def row_ranges(rows):
+    """把行号合并成连续区间 [(起始, 结束)]"""
+    ranges = []
+    for row in sorted(rows):
+        if ranges and row == ranges[-1][1] + 1:
+            ranges[-1][1] = row
+        else:
+            ranges.append([row, row])
+    return ranges
+
+def format_duration(seconds):
+    """时长显示为 分:秒 或 时:分:秒"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+class DownloadQueueModel(QAbstractTableModel):
+    """下载队列列表模型
+
+    数据来自DownloadQueue的任务对象，只在队列发出合并后的更新通知时刷新变化的行，
+    不为每一行创建控件：进度条和操作按钮由DownloadQueueDelegate只为可见行绘制。
+    """
+    
+    HEADERS = ["歌曲名", "时长", "UP主", "状态", "进度", "操作", "链接"]
+    (COLUMN_TITLE, COLUMN_DURATION, COLUMN_UPLOADER, COLUMN_STATE,
+     COLUMN_PROGRESS, COLUMN_ACTIONS, COLUMN_URL) = range(7)
+     
+    STATE_COLORS = {
+        FINISHED: QColor(56, 142, 60),
+        FAILED: QColor(211, 47, 47),
+        CANCELLED: QColor(117, 117, 117),
+        PAUSED: QColor(245, 124, 0),
+    }
+    
+    def __init__(self, queue, parent=None):
+        super().__init__(parent)
+        self.queue = queue
+        self._jobs = []
+        self._row_of = {}   # 任务id -> 行号
+        queue.jobs_added.connect(self.add_jobs)
+        queue.jobs_updated.connect(self.update_jobs)
+        queue.jobs_removed.connect(self.remove_jobs)
+        queue.jobs_reordered.connect(self.reorder_jobs)
+        
+    # ---- Qt模型接口 ----
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._jobs)
+        
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+        
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+        
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+            
+        job = self._jobs[index.row()]
+        column = index.column()
+        
+        if role == PROGRESS_ROLE:
+            return job.progress
+        if role == ACTIONS_ROLE:
+            return job.actions()
+            
+        if role == Qt.DisplayRole:
+            if column == self.COLUMN_TITLE:
+                return self.title_text(job)
+            if column == self.COLUMN_DURATION:
+                return format_duration(job.duration) if job.duration else ""
+            if column == self.COLUMN_UPLOADER:
+                return job.uploader or ""
+            if column == self.COLUMN_STATE:
+                return job.display_state
+            if column == self.COLUMN_PROGRESS:
+                return f"{job.progress}%"
+            if column == self.COLUMN_URL:
+                return job.url
+                
+        if role == Qt.ToolTipRole:
+            if job.state == FAILED and job.error:
+                return f"{job.display_title}\n{job.error}"
+            if job.file_path:
+                return job.file_path
+            return job.url
+            
+        if role == Qt.ForegroundRole and column == self.COLUMN_STATE:
+            return self.STATE_COLORS.get(job.state)
+            
+        if role == Qt.TextAlignmentRole and column in (self.COLUMN_DURATION, self.COLUMN_PROGRESS):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+            
+        return None
+        
+    def title_text(self, job):
+        """歌曲名前标出置顶和非普通的优先级"""
+        marks = []
+        if job.pinned:
+            marks.append("📌")
+        if job.priority != PRIORITY_NORMAL:
+            marks.append(f"[{PRIORITY_NAMES.get(job.priority, job.priority)}]")
+        marks.append(job.display_title)
+        return " ".join(marks)
+        
+    # ---- 任务增删改 ----
+    
+    def job(self, row):
+        return self._jobs[row]
+        
+    def jobs_at(self, indexes):
+        """选中的行对应的任务（去重，按行号排序）"""
+        rows = sorted({index.row() for index in indexes})
+        return [self._jobs[row] for row in rows]
+        
+    def add_jobs(self, jobs):
+        """批量添加任务（一次插入通知）"""
+        first = len(self._jobs)
+        self.beginInsertRows(QModelIndex(), first, first + len(jobs) - 1)
+        for row, job in enumerate(jobs, first):
+            self._row_of[job.id] = row
+        self._jobs.extend(jobs)
+        self.endInsertRows()
+        
+    def update_jobs(self, jobs):
+        """刷新变化的行（相邻行合并成一次通知）"""
+        rows = (self._row_of.get(job.id) for job in jobs)
+        last_column = self.columnCount() - 1
+        for first, last in row_ranges(row for row in rows if row is not None):
+            self.dataChanged.emit(self.index(first, 0), self.index(last, last_column))
+            
+    def remove_jobs(self, jobs):
+        """移除任务（相邻行合并成一次通知）"""
+        rows = (self._row_of.get(job.id) for job in jobs)
+        ranges = row_ranges(row for row in rows if row is not None)
+        if not ranges:
+            return
+        for first, last in reversed(ranges):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._jobs[first:last + 1]
+            self.endRemoveRows()
+        self._row_of = {job.id: row for row, job in enumerate(self._jobs)}
+        
+    def reorder_jobs(self):
+        """队列顺序手动调整后按新顺序排列（保持选中行）"""
+        self.layoutAboutToBeChanged.emit()
+        old_jobs = self._jobs
+        self._jobs = list(self.queue.jobs)
+        self._row_of = {job.id: row for row, job in enumerate(self._jobs)}
+        old_indexes = self.persistentIndexList()
+        new_indexes = []
+        for index in old_indexes:
+            row = self._row_of.get(old_jobs[index.row()].id)
+            new_indexes.append(self.index(row, index.column()) if row is not None else QModelIndex())
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
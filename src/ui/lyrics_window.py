@@ -51,6 +51,7 @@ class LyricsWindow(QDialog):
         self.song_path = song_path
         self.lyric_matcher = lyric_matcher
         self.current_lyric = ""
+        self.song_info = {}
         
         self.setWindowTitle("歌词管理")
         self.setGeometry(200, 200, 600, 500)
@@ -116,7 +117,7 @@ class LyricsWindow(QDialog):
     def load_song_info(self):
         """加载歌曲信息"""
         try:
-            song_info = self.lyric_matcher.get_song_info(self.song_path)
+            self.song_info = song_info = self.lyric_matcher.get_song_info(self.song_path)
             song_name = song_info.get('title', self.song_path.stem)
             artist = song_info.get('artist', '未知歌手')
             
@@ -142,7 +143,8 @@ class LyricsWindow(QDialog):
                 
     def auto_match_lyrics(self):
         """自动匹配歌词"""
-        song_info = self.lyric_matcher.get_song_info(self.song_path)
+        # 复用打开窗口时读取的信息，不再重新解析文件
+        song_info = self.song_info or self.lyric_matcher.get_song_info(self.song_path)
         song_name = song_info.get('title', self.song_path.stem)
         artist = song_info.get('artist', '')
         
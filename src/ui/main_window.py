@@ -2,18 +2,19 @@ import os
 import sys
 import re
 import json
-import time
 import logging
+import threading
 from pathlib import Path
 from urllib.parse import urlparse
 
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLineEdit, QLabel, QMessageBox,
-                             QTabWidget, QTreeWidget, QTreeWidgetItem, QHeaderView,
+                             QTabWidget, QHeaderView,
                              QSplitter, QToolBar, QAction, QMenuBar, QMenu,
-                             QInputDialog, QFileDialog, QProgressBar, QCheckBox,
+                             QInputDialog, QFileDialog, QProgressBar,
+                             QTableView, QAbstractItemView,
                              QListWidget, QListWidgetItem, QGroupBox, QApplication,
-                             QTextEdit, QDialog, QDialogButtonBox, QComboBox)
+                             QTextEdit, QDialog, QDialogButtonBox, QComboBox, QFormLayout)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSettings, QTimer, QSize
 from PyQt5.QtGui import QIcon, QFont, QPalette, QColor
 
@@ -26,66 +27,204 @@ src_path = Path(__file__).parent.parent
 if str(src_path) not in sys.path:
     sys.path.insert(0, str(src_path))
 
-# 安全导入核心模块
+from core.library_index import LibraryIndex, LibraryDelta
+from core.library_watcher import LibraryWatcher
+from core.search_index import SearchIndex
+from core.metadata import MetadataService
+from core.cover_cache import ThumbnailLoader, default_cover_cache
+from core.file_operations import FileOperation, BatchFileOperationThread, JournalRecoveryThread
+from core.tag_writer import TagEdit, BatchTagWriteThread
+from core.content_index import ExactDuplicateThread, default_content_index
+from core.integrity import IntegrityCheckThread
+from core.metadata import read_source_url
+from core.transcoder import PRESETS, TranscodeJob, TranscodeThread, output_dir_problem
+from core.library_sync import LibrarySyncThread
+from core.exporters import EXPORTERS, export_tracks, filter_tracks
+from core.importer import ImportThread
+from core.categories import default_category_store
+from core.smart_playlists import SmartPlaylists
+from core.library_snapshot import LibraryScanThread, load_snapshot, save_snapshot
+from core.operation_journal import (BatchJournal, TRASH_RETENTION_DAYS, pending_journals,
+                                    last_undoable, purge_journals, rollback, replay)
+from core.download_store import DownloadStore
+from utils.helpers import validate_url
+from core.download_queue import (DownloadQueue, QUEUED, RUNNING, PAUSED, FINISHED, FAILED, CANCELLED,
+                                 PRIORITY_NAMES)
+from core.download_scheduler import POLICIES, DEFAULT_POLICY
+from ui.song_table_model import SongTableModel
+from ui.download_queue_model import DownloadQueueModel
+from ui.download_queue_delegate import DownloadQueueDelegate
+from ui.smart_playlist_dialog import SmartPlaylistDialog
+
+# 安全导入核心模块（下载器依赖yt-dlp，导入较慢，在第一次使用时才导入，见import_downloader）
 try:
-    from core.downloader import BilibiliDownloader, DownloadThread
     from core.music_manager import MusicManager
     from core.lyric_matcher import LyricMatcher
     from ui.lyrics_window import LyricsWindow
 except ImportError as e:
     logging.error(f"模块导入错误: {e}")
     # 创建虚拟类避免崩溃
-    class BilibiliDownloader:
-        def __init__(self): pass
-        def validate_url(self, url): return True
-        def extract_video_info(self, url): return {}
-        def test_connection(self): return True
-    class DownloadThread(QThread):
-        progress = pyqtSignal(str, int)
-        status = pyqtSignal(str, str)
-        finished = pyqtSignal(str, str)
-        error = pyqtSignal(str, str)
-        def __init__(self, url, path, downloader): 
-            super().__init__()
-            self.url = url
-        def run(self): pass
-        def stop(self): pass
     class MusicManager:
-        def __init__(self): pass
+        def __init__(self, metadata=None): pass
         def get_song_info(self, path): return {}
+        def read_track(self, path): return None
         def rename_file(self, path, new_name): pass
         def move_file(self, path, target_dir): pass
         def delete_file(self, path): pass
     class LyricMatcher:
-        def __init__(self): pass
+        def __init__(self, metadata=None): pass
     class LyricsWindow(QDialog):
         def __init__(self, song_path, matcher): super().__init__()
 
+class PlaceholderDownloader:
+    """下载模块不可用时的虚拟下载器"""
+    def __init__(self, metadata=None): pass
+    def validate_url(self, url): return True
+    def extract_video_info(self, url): return {}
+    def test_connection(self): return True
+
+class PlaceholderDownloadThread(QThread):
+    progress = pyqtSignal(str, int)
+    status = pyqtSignal(str, str)
+    finished = pyqtSignal(str, str)
+    error = pyqtSignal(str, str)
+    video_info = pyqtSignal(str, dict)
+    partial_file = pyqtSignal(str, str)
+    done = pyqtSignal(str)
+    def __init__(self, url, path, downloader): 
+        super().__init__()
+        self.url = url
+    def run(self):
+        self.error.emit(self.url, "下载模块不可用")
+        self.done.emit(self.url)
+    def stop(self): pass
+
+def import_downloader():
+    """导入下载模块，返回 (BilibiliDownloader, DownloadThread)，不可用时返回虚拟类"""
+    try:
+        from core.downloader import BilibiliDownloader, DownloadThread
+        return BilibiliDownloader, DownloadThread
+    except ImportError as e:
+        logging.error(f"模块导入错误: {e}")
+        return PlaceholderDownloader, PlaceholderDownloadThread
+
 class MainWindow(QMainWindow):
+    downloader_ready = pyqtSignal()  # 后台线程创建好下载器（见preload_downloader）
+    
     def __init__(self):
         super().__init__()
         self.settings = QSettings("B站音乐提取器", "B站音乐提取器")
         
-        # 初始化核心组件
+        # 初始化核心组件（共用同一个元数据缓存）
+        self.metadata_service = MetadataService()
         try:
-            self.downloader = BilibiliDownloader()
-            self.music_manager = MusicManager()
-            self.lyric_matcher = LyricMatcher()
+            self.music_manager = MusicManager(self.metadata_service)
+            self.lyric_matcher = LyricMatcher(self.metadata_service)
         except Exception as e:
             logging.error(f"组件初始化失败: {e}")
             # 创建虚拟对象
-            self.downloader = BilibiliDownloader()
             self.music_manager = MusicManager()
             self.lyric_matcher = LyricMatcher()
-        
-        self.download_threads = []
-        self.current_songs = []
+        self._downloader = None  # 窗口显示后在后台线程中创建，见preload_downloader
+        self._downloader_loading = None
+        
+        # 下载队列（创建下载线程时才导入下载模块），保存在音乐库数据库中，窗口显示后恢复
+        self.download_queue = DownloadQueue(self.create_download_thread, DownloadStore(),
+                                            self.create_info_resolver, self)
+        self.download_queue.set_policy(self.settings.value("download_policy", DEFAULT_POLICY))
+        self.download_model = DownloadQueueModel(self.download_queue, self)
+        self.download_queue.jobs_updated.connect(self.on_downloads_updated)
+        self.download_queue.job_finished.connect(self.on_download_finished)
+        self.network_checker = None
+        self.file_operation_thread = None
+        self.duplicate_thread = None
+        self.integrity_thread = None
+        self.transcode_thread = None
+        self.sync_thread = None
+        self.scan_thread = None
+        self.library_index = LibraryIndex()
+        self.search_index = SearchIndex()
+        self.song_model = SongTableModel(self)
+        
+        # 封面缩略图在后台加载，只加载可见行
+        self.cover_cache = default_cover_cache()
+        self.content_index = default_content_index()
+        self.category_store = default_category_store()
+        self.smart_playlists = SmartPlaylists(self.library_index, self.category_store)
+        self.thumbnail_loader = ThumbnailLoader(self.cover_cache, self)
+        self.song_model.set_thumbnail_loader(self.thumbnail_loader)
+        self.thumbnail_loader.start()
+        
+        # 空闲时分批建立搜索索引
+        self.index_timer = QTimer(self)
+        self.index_timer.setInterval(0)
+        self.index_timer.timeout.connect(self.index_pending_songs)
+        
+        # 边输入边搜索（去抖）
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.search_songs)
+        
+        # 窗口第一次绘制之后再执行的启动任务（见after_first_paint）
+        self._after_first_paint = []
+        
+        # 监视音乐库目录，增量更新列表
+        self.library_watcher = LibraryWatcher(self)
+        self.library_watcher.changed.connect(self.on_library_changed)
         
         self.init_ui()
         self.setup_connections()
         self.load_settings()
+        self.recover_file_operations()
         self.load_music_library()
         
+        # 恢复的任务会立即开始下载，等下载器在后台创建好再恢复
+        self.downloader_ready.connect(self.download_queue.restore)
+        self.after_first_paint(self.preload_downloader)
+        
+        # 后台清理过期的操作日志和回收站
+        threading.Thread(target=purge_journals, daemon=True).start()
+        
+    @property
+    def downloader(self):
+        """下载器（后台线程还没创建好时等待它完成）"""
+        if self._downloader is None:
+            self.preload_downloader()
+            self._downloader_loading.join()
+        return self._downloader
+        
+    def preload_downloader(self):
+        """在后台线程中导入yt-dlp并创建下载器（约0.2秒），不拖慢启动，也不卡住界面"""
+        if self._downloader is None and self._downloader_loading is None:
+            self._downloader_loading = threading.Thread(target=self._create_downloader, daemon=True)
+            self._downloader_loading.start()
+            
+    def _create_downloader(self):
+        try:
+            BilibiliDownloader, _ = import_downloader()
+            downloader = BilibiliDownloader(self.metadata_service)
+        except Exception as e:
+            logging.error(f"组件初始化失败: {e}")
+            downloader = PlaceholderDownloader()
+        self._downloader = downloader
+        # 信号排队到界面线程
+        self.downloader_ready.emit()
+        
+    def after_first_paint(self, callback):
+        """窗口第一次绘制之后再执行callback（已绘制过时在下一轮事件循环执行）"""
+        if self._after_first_paint is None:
+            QTimer.singleShot(0, callback)
+        else:
+            self._after_first_paint.append(callback)
+            
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self._after_first_paint is not None:
+            callbacks, self._after_first_paint = self._after_first_paint, None
+            for callback in callbacks:
+                QTimer.singleShot(0, callback)
+                
     def init_ui(self):
         """初始化用户界面"""
         self.setWindowTitle("B站音乐提取器 v1.0")
@@ -168,8 +307,8 @@ class MainWindow(QMainWindow):
         category_group = QGroupBox("分类管理")
         category_layout = QVBoxLayout(category_group)
         
+        # 分类保存在音乐库数据库中，点击分类只显示其中的歌曲
         self.category_list = QListWidget()
-        self.category_list.addItems(["流行", "摇滚", "电子", "古典", "爵士", "说唱"])
         category_layout.addWidget(self.category_list)
         
         # 分类操作按钮
@@ -184,6 +323,23 @@ class MainWindow(QMainWindow):
         
         layout.addWidget(category_group)
         
+        # 智能播放列表（按条件自动维护）
+        playlist_group = QGroupBox("智能播放列表")
+        playlist_layout = QVBoxLayout(playlist_group)
+        self.playlist_list = QListWidget()
+        playlist_layout.addWidget(self.playlist_list)
+        
+        playlist_btn_layout = QHBoxLayout()
+        self.add_playlist_btn = QPushButton("新建")
+        self.edit_playlist_btn = QPushButton("编辑")
+        self.del_playlist_btn = QPushButton("删除")
+        playlist_btn_layout.addWidget(self.add_playlist_btn)
+        playlist_btn_layout.addWidget(self.edit_playlist_btn)
+        playlist_btn_layout.addWidget(self.del_playlist_btn)
+        playlist_layout.addLayout(playlist_btn_layout)
+        
+        layout.addWidget(playlist_group)
+        
         # 状态信息区域
         status_group = QGroupBox("状态信息")
         status_layout = QVBoxLayout(status_group)
@@ -208,13 +364,11 @@ class MainWindow(QMainWindow):
         self.music_library_tab = self.create_music_library_tab()
         self.tab_widget.addTab(self.music_library_tab, "🎵 音乐库")
         
-        # 下载队列标签页
-        self.download_queue_tab = self.create_download_queue_tab()
-        self.tab_widget.addTab(self.download_queue_tab, "⏬ 下载队列")
-        
-        # 歌词管理标签页
-        self.lyrics_tab = self.create_lyrics_tab()
-        self.tab_widget.addTab(self.lyrics_tab, "📝 歌词管理")
+        # 下载队列和歌词管理标签页在第一次显示时才创建
+        self._lazy_tabs = {}
+        self.download_queue_tab = self.add_lazy_tab(self.create_download_queue_tab, "⏬ 下载队列")
+        self.lyrics_tab = self.add_lazy_tab(self.create_lyrics_tab, "📝 歌词管理")
+        self.tab_widget.currentChanged.connect(lambda index: self.ensure_tab(self.tab_widget.widget(index)))
         
         layout.addWidget(self.tab_widget)
         
@@ -231,7 +385,7 @@ class MainWindow(QMainWindow):
         # 搜索区域
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("搜索歌曲名或歌手...")
+        self.search_input.setPlaceholderText("搜索歌曲名、歌手、专辑或拼音...")
         self.search_btn = QPushButton("搜索")
         search_layout.addWidget(QLabel("搜索:"))
         search_layout.addWidget(self.search_input)
@@ -244,31 +398,53 @@ class MainWindow(QMainWindow):
         self.rename_btn = QPushButton("重命名")
         self.move_btn = QPushButton("移动")
         self.delete_btn = QPushButton("删除")
+        self.tag_btn = QPushButton("编辑标签")
         self.lyric_btn = QPushButton("歌词管理")
+        self.duplicate_btn = QPushButton("查重")
+        duplicate_menu = QMenu(self.duplicate_btn)
+        duplicate_menu.addAction("完全相同的文件", self.find_identical_files)
+        duplicate_menu.addAction("声音相同的歌曲", self.find_duplicate_songs)
+        self.duplicate_btn.setMenu(duplicate_menu)
+        self.check_btn = QPushButton("检查文件")
+        self.category_btn = QPushButton("分类")
+        self.category_menu = QMenu(self.category_btn)
+        self.category_menu.aboutToShow.connect(self.update_category_menu)
+        self.category_btn.setMenu(self.category_menu)
         
         for btn in [self.select_all_btn, self.rename_btn, self.move_btn, 
-                   self.delete_btn, self.lyric_btn]:
+                   self.delete_btn, self.tag_btn, self.lyric_btn, self.duplicate_btn, self.check_btn,
+                   self.category_btn]:
             batch_ops_layout.addWidget(btn)
             
         toolbar.addLayout(batch_ops_layout)
         layout.addLayout(toolbar)
         
-        # 歌曲列表
-        self.song_list = QTreeWidget()
-        self.song_list.setHeaderLabels(["选择", "歌曲名", "歌手", "风格", "时长", "大小", "路径"])
-        self.song_list.setSelectionMode(QTreeWidget.ExtendedSelection)
+        # 歌曲列表（模型/视图，只绘制可见行）
+        self.song_list = QTableView()
+        self.song_list.setModel(self.song_model)
+        self.song_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.song_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.song_list.setAlternatingRowColors(True)
-        
-        # 设置列宽
-        header = self.song_list.header()
-        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(1, QHeaderView.Stretch)
-        header.setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(3, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(4, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(5, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(6, QHeaderView.ResizeToContents)
-        
+        self.song_list.setShowGrid(False)
+        self.song_list.setWordWrap(False)
+        self.song_list.setSortingEnabled(True)
+        self.song_list.setIconSize(QSize(20, 20))
+        
+        # 固定行高，避免逐行计算尺寸
+        vertical_header = self.song_list.verticalHeader()
+        vertical_header.setVisible(False)
+        vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(24)
+        
+        # 设置列宽（不使用ResizeToContents，避免遍历所有行）
+        header = self.song_list.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setSectionResizeMode(SongTableModel.COLUMN_TITLE, QHeaderView.Stretch)
+        for column, width in ((SongTableModel.COLUMN_CHECK, 40), (SongTableModel.COLUMN_ARTIST, 120),
+                              (SongTableModel.COLUMN_GENRE, 80), (SongTableModel.COLUMN_DURATION, 60),
+                              (SongTableModel.COLUMN_SIZE, 80), (SongTableModel.COLUMN_PATH, 240)):
+            header.resizeSection(column, width)
+            
         layout.addWidget(self.song_list)
         
         # 状态信息
@@ -282,30 +458,82 @@ class MainWindow(QMainWindow):
         
         return tab
         
+    def add_lazy_tab(self, factory, title):
+        """添加占位标签页，内容由factory在第一次显示时创建"""
+        placeholder = QWidget()
+        layout = QVBoxLayout(placeholder)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self._lazy_tabs[placeholder] = factory
+        self.tab_widget.addTab(placeholder, title)
+        return placeholder
+        
+    def ensure_tab(self, tab):
+        """确保标签页的内容已经创建"""
+        factory = self._lazy_tabs.pop(tab, None)
+        if factory is not None:
+            tab.layout().addWidget(factory())
+            
     def create_download_queue_tab(self):
-        """创建下载队列标签页 - 根据用户截图实现"""
+        """创建下载队列标签页
+
+        模型/视图加委托绘制，进度由下载队列合并后刷新，任务再多也只绘制可见行；
+        完成的任务移出列表，只显示在计数中。
+        """
         tab = QWidget()
         layout = QVBoxLayout(tab)
         
         # 下载队列列表
-        self.download_list = QTreeWidget()
-        self.download_list.setHeaderLabels(["歌曲名", "状态", "进度", "操作"])
+        self.download_list = QTableView()
+        self.download_list.setModel(self.download_model)
+        self.download_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.download_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.download_list.setAlternatingRowColors(True)
+        self.download_list.setShowGrid(False)
+        self.download_list.setWordWrap(False)
+        self.download_list.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.download_list.customContextMenuRequested.connect(self.show_download_menu)
         
-        # 设置列宽
-        header = self.download_list.header()
-        header.setSectionResizeMode(0, QHeaderView.Stretch)
-        header.setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        # 进度条和操作按钮由委托绘制
+        self.download_delegate = DownloadQueueDelegate(self.download_list)
+        self.download_delegate.action_triggered.connect(self.on_download_action)
+        self.download_list.setItemDelegate(self.download_delegate)
         
-        # 添加示例下载项（根据用户截图）
-        self.add_example_download_item()
+        vertical_header = self.download_list.verticalHeader()
+        vertical_header.setVisible(False)
+        vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(24)
         
+        # 设置列宽
+        header = self.download_list.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setSectionResizeMode(DownloadQueueModel.COLUMN_TITLE, QHeaderView.Stretch)
+        for column, width in ((DownloadQueueModel.COLUMN_DURATION, 60), (DownloadQueueModel.COLUMN_UPLOADER, 120),
+                              (DownloadQueueModel.COLUMN_STATE, 200), (DownloadQueueModel.COLUMN_PROGRESS, 120),
+                              (DownloadQueueModel.COLUMN_ACTIONS, 100), (DownloadQueueModel.COLUMN_URL, 240)):
+            header.resizeSection(column, width)
+            
         layout.addWidget(self.download_list)
         
         # 下载控制按钮
         control_layout = QHBoxLayout()
+        self.download_summary_label = QLabel()
+        control_layout.addWidget(self.download_summary_label)
+        control_layout.addStretch()
+        
+        # 调度策略：决定等待中的任务先下载哪个
+        control_layout.addWidget(QLabel("下载顺序:"))
+        self.download_policy_combo = QComboBox()
+        for name, policy in POLICIES.items():
+            self.download_policy_combo.addItem(policy.label, name)
+            self.download_policy_combo.setItemData(
+                self.download_policy_combo.count() - 1, policy.__doc__.split("\n")[0], Qt.ToolTipRole
+            )
+        self.download_policy_combo.setCurrentIndex(
+            max(0, self.download_policy_combo.findData(self.download_queue.policy.name))
+        )
+        self.download_policy_combo.currentIndexChanged.connect(self.change_download_policy)
+        control_layout.addWidget(self.download_policy_combo)
+        
         self.pause_all_btn = QPushButton("暂停全部")
         self.resume_all_btn = QPushButton("继续全部")
         self.cancel_all_btn = QPushButton("取消全部")
@@ -316,26 +544,14 @@ class MainWindow(QMainWindow):
             
         layout.addLayout(control_layout)
         
-        return tab
+        # 下载控制
+        self.pause_all_btn.clicked.connect(self.pause_all_downloads)
+        self.resume_all_btn.clicked.connect(self.resume_all_downloads)
+        self.cancel_all_btn.clicked.connect(self.cancel_all_downloads)
+        self.clear_finished_btn.clicked.connect(self.clear_finished_downloads)
         
-    def add_example_download_item(self):
-        """添加示例下载项（根据用户截图）"""
-        item = QTreeWidgetItem(self.download_list)
-        item.setText(0, "解析中...")
-        item.setText(1, "等待中")
-        item.setText(2, "0%")
-        
-        # 取消按钮
-        cancel_btn = QPushButton("取消")
-        cancel_btn.setFixedWidth(60)
-        cancel_btn.clicked.connect(lambda: self.cancel_download_item(item))
-        self.download_list.setItemWidget(item, 3, cancel_btn)
-        
-    def cancel_download_item(self, item):
-        """取消下载项"""
-        item.setText(1, "已取消")
-        item.setText(2, "-")
-        QMessageBox.information(self, "提示", "下载已取消")
+        self.update_download_summary()
+        return tab
         
     def create_lyrics_tab(self):
         """创建歌词管理标签页"""
@@ -369,6 +585,12 @@ class MainWindow(QMainWindow):
             
         layout.addLayout(lyrics_btn_layout)
         
+        # 歌词操作
+        self.search_lyrics_btn.clicked.connect(self.search_lyrics)
+        self.download_lyrics_btn.clicked.connect(self.download_lyrics)
+        self.save_lyrics_btn.clicked.connect(self.save_lyrics)
+        self.sync_lyrics_btn.clicked.connect(self.sync_lyrics)
+        
         return tab
         
     def create_menu_bar(self):
@@ -382,16 +604,29 @@ class MainWindow(QMainWindow):
         import_action.setShortcut("Ctrl+I")
         import_action.triggered.connect(self.import_music)
         
+        import_folder_action = QAction("导入文件夹", self)
+        import_folder_action.triggered.connect(self.import_music_folder)
+        
         export_action = QAction("导出列表", self)
         export_action.setShortcut("Ctrl+E")
         export_action.triggered.connect(self.export_music_list)
         
+        sync_action = QAction("同步到设备...", self)
+        sync_action.triggered.connect(self.sync_library)
+        
+        undo_action = QAction("撤销文件操作", self)
+        undo_action.setShortcut("Ctrl+Z")
+        undo_action.triggered.connect(self.undo_file_operations)
+        
         exit_action = QAction("退出", self)
         exit_action.setShortcut("Ctrl+Q")
         exit_action.triggered.connect(self.close)
         
         file_menu.addAction(import_action)
+        file_menu.addAction(import_folder_action)
         file_menu.addAction(export_action)
+        file_menu.addAction(sync_action)
+        file_menu.addAction(undo_action)
         file_menu.addSeparator()
         file_menu.addAction(exit_action)
         
@@ -405,6 +640,10 @@ class MainWindow(QMainWindow):
         network_test_action = QAction("网络诊断", self)
         network_test_action.triggered.connect(self.network_diagnose)
         
+        transcode_action = QAction("转换格式...", self)
+        transcode_action.triggered.connect(self.transcode_songs)
+        
+        tool_menu.addAction(transcode_action)
         tool_menu.addAction(network_test_action)
         tool_menu.addAction(settings_action)
         
@@ -452,29 +691,28 @@ class MainWindow(QMainWindow):
         self.add_category_btn.clicked.connect(self.add_category)
         self.edit_category_btn.clicked.connect(self.edit_category)
         self.del_category_btn.clicked.connect(self.delete_category)
+        self.category_list.currentItemChanged.connect(self.on_category_selected)
+        
+        # 智能播放列表
+        self.add_playlist_btn.clicked.connect(self.add_smart_playlist)
+        self.edit_playlist_btn.clicked.connect(self.edit_smart_playlist)
+        self.del_playlist_btn.clicked.connect(self.delete_smart_playlist)
+        self.playlist_list.currentItemChanged.connect(self.on_playlist_selected)
         
         # 音乐库操作
         self.search_btn.clicked.connect(self.search_songs)
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
+        self.search_input.returnPressed.connect(self.search_songs)
         self.select_all_btn.clicked.connect(self.select_all_songs)
         self.rename_btn.clicked.connect(self.rename_songs)
         self.move_btn.clicked.connect(self.move_songs)
         self.delete_btn.clicked.connect(self.delete_songs)
+        self.tag_btn.clicked.connect(self.edit_song_tags)
         self.lyric_btn.clicked.connect(self.manage_lyrics)
-        
-        # 下载控制
-        self.pause_all_btn.clicked.connect(self.pause_all_downloads)
-        self.resume_all_btn.clicked.connect(self.resume_all_downloads)
-        self.cancel_all_btn.clicked.connect(self.cancel_all_downloads)
-        self.clear_finished_btn.clicked.connect(self.clear_finished_downloads)
-        
-        # 歌词操作
-        self.search_lyrics_btn.clicked.connect(self.search_lyrics)
-        self.download_lyrics_btn.clicked.connect(self.download_lyrics)
-        self.save_lyrics_btn.clicked.connect(self.save_lyrics)
-        self.sync_lyrics_btn.clicked.connect(self.sync_lyrics)
+        self.check_btn.clicked.connect(self.check_library_integrity)
         
         # 其他信号
-        self.song_list.itemSelectionChanged.connect(self.update_selection_count)
+        self.song_model.checked_count_changed.connect(self.update_selection_count)
         
     def load_settings(self):
         """加载设置"""
@@ -486,106 +724,194 @@ class MainWindow(QMainWindow):
         self.settings.setValue("download_path", self.download_path_input.text())
         
     def load_music_library(self):
-        """加载音乐库"""
-        self.song_list.clear()
+        """加载音乐库（启动、切换目录或手动刷新时使用）
+
+        先显示上次保存的快照（内存映射读取，不访问音乐文件），窗口立即可用；
+        目录扫描和标签读取在后台进行，完成后只应用与快照的差异。
+        """
+        if self.scan_thread is not None:
+            self.scan_thread.finished_scan.disconnect()
+            self.scan_thread.error.disconnect()
+            self.scan_thread.stop()
+            self.scan_thread.wait()
+        self.library_watcher.stop()
+        self.song_model.clear()
+        self.library_index.clear()
+        self.search_index.clear()
         music_path = Path(self.download_path_input.text())
         
         if not music_path.exists():
             music_path.mkdir(parents=True, exist_ok=True)
-            return
             
-        # 查找音频文件
-        audio_extensions = ['*.mp3', '*.flac', '*.wav', '*.m4a', '*.aac']
-        audio_files = []
-        for ext in audio_extensions:
-            audio_files.extend(music_path.glob(ext))
-            audio_files.extend(music_path.glob('**/' + ext))
-        
-        self.current_songs = []
-        
-        for audio_file in audio_files:
-            try:
-                song_info = self.music_manager.get_song_info(audio_file)
-                self.add_song_to_list(song_info)
-            except Exception as e:
-                logging.error(f"加载歌曲失败 {audio_file}: {e}")
-                
+        tracks = self.song_model.add_songs(load_snapshot(music_path) or [])
+        for track in tracks:
+            self.library_index.add(track)
+        self.refresh_categories()
+        # 智能播放列表在窗口显示后再评估
+        self.after_first_paint(self.rebuild_smart_playlists)
+        # 上次检查发现的损坏文件（修改过的文件在下次检查时重新判断）
+        self.song_model.set_problems(self.content_index.problems(track.path for track in tracks))
+        # 搜索索引（第一次转换拼音时要导入pypinyin）也在窗口显示后再开始建立
+        self.search_index.add_later(tracks)
+        self.after_first_paint(self.index_timer.start)
         self.update_song_count()
         
-    def add_song_to_list(self, song_info):
-        """添加歌曲到列表"""
-        item = QTreeWidgetItem(self.song_list)
-        
-        # 选择复选框
-        checkbox = QCheckBox()
-        self.song_list.setItemWidget(item, 0, checkbox)
-        checkbox.stateChanged.connect(self.update_selection_count)
-        
-        # 歌曲信息
-        item.setText(1, song_info.get('title', Path(song_info.get('path', '')).stem))
-        item.setText(2, song_info.get('artist', '未知歌手'))
-        item.setText(3, song_info.get('genre', '未知风格'))
-        item.setText(4, song_info.get('duration', '00:00'))
-        item.setText(5, song_info.get('size', '0 MB'))
-        item.setText(6, str(song_info.get('path', '')))
+        # 后台扫描目录，校验快照
+        known = {track.path: (track.size, track.mtime) for track in tracks}
+        self.scan_thread = LibraryScanThread(music_path, known, self.metadata_service, self)
+        self.scan_thread.progress.connect(
+            lambda done, total: self.status_label.setText(f"正在读取歌曲信息 {done}/{total}")
+        )
+        self.scan_thread.finished_scan.connect(self.on_library_scanned)
+        self.scan_thread.error.connect(self.on_library_scan_failed)
+        self.status_label.setText("正在扫描音乐库...")
+        self.scan_thread.start()
+        
+    def on_library_scanned(self, tree, delta, tracks):
+        """后台扫描完成：开始监视目录，应用与快照的差异并保存新快照"""
+        self.library_watcher.adopt(self.scan_thread.root, *tree)
+        if not delta.is_empty():
+            self.on_library_changed(delta, tracks, scanned=True)
+        self.save_library_snapshot()
+        self.status_label.setText("就绪")
+        
+    def on_library_scan_failed(self, message):
+        """后台扫描失败（例如目录无法访问）：保留快照中的歌曲，不监视目录"""
+        self.status_label.setText("扫描音乐库失败")
+        QMessageBox.warning(self, "警告", f"无法扫描音乐库目录，显示的是上次保存的歌曲列表:\n{message}")
+        
+    def save_library_snapshot(self):
+        """保存音乐库快照，下次启动时直接显示"""
+        try:
+            save_snapshot(self.download_path_input.text(), self.library_index)
+        except OSError as e:
+            logging.warning(f"保存音乐库快照失败: {e}")
+            
+    def rebuild_smart_playlists(self):
+        self.smart_playlists.rebuild(self.download_path_input.text())
+        self.refresh_playlists()
         
-        self.current_songs.append(song_info)
+    def read_track(self, audio_file):
+        """读取单个歌曲记录"""
+        try:
+            return self.music_manager.read_track(Path(audio_file))
+        except Exception as e:
+            logging.error(f"加载歌曲失败 {audio_file}: {e}")
+            return None
+            
+    def load_song(self, audio_file):
+        """读取单个歌曲信息并加入列表"""
+        track = self.read_track(audio_file)
+        if track:
+            self.add_song_to_list(track)
+            
+    def add_song_to_list(self, track):
+        """添加歌曲到列表"""
+        track = self.song_model.add_song(track)
+        self.library_index.add(track)
+        self.search_index.add(track)
+        
+    def add_songs_to_list(self, tracks):
+        """批量添加或更新歌曲（一次插入通知，搜索索引空闲时建立）"""
+        tracks = self.song_model.add_songs(tracks)
+        for track in tracks:
+            self.library_index.add(track)
+        if tracks:
+            self.search_index.add_later(tracks)
+            self.index_timer.start()
+            
+    def index_pending_songs(self):
+        """分批建立搜索索引"""
+        if not self.search_index.index_pending(500):
+            self.index_timer.stop()
+            
+    def on_library_changed(self, delta, tracks=None, scanned=False):
+        """应用音乐库增量变更，不做全量扫描
+
+        tracks为后台已读取的 路径 -> Track；scanned表示增量来自完整扫描而不是目录监视、下载或导入。
+        """
+        if delta.removed:
+            self.song_model.remove_songs(delta.removed)
+            for path in delta.removed:
+                self.library_index.remove(path)
+                self.search_index.remove(path)
+            self.content_index.remove(delta.removed)
+            self.category_store.remove(delta.removed)
+            
+        for old_path, new_path in delta.renamed:
+            self.song_model.rename_song(old_path, new_path)
+            self.library_index.rename(old_path, new_path)
+            self.search_index.remove(old_path)
+            self.metadata_service.rename(old_path, new_path)
+            self.cover_cache.rename(old_path, new_path)
+            self.content_index.rename(old_path, new_path)
+            self.category_store.rename(old_path, new_path)
+            self.load_song(new_path)
+            
+        for path in delta.modified:
+            # 标签可能换了封面
+            self.cover_cache.remove(path)
+            self.song_model.drop_thumbnail(path)
+            self.song_model.clear_problem(path)
+            
+        loaded = []
+        for path in delta.added + delta.modified:
+            track = tracks.get(str(path)) if tracks else None
+            track = track or self.read_track(path)
+            if track:
+                loaded.append(track)
+        self.add_songs_to_list(loaded)
+        
+        # 新增和修改的歌曲按风格规则重新归类
+        changed = [self.library_index.get(path) for path in delta.added + delta.modified]
+        self.category_store.apply_rules([track for track in changed if track is not None])
+        self.refresh_categories()
+        self.smart_playlists.apply_delta(delta, scanned)
+        self.refresh_playlists()
+        
+        # 有搜索条件或选中分类、播放列表时重新筛选，让新增歌曲也能按条件显示
+        if self.search_input.text().strip() or self.current_category() or self.current_playlist():
+            self.search_songs()
+        self.update_song_count()
         
     def update_song_count(self):
         """更新歌曲计数"""
-        count = self.song_list.topLevelItemCount()
+        count = len(self.library_index)
         self.song_count_label.setText(f"总共 {count} 首歌曲")
         self.update_selection_count()
         
     def update_selection_count(self):
         """更新选择计数"""
-        selected_count = 0
-        for i in range(self.song_list.topLevelItemCount()):
-            item = self.song_list.topLevelItem(i)
-            checkbox = self.song_list.itemWidget(item, 0)
-            if checkbox and checkbox.isChecked():
-                selected_count += 1
-                
+        selected_count = self.song_model.checked_count()
         self.selected_count_label.setText(f"已选择 {selected_count} 首")
         
     def search_songs(self):
-        """搜索歌曲"""
-        keyword = self.search_input.text().lower().strip()
-        if not keyword:
-            # 显示所有歌曲
-            for i in range(self.song_list.topLevelItemCount()):
-                item = self.song_list.topLevelItem(i)
-                item.setHidden(False)
-            return
-            
-        for i in range(self.song_list.topLevelItemCount()):
-            item = self.song_list.topLevelItem(i)
-            song_name = item.text(1).lower()
-            artist = item.text(2).lower()
-            
-            if keyword in song_name or keyword in artist:
-                item.setHidden(False)
-            else:
-                item.setHidden(True)
-                
+        """搜索歌曲（在选中的分类或智能播放列表中）"""
+        self.search_timer.stop()
+        # 空关键词返回None，显示所有歌曲
+        matched = self.search_index.search(self.search_input.text())
+        members = self.scope_members()
+        if members is not None:
+            matched = members if matched is None else members & set(matched)
+        self.song_model.set_filter(matched)
+        
+    def scope_members(self):
+        """选中的智能播放列表或分类中的歌曲，都未选中时返回None"""
+        playlist = self.current_playlist()
+        if playlist:
+            return self.smart_playlists.members(playlist)
+        category = self.current_category()
+        if category:
+            return self.category_store.members(category)
+        return None
+        
     def select_all_songs(self):
         """全选歌曲"""
-        for i in range(self.song_list.topLevelItemCount()):
-            item = self.song_list.topLevelItem(i)
-            checkbox = self.song_list.itemWidget(item, 0)
-            if checkbox:
-                checkbox.setChecked(True)
-                
+        self.song_model.set_all_checked(True)
+        
     def get_selected_songs(self):
         """获取选中的歌曲"""
-        selected_songs = []
-        for i in range(self.song_list.topLevelItemCount()):
-            item = self.song_list.topLevelItem(i)
-            checkbox = self.song_list.itemWidget(item, 0)
-            if checkbox and checkbox.isChecked():
-                song_path = Path(item.text(6))
-                selected_songs.append(song_path)
-        return selected_songs
+        return self.song_model.checked_paths()
         
     def download_single(self):
         """单曲下载"""
@@ -594,51 +920,113 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "警告", "请输入B站视频链接")
             return
             
-        if not self.downloader.validate_url(url):
+        if not validate_url(url):
             QMessageBox.warning(self, "警告", "无效的B站视频链接")
             return
             
-        # 显示进度条
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
-        
-        # 模拟下载过程
-        self.simulate_download(url)
-        
-    def simulate_download(self, url):
-        """模拟下载过程（实际应用中应使用真实下载）"""
-        # 更新下载队列
-        item = QTreeWidgetItem(self.download_list)
-        item.setText(0, "解析中...")
-        item.setText(1, "下载中")
-        item.setText(2, "0%")
-        
-        # 取消按钮
-        cancel_btn = QPushButton("取消")
-        cancel_btn.setFixedWidth(60)
-        cancel_btn.clicked.connect(lambda: self.cancel_download_item(item))
-        self.download_list.setItemWidget(item, 3, cancel_btn)
-        
-        # 模拟下载进度
-        self.simulate_progress(item, url)
-        
-    def simulate_progress(self, item, url):
-        """模拟下载进度"""
-        for progress in range(0, 101, 10):
-            if progress == 100:
-                item.setText(0, "下载完成")
-                item.setText(1, "完成")
-                item.setText(2, "100%")
-                self.progress_bar.setValue(100)
-                QMessageBox.information(self, "完成", "下载完成！")
-                self.load_music_library()  # 刷新音乐库
-                break
-            else:
-                item.setText(2, f"{progress}%")
-                self.progress_bar.setValue(progress)
-                QApplication.processEvents()  # 处理界面更新
-                time.sleep(0.5)  # 模拟下载延迟
-                
+        self.start_download(url)
+        
+    def start_download(self, url):
+        """把链接加入下载队列（下载在后台线程中进行）"""
+        self.download_queue.add(url, self.download_path_input.text())
+        self.update_download_progress()
+        
+    def create_download_thread(self, job):
+        """下载队列的线程工厂（下载模块已由preload_downloader导入）"""
+        downloader = self.downloader
+        _, DownloadThread = import_downloader()
+        return DownloadThread(job.url, job.download_path, downloader)
+        
+    def create_info_resolver(self, urls):
+        """下载队列按时长或UP主调度时，提前解析视频信息的线程"""
+        downloader = self.downloader
+        from core.downloader import VideoInfoThread
+        return VideoInfoThread(urls, downloader)
+        
+    def change_download_policy(self, index):
+        name = self.download_policy_combo.itemData(index)
+        self.download_queue.set_policy(name)
+        self.settings.setValue("download_policy", name)
+        
+    def selected_downloads(self):
+        """下载队列中选中的任务"""
+        return self.download_model.jobs_at(self.download_list.selectionModel().selectedRows())
+        
+    def on_download_action(self, row, action):
+        """点击任务行中的操作按钮"""
+        getattr(self.download_queue, action)([self.download_model.job(row)])
+        
+    def show_download_menu(self, pos):
+        """下载任务的右键菜单"""
+        jobs = self.selected_downloads()
+        if not jobs:
+            return
+        menu = QMenu(self.download_list)
+        for text, check, action in (("暂停", 'can_pause', self.download_queue.pause),
+                                    ("继续", 'can_resume', self.download_queue.resume),
+                                    ("取消", 'can_cancel', self.download_queue.cancel),
+                                    ("重试", 'can_retry', self.download_queue.retry)):
+            item = menu.addAction(text)
+            item.setEnabled(any(getattr(job, check)() for job in jobs))
+            item.triggered.connect(lambda _, action=action: action(jobs))
+        menu.addSeparator()
+        
+        # 手动调整顺序、置顶和优先级
+        waiting = [job for job in jobs if job.active]
+        for text, where in (("移到最前", 'top'), ("上移", 'up'), ("下移", 'down'), ("移到最后", 'bottom')):
+            item = menu.addAction(text)
+            item.setEnabled(bool(waiting))
+            item.triggered.connect(lambda _, where=where: self.download_queue.move(waiting, where))
+        pinned = bool(waiting) and all(job.pinned for job in waiting)
+        pin_action = menu.addAction("取消置顶" if pinned else "置顶（最先下载）")
+        pin_action.setEnabled(bool(waiting))
+        pin_action.triggered.connect(lambda: self.download_queue.pin(waiting, not pinned))
+        priority_menu = menu.addMenu("优先级")
+        priority_menu.setEnabled(bool(waiting))
+        for priority, text in PRIORITY_NAMES.items():
+            item = priority_menu.addAction(text)
+            item.setCheckable(True)
+            item.setChecked(bool(waiting) and all(job.priority == priority for job in waiting))
+            item.triggered.connect(lambda _, priority=priority: self.download_queue.set_priority(waiting, priority))
+        menu.addSeparator()
+        copy_action = menu.addAction("复制链接")
+        copy_action.triggered.connect(
+            lambda: QApplication.clipboard().setText("\n".join(job.url for job in jobs))
+        )
+        menu.exec_(self.download_list.viewport().mapToGlobal(pos))
+        
+    def on_downloads_updated(self, jobs):
+        """下载任务状态变化（已合并）"""
+        self.update_download_progress()
+        if self.download_queue_tab not in self._lazy_tabs:
+            self.update_download_summary()
+            
+    def update_download_summary(self):
+        """下载队列的任务计数"""
+        counts = self.download_queue.counts()
+        waiting = counts[QUEUED] + counts[PAUSED]
+        self.download_summary_label.setText(
+            f"下载中 {counts[RUNNING]}，等待 {waiting}，已完成 {counts[FINISHED]}，"
+            f"失败 {counts[FAILED]}，已取消 {counts[CANCELLED]}"
+        )
+        
+    def update_download_progress(self):
+        """左侧进度条显示未结束任务的平均进度"""
+        progress = self.download_queue.overall_progress()
+        self.progress_bar.setVisible(progress is not None)
+        if progress is not None:
+            self.progress_bar.setValue(progress)
+            
+    def on_download_finished(self, job):
+        """下载完成：文件在音乐库中时直接加入列表，不等待目录监视"""
+        path = Path(job.file_path)
+        self.status_label.setText(f"下载完成: {path.name}")
+        root = Path(self.download_path_input.text())
+        if root == path.parent or root in path.parents:
+            delta = LibraryDelta(added=[path])
+            self.library_watcher.notify(delta)
+            self.on_library_changed(delta)
+            
     def download_batch(self):
         """批量下载"""
         urls, ok = QInputDialog.getMultiLineText(
@@ -650,18 +1038,25 @@ class MainWindow(QMainWindow):
         if ok and urls:
             url_list = [url.strip() for url in urls.split('\n') if url.strip()]
             valid_urls = []
+            invalid_urls = []
             
             for url in url_list:
-                if self.downloader.validate_url(url):
+                if validate_url(url):
                     valid_urls.append(url)
                 else:
-                    QMessageBox.warning(self, "警告", f"无效链接已跳过: {url}")
+                    invalid_urls.append(url)
                     
             if valid_urls:
-                QMessageBox.information(self, "信息", f"开始下载 {len(valid_urls)} 个视频")
-                for url in valid_urls:
-                    self.download_single()
-                    
+                # 一次加入队列，列表只收到一次插入通知
+                self.download_queue.add_many(valid_urls, self.download_path_input.text())
+                self.update_download_progress()
+                self.status_label.setText(f"已加入下载队列 {len(valid_urls)} 个视频")
+            if invalid_urls:
+                details = "\n".join(invalid_urls[:20])
+                if len(invalid_urls) > 20:
+                    details += f"\n... 共 {len(invalid_urls)} 个"
+                QMessageBox.warning(self, "警告", f"以下无效链接已跳过:\n{details}")
+                
     def browse_download_path(self):
         """浏览下载路径"""
         path = QFileDialog.getExistingDirectory(
@@ -673,33 +1068,210 @@ class MainWindow(QMainWindow):
             self.download_path_input.setText(path)
             self.load_music_library()
             
+    def refresh_categories(self):
+        """从数据库重新加载分类列表和歌曲数，保持当前选中的分类"""
+        current = self.current_category()
+        self.category_list.blockSignals(True)
+        self.category_list.clear()
+        all_item = QListWidgetItem(f"全部歌曲 ({len(self.library_index)})")
+        self.category_list.addItem(all_item)
+        self.category_list.setCurrentItem(all_item)
+        for name, rule, count in self.category_store.categories():
+            item = QListWidgetItem(f"{name} ({count})")
+            item.setData(Qt.UserRole, name)
+            if rule:
+                item.setToolTip(f"自动加入风格为 {rule} 的歌曲")
+            self.category_list.addItem(item)
+            if name == current:
+                self.category_list.setCurrentItem(item)
+        self.category_list.blockSignals(False)
+        
+    def current_category(self):
+        """选中的分类名称，选中“全部歌曲”或未选中时返回None"""
+        item = self.category_list.currentItem()
+        return item.data(Qt.UserRole) if item is not None else None
+        
+    def ask_category_rule(self, title, rule=''):
+        """输入自动归类规则，取消时返回None"""
+        rule, ok = QInputDialog.getText(
+            self, title, "自动加入的风格（多个用逗号分隔，留空表示只手动添加）:",
+            text=rule
+        )
+        return rule.strip() if ok else None
+        
+    def on_category_selected(self):
+        """选中分类时取消智能播放列表的选择"""
+        if self.current_category():
+            self.playlist_list.blockSignals(True)
+            self.playlist_list.setCurrentRow(-1)
+            self.playlist_list.blockSignals(False)
+        self.search_songs()
+        
     def add_category(self):
         """添加分类"""
         name, ok = QInputDialog.getText(self, "添加分类", "请输入分类名称:")
-        if ok and name:
-            self.category_list.addItem(name)
+        name = name.strip()
+        if not ok or not name:
+            return
+        rule = self.ask_category_rule("添加分类")
+        if rule is None:
+            return
             
+        try:
+            self.category_store.add_category(name, rule)
+        except Exception as e:
+            QMessageBox.warning(self, "错误", str(e))
+            return
+        if rule:
+            self.category_store.apply_rules(self.library_index, replace_all=True)
+        self.refresh_categories()
+        
     def edit_category(self):
-        """编辑分类"""
-        current_item = self.category_list.currentItem()
-        if current_item:
-            name, ok = QInputDialog.getText(
-                self, "编辑分类", "请输入分类名称:", 
-                text=current_item.text()
-            )
-            if ok and name:
-                current_item.setText(name)
-                
+        """编辑分类名称和自动归类规则"""
+        current = self.current_category()
+        if not current:
+            return
+        name, ok = QInputDialog.getText(
+            self, "编辑分类", "请输入分类名称:", 
+            text=current
+        )
+        name = name.strip()
+        if not ok or not name:
+            return
+        rule = self.ask_category_rule("编辑分类", self.category_store.rule(current))
+        if rule is None:
+            return
+            
+        try:
+            if self.category_store.edit_category(current, name, rule):
+                self.category_store.apply_rules(self.library_index, replace_all=True)
+        except Exception as e:
+            QMessageBox.warning(self, "错误", str(e))
+            return
+        self.refresh_categories()
+        self.on_categories_changed(current, name)
+        
     def delete_category(self):
-        """删除分类"""
-        current_row = self.category_list.currentRow()
-        if current_row >= 0:
+        """删除分类（歌曲文件不受影响）"""
+        current = self.current_category()
+        if current:
             reply = QMessageBox.question(
                 self, "确认删除", 
-                "确定要删除这个分类吗？"
+                f"确定要删除分类“{current}”吗？歌曲文件不会被删除。"
             )
             if reply == QMessageBox.Yes:
-                self.category_list.takeItem(current_row)
+                self.category_store.delete_category(current)
+                self.refresh_categories()
+                self.on_categories_changed()
+                
+    def update_category_menu(self):
+        """打开“分类”菜单时按当前分类生成菜单项"""
+        self.category_menu.clear()
+        for name, _, _ in self.category_store.categories():
+            self.category_menu.addAction(f"加入“{name}”",
+                                         lambda name=name: self.assign_category(name))
+        current = self.current_category()
+        if current:
+            self.category_menu.addSeparator()
+            self.category_menu.addAction(f"移出“{current}”",
+                                         lambda: self.assign_category(current, remove=True))
+                                         
+    def assign_category(self, name, remove=False):
+        """把勾选的歌曲加入或移出分类（一个事务）"""
+        selected_songs = self.get_selected_songs()
+        if not selected_songs:
+            QMessageBox.warning(self, "警告", "请先选择歌曲")
+            return
+            
+        if remove:
+            count = self.category_store.unassign(name, selected_songs)
+            self.status_label.setText(f"已从“{name}”移出 {count} 首歌曲")
+        else:
+            count = self.category_store.assign(name, selected_songs)
+            self.status_label.setText(f"已将 {count} 首歌曲加入“{name}”")
+        self.refresh_categories()
+        self.on_categories_changed()
+        
+    def on_categories_changed(self, old_name=None, new_name=None):
+        """分类变化后更新引用分类的智能播放列表，并重新筛选"""
+        self.smart_playlists.on_categories_changed(old_name, new_name)
+        self.refresh_playlists()
+        self.search_songs()
+        
+    def refresh_playlists(self):
+        """更新智能播放列表及歌曲数，保持当前选择"""
+        current = self.current_playlist()
+        self.playlist_list.blockSignals(True)
+        self.playlist_list.clear()
+        for name in self.smart_playlists.names():
+            item = QListWidgetItem(f"{name} ({self.smart_playlists.count(name)})")
+            item.setData(Qt.UserRole, name)
+            self.playlist_list.addItem(item)
+            if name == current:
+                self.playlist_list.setCurrentItem(item)
+        self.playlist_list.blockSignals(False)
+        
+    def current_playlist(self):
+        """选中的智能播放列表名称"""
+        item = self.playlist_list.currentItem()
+        return item.data(Qt.UserRole) if item is not None else None
+        
+    def on_playlist_selected(self):
+        """打开智能播放列表：直接使用维护好的成员，不重新遍历音乐库"""
+        if self.current_playlist():
+            self.category_list.blockSignals(True)
+            self.category_list.setCurrentRow(0)
+            self.category_list.blockSignals(False)
+        self.search_songs()
+        
+    def edit_playlist_dialog(self, playlist=None):
+        """显示编辑对话框，返回编辑后的播放列表，取消时返回None"""
+        categories = [name for name, _, _ in self.category_store.categories()]
+        dialog = SmartPlaylistDialog(categories, playlist, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return None
+        return dialog.playlist()
+        
+    def add_smart_playlist(self):
+        """新建智能播放列表"""
+        playlist = self.edit_playlist_dialog()
+        if playlist is None:
+            return
+        try:
+            self.smart_playlists.save(playlist)
+        except Exception as e:
+            QMessageBox.warning(self, "错误", str(e))
+            return
+        self.refresh_playlists()
+        
+    def edit_smart_playlist(self):
+        """编辑选中的智能播放列表"""
+        current = self.current_playlist()
+        if not current:
+            return
+        playlist = self.edit_playlist_dialog(self.smart_playlists.get(current))
+        if playlist is None:
+            return
+        try:
+            self.smart_playlists.save(playlist, current)
+        except Exception as e:
+            QMessageBox.warning(self, "错误", str(e))
+            return
+        self.refresh_playlists()
+        for row in range(self.playlist_list.count()):
+            if self.playlist_list.item(row).data(Qt.UserRole) == playlist.name:
+                self.playlist_list.setCurrentRow(row)
+        self.search_songs()
+        
+    def delete_smart_playlist(self):
+        """删除选中的智能播放列表（歌曲文件不受影响）"""
+        current = self.current_playlist()
+        if current:
+            reply = QMessageBox.question(self, "确认删除", f"确定要删除播放列表“{current}”吗？")
+            if reply == QMessageBox.Yes:
+                self.smart_playlists.delete(current)
+                self.refresh_playlists()
+                self.search_songs()
                 
     def rename_songs(self):
         """重命名歌曲"""
@@ -708,6 +1280,7 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "警告", "请先选择要重命名的歌曲")
             return
             
+        operations = []
         for song_path in selected_songs:
             new_name, ok = QInputDialog.getText(
                 self, "重命名", 
@@ -715,13 +1288,11 @@ class MainWindow(QMainWindow):
                 text=song_path.stem
             )
             if ok and new_name:
-                try:
-                    new_path = song_path.parent / f"{new_name}{song_path.suffix}"
-                    self.music_manager.rename_file(song_path, new_path)
-                except Exception as e:
-                    QMessageBox.warning(self, "错误", f"重命名失败: {e}")
+                new_path = song_path.parent / f"{new_name}{song_path.suffix}"
+                if new_path != song_path:
+                    operations.append(FileOperation.rename(song_path, new_path))
                     
-        self.load_music_library()
+        self.run_file_operations(operations, "重命名")
         
     def move_songs(self):
         """移动歌曲"""
@@ -734,14 +1305,13 @@ class MainWindow(QMainWindow):
             self, "选择目标文件夹"
         )
         if target_dir:
-            for song_path in selected_songs:
-                try:
-                    self.music_manager.move_file(song_path, Path(target_dir))
-                except Exception as e:
-                    QMessageBox.warning(self, "错误", f"移动失败: {e}")
-                    
-        self.load_music_library()
-        
+            operations = [
+                FileOperation.move(song_path, target_dir)
+                for song_path in selected_songs
+                if song_path.parent != Path(target_dir)
+            ]
+            self.run_file_operations(operations, "移动")
+            
     def delete_songs(self):
         """删除歌曲"""
         selected_songs = self.get_selected_songs()
@@ -751,16 +1321,360 @@ class MainWindow(QMainWindow):
             
         reply = QMessageBox.question(
             self, "确认删除", 
-            f"确定要删除这 {len(selected_songs)} 首歌曲吗？此操作不可恢复！"
+            f"确定要删除这 {len(selected_songs)} 首歌曲吗？\n"
+            f"文件会移入回收站，{TRASH_RETENTION_DAYS} 天内可以通过“撤销文件操作”恢复。"
         )
         if reply == QMessageBox.Yes:
-            for song_path in selected_songs:
-                try:
-                    self.music_manager.delete_file(song_path)
-                except Exception as e:
-                    QMessageBox.warning(self, "错误", f"删除失败: {e}")
-                    
-            self.load_music_library()
+            operations = [FileOperation.delete(song_path) for song_path in selected_songs]
+            self.run_file_operations(operations, "删除")
+            
+    def edit_song_tags(self):
+        """批量编辑标签"""
+        selected_songs = self.get_selected_songs()
+        if not selected_songs:
+            QMessageBox.warning(self, "警告", "请先选择要编辑的歌曲")
+            return
+            
+        tracks = [track for track in map(self.library_index.get, selected_songs) if track]
+        fields = [('title', "歌曲名"), ('artist', "歌手"), ('album', "专辑"),
+                  ('genre', "风格"), ('year', "年份")]
+        if len(selected_songs) > 1:
+            fields = fields[1:]
+            
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"编辑标签（{len(selected_songs)} 首）")
+        form = QFormLayout(dialog)
+        inputs = {}
+        for field, label in fields:
+            values = {getattr(track, field) for track in tracks}
+            line_edit = QLineEdit(values.pop() if len(values) == 1 else "")
+            if values:
+                line_edit.setPlaceholderText("多个值，留空保持不变")
+            form.addRow(label, line_edit)
+            inputs[field] = line_edit
+            
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        form.addRow(buttons)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+            
+        changes = {field: line_edit.text().strip() for field, line_edit in inputs.items()
+                   if line_edit.text().strip()}
+        if not changes:
+            return
+            
+        if self.file_operation_thread is not None and self.file_operation_thread.isRunning():
+            QMessageBox.warning(self, "警告", "已有文件操作正在进行，请稍候")
+            return
+            
+        # 标签与现有值相同的文件会被跳过，不会重写
+        edits = [TagEdit(path, changes) for path in selected_songs]
+        thread = BatchTagWriteThread(edits, self)
+        self.start_file_operation_thread(thread, "编辑标签", len(edits))
+        
+    def find_identical_files(self):
+        """按文件内容哈希查找完全相同的文件"""
+        if self.can_start_duplicate_scan():
+            thread = ExactDuplicateThread(self.content_index, self.library_index.paths(), self)
+            self.start_duplicate_scan(thread, "计算文件哈希")
+            
+    def find_duplicate_songs(self):
+        """按声纹查找重复歌曲（不同标题、不同上传者的同一首歌）"""
+        if self.can_start_duplicate_scan():
+            # 声纹计算依赖numpy，用到时才导入
+            from core.fingerprint import DuplicateScanThread
+            thread = DuplicateScanThread(self.library_index.paths(), self)
+            self.start_duplicate_scan(thread, "计算声纹")
+            
+    def can_start_duplicate_scan(self):
+        if self.duplicate_thread is not None and self.duplicate_thread.isRunning():
+            QMessageBox.warning(self, "警告", "正在查重，请稍候")
+            return False
+        if not len(self.library_index):
+            QMessageBox.information(self, "提示", "音乐库中没有歌曲")
+            return False
+        return True
+        
+    def start_duplicate_scan(self, thread, action_name):
+        """启动查重线程并连接进度和结果"""
+        thread.progress.connect(
+            lambda done, total: self.status_label.setText(f"正在{action_name} {done}/{total}")
+        )
+        thread.finished_scan.connect(self.on_duplicates_found)
+        thread.error.connect(lambda message: QMessageBox.critical(self, "错误", f"查重失败: {message}"))
+        thread.error.connect(lambda _: self.status_label.setText("就绪"))
+        self.duplicate_thread = thread
+        self.duplicate_btn.setEnabled(False)
+        thread.finished.connect(lambda: self.duplicate_btn.setEnabled(True))
+        self.status_label.setText("正在查重...")
+        thread.start()
+        
+    def on_duplicates_found(self, groups):
+        """在音乐库列表中显示重复分组"""
+        if not groups:
+            self.status_label.setText("没有找到重复歌曲")
+            return
+        self.search_input.blockSignals(True)
+        self.search_input.clear()
+        self.search_input.blockSignals(False)
+        self.song_model.set_groups(groups)
+        self.tab_widget.setCurrentIndex(0)
+        count = sum(len(group) for group in groups)
+        self.status_label.setText(f"找到 {len(groups)} 组重复歌曲（共 {count} 首），搜索可恢复显示全部")
+        
+    def check_library_integrity(self):
+        """检查音乐库中的文件是否完整（只检查新增或修改过的文件）"""
+        if self.integrity_thread is not None and self.integrity_thread.isRunning():
+            QMessageBox.warning(self, "警告", "正在检查文件，请稍候")
+            return
+        if not len(self.library_index):
+            QMessageBox.information(self, "提示", "音乐库中没有歌曲")
+            return
+            
+        thread = IntegrityCheckThread(self.content_index, self.library_index.paths(), self)
+        thread.progress.connect(
+            lambda done, total: self.status_label.setText(f"正在检查文件 {done}/{total}")
+        )
+        thread.finished_check.connect(self.on_integrity_checked)
+        thread.error.connect(lambda message: QMessageBox.critical(self, "错误", f"检查文件失败: {message}"))
+        thread.error.connect(lambda _: self.status_label.setText("就绪"))
+        self.integrity_thread = thread
+        self.check_btn.setEnabled(False)
+        thread.finished.connect(lambda: self.check_btn.setEnabled(True))
+        self.status_label.setText("正在检查文件...")
+        thread.start()
+        
+    def on_integrity_checked(self, problems):
+        """标出损坏的文件，并提供从来源视频重新下载"""
+        self.song_model.set_problems(problems)
+        if not problems:
+            self.status_label.setText("没有发现损坏的文件")
+            return
+        self.status_label.setText(f"发现 {len(problems)} 个损坏的文件")
+        
+        urls = []
+        for path in problems:
+            try:
+                url = read_source_url(path)
+            except Exception:
+                url = ''
+            if url and url not in urls and validate_url(url):
+                urls.append(url)
+                
+        message = f"发现 {len(problems)} 个损坏的文件，已在列表中用红色标出。"
+        if not urls:
+            QMessageBox.warning(self, "检查文件", message + "\n这些文件没有记录来源视频，无法重新下载。")
+            return
+        reply = QMessageBox.question(
+            self, "检查文件",
+            message + f"\n其中 {len(urls)} 个可以从来源视频重新下载，是否加入下载队列？"
+        )
+        if reply == QMessageBox.Yes:
+            for url in urls:
+                self.start_download(url)
+                
+    def transcode_songs(self):
+        """把选中的歌曲（没有选择时为整个音乐库）转换为其他格式"""
+        if self.transcode_thread is not None and self.transcode_thread.isRunning():
+            QMessageBox.warning(self, "警告", "正在转换格式，请稍候")
+            return
+            
+        job = TranscodeJob.load()
+        if job is not None:
+            reply = QMessageBox.question(
+                self, "转换格式",
+                f"上次转换为{PRESETS[job.preset][0]}的任务没有完成（共 {len(job.sources)} 首），是否继续？\n"
+                f"已经转换好的歌曲会被跳过。"
+            )
+            if reply == QMessageBox.Yes:
+                self.start_transcode(job)
+                return
+            TranscodeJob.finish()
+            
+        sources = self.get_selected_songs() or self.library_index.paths()
+        if not sources:
+            QMessageBox.information(self, "提示", "音乐库中没有歌曲")
+            return
+            
+        labels = [label for label, _, _ in PRESETS.values()]
+        label, ok = QInputDialog.getItem(self, "转换格式", f"将 {len(sources)} 首歌曲转换为:", labels, 0, False)
+        if not ok:
+            return
+        preset = list(PRESETS)[labels.index(label)]
+        
+        output_dir = QFileDialog.getExistingDirectory(self, "选择输出目录")
+        if not output_dir:
+            return
+        problem = output_dir_problem(output_dir, self.download_path_input.text(), sources)
+        if problem:
+            QMessageBox.warning(self, "警告", problem)
+            return
+        self.start_transcode(TranscodeJob(sources, self.download_path_input.text(), output_dir, preset))
+        
+    def start_transcode(self, job):
+        """启动转换线程，状态栏显示进度和吞吐量"""
+        thread = TranscodeThread(job, self.content_index, self)
+        stats = {'done': 0, 'total': 0}
+        
+        def on_progress(done, total):
+            stats['done'], stats['total'] = done, total
+            self.status_label.setText(f"正在转换格式 {done}/{total}")
+            
+        def on_throughput(tracks_per_minute, realtime_factor):
+            self.status_label.setText(
+                f"正在转换格式 {stats['done']}/{stats['total']}，"
+                f"{tracks_per_minute:.1f} 首/分钟，{realtime_factor:.1f} 倍实时速度"
+            )
+            
+        thread.progress.connect(on_progress)
+        thread.throughput.connect(on_throughput)
+        thread.finished_job.connect(self.on_transcode_finished)
+        thread.error.connect(lambda message: QMessageBox.critical(self, "错误", f"转换格式失败: {message}"))
+        thread.error.connect(lambda _: self.status_label.setText("就绪"))
+        self.transcode_thread = thread
+        self.status_label.setText("正在准备转换...")
+        thread.start()
+        
+    def on_transcode_finished(self, converted, skipped, failures):
+        """转换完成"""
+        self.status_label.setText(
+            f"转换完成: 成功 {converted} 首，跳过已转换的 {skipped} 首，失败 {len(failures)} 首"
+        )
+        if failures:
+            details = "\n".join(f"{Path(source).name}: {error}" for source, error in failures[:20])
+            if len(failures) > 20:
+                details += f"\n... 共 {len(failures)} 首"
+            QMessageBox.warning(self, "错误", f"以下歌曲转换失败:\n{details}")
+            
+    def sync_library(self):
+        """把音乐库增量同步到U盘、手机等外部目录"""
+        if self.sync_thread is not None and self.sync_thread.isRunning():
+            QMessageBox.warning(self, "警告", "正在同步，请稍候")
+            return
+        if not len(self.library_index):
+            QMessageBox.information(self, "提示", "音乐库中没有歌曲")
+            return
+            
+        target_dir = QFileDialog.getExistingDirectory(
+            self, "选择同步目标目录", self.settings.value("sync_target", "")
+        )
+        if not target_dir:
+            return
+        library_root = Path(self.download_path_input.text())
+        target = Path(target_dir)
+        if target == library_root or library_root in target.parents:
+            QMessageBox.warning(self, "警告", "同步目标不能位于音乐库目录中")
+            return
+        self.settings.setValue("sync_target", target_dir)
+        
+        thread = LibrarySyncThread(self.library_index.paths(), library_root, target,
+                                   self.content_index, self)
+        thread.progress.connect(
+            lambda done, total: self.status_label.setText(f"正在同步 {done}/{total}")
+        )
+        thread.finished_sync.connect(self.on_sync_finished)
+        thread.error.connect(lambda message: QMessageBox.critical(self, "错误", f"同步失败: {message}"))
+        thread.error.connect(lambda _: self.status_label.setText("就绪"))
+        self.sync_thread = thread
+        self.status_label.setText("正在比较差异...")
+        thread.start()
+        
+    def on_sync_finished(self, copied, deleted, failures):
+        """同步完成"""
+        self.status_label.setText(f"同步完成: 复制 {copied} 个，删除 {deleted} 个，失败 {len(failures)} 个")
+        if failures:
+            details = "\n".join(f"{relative}: {error}" for relative, error in failures[:20])
+            if len(failures) > 20:
+                details += f"\n... 共 {len(failures)} 个"
+            QMessageBox.warning(self, "错误", f"以下文件同步失败:\n{details}")
+            
+    def run_file_operations(self, operations, action_name):
+        """在后台线程执行批量文件操作"""
+        if not operations:
+            return
+            
+        if self.file_operation_thread is not None and self.file_operation_thread.isRunning():
+            QMessageBox.warning(self, "警告", "已有文件操作正在进行，请稍候")
+            return
+            
+        library_root = self.download_path_input.text()
+        try:
+            journal = BatchJournal.create(action_name, library_root)
+        except OSError as e:
+            logging.error(f"创建操作日志失败: {e}")
+            QMessageBox.critical(self, "错误", f"无法创建操作日志，已取消{action_name}: {e}")
+            return
+            
+        thread = BatchFileOperationThread(operations, library_root, journal, self)
+        self.start_file_operation_thread(thread, action_name, len(operations))
+        
+    def undo_file_operations(self):
+        """撤销最近一次批量文件操作"""
+        if self.file_operation_thread is not None and self.file_operation_thread.isRunning():
+            QMessageBox.warning(self, "警告", "已有文件操作正在进行，请稍候")
+            return
+            
+        journal = last_undoable()
+        if journal is None:
+            QMessageBox.information(self, "提示", "没有可以撤销的文件操作")
+            return
+            
+        count = len(journal.completed_entries())
+        reply = QMessageBox.question(
+            self, "确认撤销",
+            f"确定要撤销上一次{journal.action}操作吗？（共 {count} 个文件）"
+        )
+        if reply == QMessageBox.Yes:
+            thread = JournalRecoveryThread(journal, undo=True, parent=self)
+            self.start_file_operation_thread(thread, f"撤销{journal.action}", len(journal.entries))
+            
+    def recover_file_operations(self):
+        """启动时处理上次崩溃遗留的未完成批次（按日志核对，不重新扫描音乐库）"""
+        for journal in pending_journals():
+            done = len(journal.completed_entries())
+            reply = QMessageBox.question(
+                self, "恢复文件操作",
+                f"上次的{journal.action}操作没有完成（已完成 {done}/{len(journal.entries)} 个文件）。\n"
+                f"选择“是”撤销已完成的部分，选择“否”继续完成剩余的操作。"
+            )
+            try:
+                if reply == QMessageBox.Yes:
+                    _, failures = rollback(journal)
+                else:
+                    _, failures = replay(journal)
+            except OSError as e:
+                logging.error(f"恢复文件操作失败: {e}")
+                continue
+            for entry in failures:
+                logging.error(f"恢复文件操作失败 {entry.source}: {entry.error}")
+                
+    def start_file_operation_thread(self, thread, action_name, total):
+        """启动文件操作线程并连接进度和结果"""
+        thread.progress.connect(
+            lambda done, total: self.status_label.setText(f"正在{action_name} {done}/{total}")
+        )
+        thread.finished_batch.connect(
+            lambda delta, failures: self.on_file_operations_finished(action_name, delta, failures)
+        )
+        self.file_operation_thread = thread
+        self.status_label.setText(f"正在{action_name} 0/{total}")
+        thread.start()
+        
+    def on_file_operations_finished(self, action_name, delta, failures):
+        """批量文件操作完成，按增量更新索引和列表"""
+        self.library_watcher.notify(delta)
+        self.on_library_changed(delta)
+        
+        succeeded = len(delta.removed) + len(delta.renamed) + len(delta.added) + len(delta.modified)
+        self.status_label.setText(f"{action_name}完成: 成功 {succeeded} 个，失败 {len(failures)} 个")
+        
+        if failures:
+            details = "\n".join(f"{op.source.name}: {op.error}" for op in failures[:20])
+            if len(failures) > 20:
+                details += f"\n... 共 {len(failures)} 个"
+            QMessageBox.warning(self, "错误", f"以下文件{action_name}失败:\n{details}")
             
     def manage_lyrics(self):
         """管理歌词"""
@@ -770,6 +1684,7 @@ class MainWindow(QMainWindow):
             return
             
         song_path = selected_songs[0]
+        self.ensure_tab(self.lyrics_tab)
         self.current_song_label.setText(song_path.stem)
         self.lyrics_display.setPlainText(f"正在为 {song_path.stem} 搜索歌词...")
         
@@ -791,27 +1706,27 @@ class MainWindow(QMainWindow):
         
     def pause_all_downloads(self):
         """暂停所有下载"""
-        QMessageBox.information(self, "提示", "已暂停所有下载")
+        self.download_queue.pause(self.download_queue.jobs)
         
     def resume_all_downloads(self):
         """继续所有下载"""
-        QMessageBox.information(self, "提示", "已继续所有下载")
+        self.download_queue.resume(self.download_queue.jobs)
         
     def cancel_all_downloads(self):
         """取消所有下载"""
+        if not any(job.can_cancel() for job in self.download_queue.jobs):
+            return
         reply = QMessageBox.question(
             self, "确认取消", 
             "确定要取消所有下载任务吗？"
         )
         if reply == QMessageBox.Yes:
-            self.download_list.clear()
-            self.add_example_download_item()  # 重新添加示例项
+            self.download_queue.cancel(self.download_queue.jobs)
             
     def clear_finished_downloads(self):
         """清除已完成下载"""
-        self.download_list.clear()
-        self.add_example_download_item()
-        QMessageBox.information(self, "提示", "已清除已完成下载")
+        count = self.download_queue.remove_finished()
+        self.status_label.setText(f"已清除 {count} 个下载任务")
         
     def import_music(self):
         """导入音乐"""
@@ -821,19 +1736,72 @@ class MainWindow(QMainWindow):
             "音频文件 (*.mp3 *.flac *.wav *.m4a);;所有文件 (*.*)"
         )
         if files:
-            QMessageBox.information(self, "导入", f"成功导入 {len(files)} 个文件")
-            self.load_music_library()
+            self.start_import(files)
+            
+    def import_music_folder(self):
+        """导入文件夹（保持目录结构）"""
+        folder = QFileDialog.getExistingDirectory(self, "选择要导入的文件夹")
+        if folder:
+            self.start_import([folder])
             
+    def start_import(self, sources):
+        """把文件导入音乐库：同一磁盘上用reflink或硬链接，否则边复制边计算哈希"""
+        if self.file_operation_thread is not None and self.file_operation_thread.isRunning():
+            QMessageBox.warning(self, "警告", "已有文件操作正在进行，请稍候")
+            return
+            
+        library_root = self.download_path_input.text()
+        thread = ImportThread(sources, library_root, self.content_index, self.metadata_service, self)
+        # 中途出错时已经导入的文件由目录监视加入列表
+        thread.error.connect(lambda message: QMessageBox.critical(self, "错误", f"导入失败: {message}"))
+        thread.error.connect(lambda _: self.status_label.setText("就绪"))
+        self.start_file_operation_thread(thread, "导入", len(sources))
+        
     def export_music_list(self):
-        """导出音乐列表"""
-        path, _ = QFileDialog.getSaveFileName(
-            self, "导出音乐列表", 
-            "音乐列表.txt", 
-            "文本文件 (*.txt)"
+        """导出播放列表或歌曲清单（M3U8/CSV/JSON Lines）"""
+        # 导出范围：当前列表（搜索结果）、勾选的歌曲、某个分类或全部
+        scopes = [("当前列表", lambda: self.song_model.tracks())]
+        if self.song_model.checked_count():
+            checked = set(map(str, self.get_selected_songs()))
+            scopes.append((f"已勾选的 {len(checked)} 首",
+                           lambda: filter_tracks(self.library_index, checked)))
+        for name, _, count in self.category_store.categories():
+            scopes.append((f"分类: {name} ({count})",
+                           lambda name=name: filter_tracks(self.library_index, self.category_store.members(name))))
+        scopes.append(("全部歌曲", lambda: iter(self.library_index)))
+        
+        labels = [label for label, _ in scopes]
+        label, ok = QInputDialog.getItem(self, "导出列表", "导出范围:", labels, 0, False)
+        if not ok:
+            return
+        tracks = dict(scopes)[label]
+        
+        filters = {
+            'm3u8': "M3U8播放列表 (*.m3u8)",
+            'csv': "CSV表格 (*.csv)",
+            'jsonl': "JSON Lines (*.jsonl)",
+        }
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, "导出列表", "音乐列表.m3u8", ";;".join(filters.values())
         )
-        if path:
-            QMessageBox.information(self, "导出", f"音乐列表已导出到: {path}")
+        if not path:
+            return
+        export_type = {text: name for name, text in filters.items()}.get(selected_filter, 'm3u8')
+        extension = EXPORTERS[export_type][1]
+        if not path.lower().endswith(extension):
+            path += extension
             
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            count = export_tracks(tracks(), path, export_type)
+        except Exception as e:
+            logging.error(f"导出列表失败 {path}: {e}")
+            QMessageBox.critical(self, "错误", f"导出失败: {e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.status_label.setText(f"已导出 {count} 首歌曲到 {path}")
+        
     def refresh_music_library(self):
         """刷新音乐库"""
         self.load_music_library()
@@ -844,11 +1812,27 @@ class MainWindow(QMainWindow):
         QMessageBox.information(self, "设置", "设置功能开发中")
         
     def network_diagnose(self):
-        """网络诊断"""
-        if self.downloader.test_connection():
-            QMessageBox.information(self, "网络诊断", "网络连接正常")
+        """网络诊断（在后台线程中检查，不阻塞界面）"""
+        if self.network_checker is not None and self.network_checker.isRunning():
+            return
+        from utils.network_checker import NetworkChecker
+        self.network_checker = NetworkChecker()
+        self._network_result = (False, "网络诊断失败")
+        self.network_checker.result.connect(self.on_network_checked)
+        self.network_checker.finished.connect(lambda: self.on_network_checked(None, None))
+        self.network_checker.start()
+        
+    def on_network_checked(self, ok, message):
+        """网络诊断进度；线程结束时（ok为None）显示最后的结果"""
+        if ok is not None:
+            self._network_result = (ok, message)
+            self.status_label.setText(message)
+            return
+        ok, message = self._network_result
+        if ok:
+            QMessageBox.information(self, "网络诊断", message)
         else:
-            QMessageBox.warning(self, "网络诊断", "网络连接失败，请检查网络设置")
+            QMessageBox.warning(self, "网络诊断", message)
             
     def show_about(self):
         """显示关于信息"""
@@ -890,11 +1874,26 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """关闭事件"""
         self.save_settings()
-        # 停止所有下载线程
-        for thread in self.download_threads:
-            if thread.isRunning():
+        self.library_watcher.stop()
+        if self.scan_thread is not None and self.scan_thread.isRunning():
+            self.scan_thread.stop()
+            self.scan_thread.wait()
+        else:
+            self.save_library_snapshot()
+        self.thumbnail_loader.stop()
+        self.thumbnail_loader.wait()
+        if self.file_operation_thread is not None and self.file_operation_thread.isRunning():
+            self.file_operation_thread.stop()
+            self.file_operation_thread.wait()
+        for thread in (self.duplicate_thread, self.integrity_thread, self.transcode_thread,
+                       self.sync_thread):
+            if thread is not None and thread.isRunning():
                 thread.stop()
-                thread.wait(1000)
+                thread.wait()
+        # 停止所有下载线程
+        self.download_queue.stop_all()
+        if self.network_checker is not None:
+            self.network_checker.wait(1000)
         event.accept()
 
 # 测试代码
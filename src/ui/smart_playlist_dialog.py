@@ -0,0 +1,122 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLineEdit,
+                             QComboBox, QPushButton, QDialogButtonBox, QWidget, QMessageBox)
+
+from core.smart_playlists import FIELDS, OPERATORS, SmartPlaylist
+
+class ConditionRow(QWidget):
+    """一行条件：字段、比较方式、值"""
+    
+    def __init__(self, categories, condition=None, parent=None):
+        super().__init__(parent)
+        self.categories = categories
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.field_combo = QComboBox()
+        for field, (label, _) in FIELDS.items():
+            self.field_combo.addItem(label, field)
+        self.op_combo = QComboBox()
+        self.value_input = QLineEdit()
+        self.value_combo = QComboBox()  # 分类条件从已有分类中选择
+        self.remove_btn = QPushButton("删除")
+        self.remove_btn.setFixedWidth(50)
+        
+        layout.addWidget(self.field_combo)
+        layout.addWidget(self.op_combo)
+        layout.addWidget(self.value_input, 1)
+        layout.addWidget(self.value_combo, 1)
+        layout.addWidget(self.remove_btn)
+        
+        self.field_combo.currentIndexChanged.connect(self.on_field_changed)
+        if condition:
+            self.field_combo.setCurrentIndex(self.field_combo.findData(condition['field']))
+        self.on_field_changed()
+        if condition:
+            self.op_combo.setCurrentIndex(max(self.op_combo.findData(condition['op']), 0))
+            if FIELDS[condition['field']][1] == 'category':
+                self.value_combo.setCurrentText(condition.get('value', ''))
+            else:
+                self.value_input.setText(str(condition.get('value', '')))
+                
+    def on_field_changed(self):
+        """按字段类型切换比较方式和值的输入方式"""
+        kind = FIELDS[self.field_combo.currentData()][1]
+        self.op_combo.clear()
+        for op, label in OPERATORS[kind]:
+            self.op_combo.addItem(label, op)
+        if kind == 'category':
+            self.value_combo.clear()
+            self.value_combo.addItems(self.categories)
+        self.value_combo.setVisible(kind == 'category')
+        self.value_input.setVisible(kind not in ('category', 'flag'))
+        self.value_input.setPlaceholderText({'days': "天数", 'number': "数值"}.get(kind, ""))
+        
+    def condition(self):
+        field = self.field_combo.currentData()
+        kind = FIELDS[field][1]
+        if kind == 'category':
+            value = self.value_combo.currentText()
+        elif kind == 'flag':
+            value = ''
+        else:
+            value = self.value_input.text().strip()
+        return {'field': field, 'op': self.op_combo.currentData(), 'value': value}
+
+class SmartPlaylistDialog(QDialog):
+    """新建或编辑智能播放列表"""
+    
+    def __init__(self, categories, playlist=None, parent=None):
+        super().__init__(parent)
+        self.categories = list(categories)
+        self.rows = []
+        self.setWindowTitle("编辑智能播放列表" if playlist else "新建智能播放列表")
+        self.resize(560, 320)
+        
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.name_input = QLineEdit(playlist.name if playlist else "")
+        self.match_combo = QComboBox()
+        self.match_combo.addItem("满足所有条件", True)
+        self.match_combo.addItem("满足任一条件", False)
+        if playlist and not playlist.match_all:
+            self.match_combo.setCurrentIndex(1)
+        form.addRow("名称:", self.name_input)
+        form.addRow("匹配:", self.match_combo)
+        layout.addLayout(form)
+        
+        self.rows_layout = QVBoxLayout()
+        layout.addLayout(self.rows_layout)
+        for condition in (playlist.conditions if playlist else [None]):
+            self.add_row(condition)
+            
+        add_btn = QPushButton("添加条件")
+        add_btn.clicked.connect(lambda: self.add_row())
+        layout.addWidget(add_btn)
+        layout.addStretch()
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        
+    def add_row(self, condition=None):
+        row = ConditionRow(self.categories, condition, self)
+        row.remove_btn.clicked.connect(lambda: self.remove_row(row))
+        self.rows_layout.addWidget(row)
+        self.rows.append(row)
+        
+    def remove_row(self, row):
+        self.rows.remove(row)
+        row.deleteLater()
+        
+    def accept(self):
+        if not self.name_input.text().strip():
+            QMessageBox.warning(self, "警告", "请输入播放列表名称")
+            return
+        super().accept()
+        
+    def playlist(self):
+        """对话框中编辑的播放列表"""
+        return SmartPlaylist(self.name_input.text().strip(),
+                             [row.condition() for row in self.rows],
+                             self.match_combo.currentData())
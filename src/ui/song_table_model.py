@@ -0,0 +1,412 @@
+from collections import OrderedDict
+from pathlib import Path
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QPixmap, QColor
+
+class SongTableModel(QAbstractTableModel):
+    """音乐库列表模型
+
+    只为可见行提供数据，勾选状态保存在模型里的有序集合中，
+    全选、计数都不需要遍历列表控件。封面缩略图也只在行可见时才请求加载。
+    """
+    checked_count_changed = pyqtSignal(int)
+    
+    HEADERS = ["选择", "歌曲名", "歌手", "风格", "时长", "大小", "路径"]
+    COLUMN_CHECK, COLUMN_TITLE, COLUMN_ARTIST, COLUMN_GENRE, \
+        COLUMN_DURATION, COLUMN_SIZE, COLUMN_PATH = range(7)
+        
+    # 内存中最多保留的缩略图数量
+    MAX_THUMBNAILS = 500
+    
+    # 查重结果中相邻分组交替使用的背景色
+    GROUP_COLORS = (QColor(255, 243, 224), QColor(227, 242, 253))
+    # 损坏文件的文字颜色
+    BROKEN_COLOR = QColor(211, 47, 47)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._songs = []        # 全部歌曲
+        self._by_path = {}      # 路径 -> 歌曲信息
+        self._view = []         # 当前显示的歌曲（过滤后）
+        self._row_of = None     # 路径 -> 行号，按需重建
+        self._filter = None     # 允许显示的路径集合，None表示不过滤
+        self._checked = {}      # 已勾选的路径（dict保持勾选顺序）
+        self._thumbnails = OrderedDict()  # 路径 -> QPixmap（没有封面为None）
+        self._thumbnail_loader = None
+        self._group_of = {}     # 查重结果：路径 -> 分组序号
+        self._problems = {}     # 完整性检查发现问题的文件：路径 -> 问题描述
+        
+    # ---- Qt模型接口 ----
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._view)
+        
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+        
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+        
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == self.COLUMN_CHECK:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+        
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+            
+        track = self._view[index.row()]
+        column = index.column()
+        
+        if role == Qt.CheckStateRole and column == self.COLUMN_CHECK:
+            return Qt.Checked if track.path in self._checked else Qt.Unchecked
+            
+        if role == Qt.DecorationRole and column == self.COLUMN_TITLE:
+            return self._thumbnail(track.path)
+            
+        if role == Qt.BackgroundRole and self._group_of:
+            group = self._group_of.get(track.path)
+            if group is not None:
+                return self.GROUP_COLORS[group % len(self.GROUP_COLORS)]
+            
+        if track.path in self._problems:
+            if role == Qt.ForegroundRole:
+                return self.BROKEN_COLOR
+            if role == Qt.ToolTipRole and column == self.COLUMN_TITLE:
+                return f"{track.title}\n文件损坏: {self._problems[track.path]}"
+                
+        # 只在显示时格式化时长和大小
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            if column == self.COLUMN_TITLE:
+                return track.title
+            if column == self.COLUMN_ARTIST:
+                return track.display_artist
+            if column == self.COLUMN_GENRE:
+                return track.display_genre
+            if column == self.COLUMN_DURATION:
+                return track.display_duration
+            if column == self.COLUMN_SIZE:
+                return track.display_size
+            if column == self.COLUMN_PATH:
+                return track.path
+                
+        if role == Qt.TextAlignmentRole and column in (self.COLUMN_DURATION, self.COLUMN_SIZE):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+            
+        return None
+        
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.CheckStateRole:
+            return False
+        if index.column() != self.COLUMN_CHECK:
+            return False
+            
+        path = self._view[index.row()].path
+        if value == Qt.Checked:
+            self._checked[path] = None
+        else:
+            self._checked.pop(path, None)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        self.checked_count_changed.emit(len(self._checked))
+        return True
+        
+    # ---- 歌曲增删改 ----
+    
+    def clear(self):
+        """清空模型"""
+        self.beginResetModel()
+        self._songs = []
+        self._by_path = {}
+        self._view = []
+        self._row_of = None
+        self._checked.clear()
+        self._thumbnails.clear()
+        self._group_of = {}
+        self._problems = {}
+        self.endResetModel()
+        self.checked_count_changed.emit(0)
+        
+    def add_song(self, track):
+        """添加歌曲，已存在时更新，返回模型中保存的记录"""
+        existing = self._by_path.get(track.path)
+        if existing is not None:
+            existing.update(track)
+            row = self.row_of(track.path)
+            if row is not None:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+            return existing
+            
+        self._songs.append(track)
+        self._by_path[track.path] = track
+        if self._accepts(track):
+            row = len(self._view)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._view.append(track)
+            if self._row_of is not None:
+                self._row_of[track.path] = row
+            self.endInsertRows()
+        return track
+        
+    def add_songs(self, songs):
+        """批量添加新歌曲（一次插入通知），返回模型中保存的记录"""
+        new_songs = []
+        stored = []
+        for track in songs:
+            if track.path in self._by_path:
+                stored.append(self.add_song(track))
+                continue
+            self._by_path[track.path] = track
+            new_songs.append(track)
+            stored.append(track)
+            
+        self._songs.extend(new_songs)
+        visible = [s for s in new_songs if self._accepts(s)]
+        if visible:
+            first = len(self._view)
+            self.beginInsertRows(QModelIndex(), first, first + len(visible) - 1)
+            self._view.extend(visible)
+            self._row_of = None
+            self.endInsertRows()
+        return stored
+        
+    def remove_songs(self, paths):
+        """批量移除歌曲"""
+        paths = {str(p) for p in paths}
+        if not paths:
+            return
+            
+        rows = sorted((row for row in map(self.row_of, paths) if row is not None), reverse=True)
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._view[row]
+            self.endRemoveRows()
+        if rows:
+            self._row_of = None
+            
+        self._songs = [s for s in self._songs if s.path not in paths]
+        for path in paths:
+            self._by_path.pop(path, None)
+            self._thumbnails.pop(path, None)
+            self._group_of.pop(path, None)
+            self._problems.pop(path, None)
+            
+        unchecked = [p for p in paths if p in self._checked]
+        for path in unchecked:
+            del self._checked[path]
+        if unchecked:
+            self.checked_count_changed.emit(len(self._checked))
+            
+    def rename_song(self, old_path, new_path):
+        """更新歌曲路径"""
+        old_path, new_path = str(old_path), str(new_path)
+        track = self._by_path.pop(old_path, None)
+        if track is None:
+            return
+            
+        row = self.row_of(old_path)
+        track.path = new_path
+        self._by_path[new_path] = track
+        if self._filter is not None and old_path in self._filter:
+            self._filter.add(new_path)
+        if self._row_of is not None and row is not None:
+            del self._row_of[old_path]
+            self._row_of[new_path] = row
+        if old_path in self._checked:
+            del self._checked[old_path]
+            self._checked[new_path] = None
+        if old_path in self._thumbnails:
+            self._thumbnails[new_path] = self._thumbnails.pop(old_path)
+        if old_path in self._group_of:
+            self._group_of[new_path] = self._group_of.pop(old_path)
+        if old_path in self._problems:
+            self._problems[new_path] = self._problems.pop(old_path)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+            
+    def song(self, path):
+        """按路径获取歌曲记录"""
+        return self._by_path.get(str(path))
+        
+    def song_at(self, row):
+        """获取某一行的歌曲记录"""
+        return self._view[row]
+        
+    def tracks(self):
+        """当前显示的歌曲（按显示顺序）"""
+        return iter(self._view)
+        
+    def row_of(self, path):
+        """获取路径所在行，不可见时返回None"""
+        if self._row_of is None:
+            self._row_of = {track.path: row for row, track in enumerate(self._view)}
+        return self._row_of.get(str(path))
+        
+    # ---- 封面缩略图 ----
+    
+    def set_thumbnail_loader(self, loader):
+        """设置缩略图加载器（ThumbnailLoader），歌曲名列显示封面"""
+        self._thumbnail_loader = loader
+        loader.loaded.connect(self._on_thumbnail_loaded)
+        
+    def drop_thumbnail(self, path):
+        """丢弃缩略图，下次显示时重新加载"""
+        self._thumbnails.pop(str(path), None)
+        
+    def _thumbnail(self, path):
+        """获取缩略图，没有加载过时请求后台加载"""
+        if path in self._thumbnails:
+            self._thumbnails.move_to_end(path)
+            return self._thumbnails[path]
+        if self._thumbnail_loader is not None:
+            self._thumbnail_loader.request(path)
+        return None
+        
+    def _on_thumbnail_loaded(self, path, image):
+        """缩略图加载完成（QPixmap只能在界面线程创建）"""
+        if path not in self._by_path:
+            return
+        self._thumbnails[path] = None if image.isNull() else QPixmap.fromImage(image)
+        while len(self._thumbnails) > self.MAX_THUMBNAILS:
+            self._thumbnails.popitem(last=False)
+            
+        row = self.row_of(path)
+        if row is not None and not image.isNull():
+            index = self.index(row, self.COLUMN_TITLE)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+            
+    # ---- 完整性检查 ----
+    
+    def set_problems(self, problems):
+        """标出损坏的文件（路径 -> 问题描述），文字显示为红色"""
+        changed = set(self._problems) | set(problems)
+        self._problems = {str(path): problem for path, problem in problems.items()}
+        self._refresh_rows(changed)
+        
+    def clear_problem(self, path):
+        """文件修改后取消标记，等待重新检查"""
+        if self._problems.pop(str(path), None) is not None:
+            self._refresh_rows([str(path)])
+            
+    def problem(self, path):
+        """文件的问题描述，正常时返回None"""
+        return self._problems.get(str(path))
+        
+    def _refresh_rows(self, paths):
+        for path in paths:
+            row = self.row_of(path)
+            if row is not None:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+            
+    # ---- 排序 ----
+    
+    SORT_KEYS = {
+        COLUMN_CHECK: None,
+        COLUMN_TITLE: lambda t: t.title.casefold(),
+        COLUMN_ARTIST: lambda t: t.artist.casefold(),
+        COLUMN_GENRE: lambda t: t.genre.casefold(),
+        COLUMN_DURATION: lambda t: t.duration,
+        COLUMN_SIZE: lambda t: t.size,
+        COLUMN_PATH: lambda t: t.path,
+    }
+    
+    def sort(self, column, order=Qt.AscendingOrder):
+        """按原始数值排序（大小按字节、时长按秒）"""
+        key = self.SORT_KEYS.get(column)
+        if key is None:
+            return
+            
+        reverse = order == Qt.DescendingOrder
+        
+        self.layoutAboutToBeChanged.emit()
+        old_persistent = self.persistentIndexList()
+        old_paths = [(self._view[index.row()].path, index.column()) for index in old_persistent]
+        
+        self._songs.sort(key=key, reverse=reverse)
+        self._view.sort(key=key, reverse=reverse)
+        self._row_of = None
+        
+        new_persistent = []
+        for path, column in old_paths:
+            row = self.row_of(path)
+            new_persistent.append(self.index(row, column) if row is not None else QModelIndex())
+        self.changePersistentIndexList(old_persistent, new_persistent)
+        self.layoutChanged.emit()
+        
+    # ---- 过滤 ----
+    
+    def set_filter(self, paths):
+        """只显示给定路径集合中的歌曲，None表示显示全部"""
+        if paths is not None and not isinstance(paths, (set, frozenset)):
+            paths = {str(p) for p in paths}
+            
+        # 新的过滤条件更严格时，只需在当前显示的行中筛选
+        if paths is None:
+            source = self._songs
+        elif self._filter is not None and len(paths) <= len(self._filter) and paths <= self._filter:
+            source = self._view
+        else:
+            source = self._songs
+            
+        self.beginResetModel()
+        self._filter = paths
+        self._group_of = {}
+        if paths is None:
+            self._view = list(source)
+        else:
+            self._view = [s for s in source if s.path in paths]
+        self._row_of = None
+        self.endResetModel()
+        
+    def set_groups(self, groups):
+        """只显示查重结果，同一组的歌曲排在一起并用相同背景色标出"""
+        self.beginResetModel()
+        self._group_of = {}
+        self._view = []
+        for group, paths in enumerate(groups):
+            for path in paths:
+                track = self._by_path.get(str(path))
+                if track is not None:
+                    self._group_of[track.path] = group
+                    self._view.append(track)
+        self._filter = set(self._group_of)
+        self._row_of = None
+        self.endResetModel()
+        
+    def _accepts(self, track):
+        return self._filter is None or track.path in self._filter
+        
+    # ---- 勾选 ----
+    
+    def checked_count(self):
+        """已勾选数量"""
+        return len(self._checked)
+        
+    def checked_paths(self):
+        """已勾选的歌曲路径"""
+        return [Path(p) for p in self._checked]
+        
+    def set_all_checked(self, checked=True):
+        """勾选或取消勾选当前显示的全部歌曲"""
+        if not self._view:
+            return
+        if checked:
+            self._checked.update(dict.fromkeys(s.path for s in self._view))
+        else:
+            for track in self._view:
+                self._checked.pop(track.path, None)
+        self.dataChanged.emit(
+            self.index(0, self.COLUMN_CHECK),
+            self.index(len(self._view) - 1, self.COLUMN_CHECK),
+            [Qt.CheckStateRole]
+        )
+        self.checked_count_changed.emit(len(self._checked))
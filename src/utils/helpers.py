@@ -59,3 +59,13 @@ def get_unique_filename(file_path):
         if not new_path.exists():
             return new_path
         counter += 1
+
+# B站视频链接（包括手机版和b23.tv短链接）
+BILIBILI_URL_PATTERN = re.compile(
+    r'https?://(?:(?:www\.|m\.)?bilibili\.com/video/|(?:www\.)?b23\.tv/)[A-Za-z0-9]+',
+    re.IGNORECASE
+)
+
+def validate_url(url):
+    """检查是否是B站视频链接（只检查格式，不需要导入下载模块）"""
+    return BILIBILI_URL_PATTERN.match(url) is not None
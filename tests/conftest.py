@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 与程序运行时一样从src导入（from core.xxx import ...）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
@@ -0,0 +1,120 @@
+import pytest
+from PyQt5.QtCore import QCoreApplication, QObject, pyqtSignal
+
+from core.download_queue import DownloadQueue, RUNNING
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+class FakeThread(QObject):
+    """代替下载线程：start时只记录开始的顺序"""
+    video_info = pyqtSignal(object, dict)
+    progress = pyqtSignal(object, int)
+    partial_file = pyqtSignal(object, str)
+    status = pyqtSignal(object, str)
+    finished = pyqtSignal(object, str)
+    error = pyqtSignal(object, str)
+    done = pyqtSignal(object)
+    
+    def __init__(self, job, started):
+        super().__init__()
+        self.job = job
+        self.started = started
+        
+    def start(self):
+        self.started.append(self.job.url)
+        
+    def stop(self):
+        pass
+        
+    def wait(self, timeout=None):
+        return True
+
+class FakeResolver(QObject):
+    """代替视频信息解析线程，由测试发出解析结果"""
+    resolved = pyqtSignal(str, dict)
+    failed = pyqtSignal(str, str)
+    finished = pyqtSignal()
+    
+    def __init__(self, urls):
+        super().__init__()
+        self.urls = urls
+        
+    def start(self):
+        pass
+        
+    def stop(self):
+        pass
+        
+    def wait(self, timeout=None):
+        return True
+
+def make_queue(policy='fifo', concurrent=1):
+    started = []
+    resolvers = []
+    
+    def create_resolver(urls):
+        resolvers.append(FakeResolver(urls))
+        return resolvers[-1]
+        
+    queue = DownloadQueue(lambda job: FakeThread(job, started), resolver_factory=create_resolver)
+    queue.MAX_CONCURRENT = concurrent
+    queue.set_policy(policy)
+    return queue, started, resolvers
+
+def test_shortest_first_waits_for_the_whole_resolve_batch():
+    queue, started, resolvers = make_queue('shortest')
+    queue.add_many(['concert', 'song'], '/tmp')
+    resolver, = resolvers
+    
+    # 最先解析到的是3小时的演唱会，一批还没解析完，不开始
+    resolver.resolved.emit('concert', {'duration_seconds': 3 * 3600})
+    assert started == []
+    resolver.resolved.emit('song', {'duration_seconds': 200})
+    assert started == []
+    
+    resolver.finished.emit()
+    assert started == ['song']
+
+def test_unpinned_jobs_start_after_the_grace_period(monkeypatch):
+    monkeypatch.setattr(DownloadQueue, 'RESOLVE_GRACE_MS', 0)
+    queue, started, resolvers = make_queue('shortest')
+    queue.add_many(['slow', 'resolved'], '/tmp')
+    resolvers[0].resolved.emit('resolved', {'duration_seconds': 600})
+    assert started == []
+    
+    app.processEvents()
+    assert started == ['resolved']
+
+def test_pinned_jobs_start_while_resolving():
+    queue, started, resolvers = make_queue('shortest')
+    jobs = queue.add_many(['a', 'b'], '/tmp')
+    queue.pin([jobs[1]])
+    
+    assert started == ['b']
+    assert jobs[1].state == RUNNING
+
+def test_move_reorders_positions():
+    queue, started, _ = make_queue(concurrent=0)
+    a, b, c, d = queue.add_many(['a', 'b', 'c', 'd'], '/tmp')
+    
+    queue.move([c, d], 'top')
+    assert queue.jobs == [c, d, a, b]
+    queue.move([a], 'up')
+    assert queue.jobs == [c, a, d, b]
+    queue.move([c], 'bottom')
+    assert queue.jobs == [a, d, b, c]
+    queue.move([a, d], 'down')
+    assert queue.jobs == [b, a, d, c]
+    assert [job.position for job in queue.jobs] == [1, 2, 3, 4]
+    with pytest.raises(Exception):
+        queue.move([a], 'sideways')
+
+def test_moved_and_pinned_jobs_start_first():
+    queue, started, _ = make_queue(concurrent=0)
+    a, b, c = queue.add_many(['a', 'b', 'c'], '/tmp')
+    queue.move([b], 'top')
+    queue.pin([c])
+    
+    queue.MAX_CONCURRENT = 2
+    queue.schedule()
+    assert started == ['c', 'b']
@@ -0,0 +1,44 @@
+from core.download_queue import DownloadJob
+from core.download_scheduler import get_policy
+
+def make_jobs(*specs):
+    """specs为 (UP主, 时长)，按顺序分配position"""
+    jobs = []
+    for position, (uploader, duration) in enumerate(specs, 1):
+        job = DownloadJob(f'https://www.bilibili.com/video/BV{position}', '/tmp')
+        job.position = position
+        job.uploader = uploader
+        job.duration = duration
+        jobs.append(job)
+    return jobs
+
+def positions(jobs):
+    return [job.position for job in jobs]
+
+def test_pinned_jobs_come_first_in_manual_order():
+    jobs = make_jobs(('a', 10), ('a', 20), ('a', 30))
+    jobs[2].pinned = True
+    jobs[1].pinned = True
+    
+    assert positions(get_policy('fifo').select(jobs, {}, 2)) == [2, 3]
+    assert positions(get_policy('fifo').select(jobs, {}, 3)) == [2, 3, 1]
+
+def test_shortest_first_puts_unknown_durations_last():
+    jobs = make_jobs(('a', 300), ('a', None), ('a', 60), ('a', 60))
+    
+    assert positions(get_policy('shortest').select(jobs, {}, 4)) == [3, 4, 1, 2]
+
+def test_priority_policy_keeps_order_within_a_priority():
+    jobs = make_jobs(('a', 1), ('a', 1), ('a', 1))
+    jobs[2].priority = 1
+    
+    assert positions(get_policy('priority').select(jobs, {}, 3)) == [3, 1, 2]
+
+def test_fair_share_alternates_uploaders_and_counts_served_jobs():
+    jobs = make_jobs(('a', 1), ('a', 1), ('a', 1), ('b', 1), ('c', 1))
+    fair = get_policy('fair')
+    
+    assert positions(fair.select(jobs, {}, 5)) == [1, 4, 5, 2, 3]
+    # a已经开始了两个任务，b和c先轮到
+    assert positions(fair.select(jobs, {'a': 2}, 3)) == [4, 5, 1]
+    assert positions(fair.select(jobs, {'a': 2}, 1)) == [4]
@@ -0,0 +1,32 @@
+import numpy as np
+
+from core import fingerprint
+from core.fingerprint import FingerprintIndex
+
+def random_track(rng, count=400):
+    hashes = rng.integers(0, 1 << fingerprint.HASH_BITS, count, dtype=np.uint32)
+    times = np.sort(rng.integers(0, 5000, count)).astype(np.uint16)
+    return hashes, times
+
+def test_tracks_sharing_hashes_at_one_offset_are_grouped(monkeypatch):
+    # 每段只有很少的条目，强制分多段投票
+    monkeypatch.setattr(fingerprint, 'VOTE_CHUNK', 500)
+    rng = np.random.default_rng(1)
+    index = FingerprintIndex()
+    for i in range(30):
+        index.add(f'/music/{i}.mp3', (0, 0), *random_track(rng))
+    # 第25首是第3首的一部分，时间整体偏移了40帧
+    hashes, times = index.get('/music/3.mp3', (0, 0))
+    index.add('/music/25.mp3', (0, 0), hashes[100:300].copy(), times[100:300] + 40)
+    
+    assert index.find_duplicates() == [['/music/3.mp3', '/music/25.mp3']]
+
+def test_shared_hashes_at_scattered_offsets_are_not_grouped():
+    rng = np.random.default_rng(2)
+    index = FingerprintIndex()
+    hashes, times = random_track(rng)
+    index.add('/music/a.mp3', (0, 0), hashes, times)
+    # 哈希相同但时间偏移各不相同
+    index.add('/music/b.mp3', (0, 0), hashes.copy(), rng.integers(0, 5000, len(hashes)).astype(np.uint16))
+    
+    assert index.find_duplicates() == []
@@ -0,0 +1,11 @@
+from utils.helpers import validate_url
+
+def test_validate_url_accepts_bilibili_video_links_only():
+    assert validate_url('https://www.bilibili.com/video/BV1fx411y7fU')
+    assert validate_url('http://bilibili.com/video/av170001')
+    assert validate_url('https://m.bilibili.com/video/BV1GJ411x7h7')
+    assert validate_url('https://b23.tv/BV1GJ411x7h7')
+    assert validate_url('HTTPS://WWW.BILIBILI.COM/VIDEO/BV1fx411y7fU')
+    assert not validate_url('https://www.bilibili.com/bangumi/play/ep1')
+    assert not validate_url('https://www.youtube.com/watch?v=x')
+    assert not validate_url('bilibili.com/video/BV1fx411y7fU')
@@ -0,0 +1,47 @@
+from pathlib import Path
+from PyQt5.QtCore import QCoreApplication
+
+from core import library_watcher
+from core.library_watcher import LibraryWatcher, scan_tree
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+def watch(root):
+    watcher = LibraryWatcher()
+    watcher.adopt(str(root), *scan_tree(str(root)))
+    deltas = []
+    watcher.changed.connect(deltas.append)
+    return watcher, deltas
+
+def rescan(watcher, root):
+    watcher.on_directory_changed(str(root))
+    watcher.flush()
+    watcher.stop()
+    
+def test_rename_is_paired_by_inode(tmp_path):
+    (tmp_path / 'a.mp3').write_bytes(b'same size')
+    watcher, deltas = watch(tmp_path)
+    (tmp_path / 'a.mp3').rename(tmp_path / 'b.mp3')
+    rescan(watcher, tmp_path)
+    
+    assert [(d.renamed, d.added, d.removed) for d in deltas] == [
+        ([(tmp_path / 'a.mp3', tmp_path / 'b.mp3')], [], [])]
+        
+def test_no_rename_pairing_without_inodes(tmp_path, monkeypatch):
+    # Windows上DirEntry.stat()的st_ino总是0
+    scan_dir = library_watcher.scan_dir
+    def scan_dir_without_inodes(directory):
+        files, subdirs = scan_dir(directory)
+        if files is not None:
+            files = {name: (size, mtime, 0) for name, (size, mtime, _) in files.items()}
+        return files, subdirs
+    monkeypatch.setattr(library_watcher, 'scan_dir', scan_dir_without_inodes)
+    
+    (tmp_path / 'a.mp3').write_bytes(b'same size')
+    watcher, deltas = watch(tmp_path)
+    (tmp_path / 'a.mp3').unlink()
+    (tmp_path / 'other.mp3').write_bytes(b'SAME SIZE')
+    rescan(watcher, tmp_path)
+    
+    assert [(d.renamed, d.added, d.removed) for d in deltas] == [
+        ([], [tmp_path / 'other.mp3'], [tmp_path / 'a.mp3'])]
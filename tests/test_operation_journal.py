@@ -0,0 +1,94 @@
+from core.file_operations import BatchExecutor, FileOperation
+from core.operation_journal import BatchJournal, pending_journals, rollback, replay
+
+def make_library(tmp_path):
+    library = tmp_path / 'library'
+    library.mkdir()
+    (library / 'a.mp3').write_bytes(b'audio a')
+    (library / 'a.lrc').write_bytes(b'lyrics a')
+    (library / 'c.mp3').write_bytes(b'audio c')
+    return library
+
+def run_batch(library, journal_dir, operations):
+    journal = BatchJournal.create('test', library, journal_dir)
+    delta, failures = BatchExecutor(operations, library, journal).run()
+    assert not failures
+    return BatchJournal.load(journal.path)
+
+def test_rollback_restores_renamed_and_deleted_files(tmp_path):
+    library = make_library(tmp_path)
+    journal = run_batch(library, tmp_path / 'journal', [
+        FileOperation.rename(library / 'a.mp3', library / 'b.mp3'),
+        FileOperation.delete(library / 'c.mp3'),
+    ])
+    assert not (library / 'a.mp3').exists() and not (library / 'c.mp3').exists()
+    assert (library / 'b.lrc').read_bytes() == b'lyrics a'
+    
+    delta, failures = rollback(journal)
+    
+    assert not failures
+    assert (library / 'a.mp3').read_bytes() == b'audio a'
+    assert (library / 'a.lrc').read_bytes() == b'lyrics a'
+    assert (library / 'c.mp3').read_bytes() == b'audio c'
+    assert not (library / 'b.mp3').exists() and not (library / 'b.lrc').exists()
+    assert (library / 'b.mp3', library / 'a.mp3') in delta.renamed
+    assert library / 'c.mp3' in delta.added
+    assert BatchJournal.load(journal.path).rolled_back
+
+def test_rollback_keeps_both_files_when_original_name_reused(tmp_path):
+    library = make_library(tmp_path)
+    journal = run_batch(library, tmp_path / 'journal', [
+        FileOperation.rename(library / 'a.mp3', library / 'b.mp3'),
+    ])
+    (library / 'a.mp3').write_bytes(b'new audio')
+    
+    delta, failures = rollback(journal)
+    
+    assert len(failures) == 1
+    assert (library / 'a.mp3').read_bytes() == b'new audio'
+    assert (library / 'b.mp3').read_bytes() == b'audio a'
+    assert (library / 'b.lrc').read_bytes() == b'lyrics a'
+    assert not delta.renamed
+
+def test_replay_finishes_interrupted_batch(tmp_path):
+    library = make_library(tmp_path)
+    journal_dir = tmp_path / 'journal'
+    first = FileOperation.rename(library / 'a.mp3', library / 'b.mp3')
+    second = FileOperation.rename(library / 'c.mp3', library / 'd.mp3')
+    
+    # 模拟崩溃：两个操作都已记录，只有第一个完成，第二个复制到一半
+    journal = BatchJournal.create('test', library, journal_dir)
+    journal.begin(0, first, [(library / 'a.lrc', library / 'b.lrc')])
+    journal.begin(1, second, [])
+    (library / 'a.lrc').rename(library / 'b.lrc')
+    (library / 'a.mp3').rename(library / 'b.mp3')
+    journal.done(0)
+    (library / 'd.mp3').write_bytes(b'aud')
+    journal.close()
+    
+    pending = pending_journals(journal_dir)
+    assert [j.path for j in pending] == [journal.path]
+    
+    delta, failures = replay(pending[0])
+    
+    assert not failures
+    assert (library / 'b.mp3').read_bytes() == b'audio a'
+    assert (library / 'b.lrc').read_bytes() == b'lyrics a'
+    assert (library / 'd.mp3').read_bytes() == b'audio c'
+    assert not (library / 'c.mp3').exists()
+    assert set(delta.renamed) == {(library / 'a.mp3', library / 'b.mp3'), (library / 'c.mp3', library / 'd.mp3')}
+    assert not pending_journals(journal_dir)
+
+def test_rollback_of_interrupted_batch_discards_partial_copy(tmp_path):
+    library = make_library(tmp_path)
+    journal = BatchJournal.create('test', library, tmp_path / 'journal')
+    journal.begin(0, FileOperation.rename(library / 'c.mp3', library / 'd.mp3'), [])
+    (library / 'd.mp3').write_bytes(b'aud')
+    journal.close()
+    
+    delta, failures = rollback(BatchJournal.load(journal.path))
+    
+    assert not failures
+    assert (library / 'c.mp3').read_bytes() == b'audio c'
+    assert not (library / 'd.mp3').exists()
+    assert not delta.renamed
@@ -0,0 +1,28 @@
+from core.search_index import SearchIndex
+from core.track import Track
+
+def test_search_skips_removed_songs():
+    index = SearchIndex()
+    index.build([Track('/music/晴天.mp3', title='晴天', artist='周杰伦'),
+                 Track('/music/rain.mp3', title='rainy day', artist='someone')])
+    index.index_pending(10)
+    
+    index.remove('/music/晴天.mp3')
+    index.add(Track('/music/晴天 (live).mp3', title='晴天', artist='周杰伦'))
+    
+    assert index.search('晴') == {'/music/晴天 (live).mp3'}
+    assert index.search('rai') == {'/music/rain.mp3'}
+    index.remove('/music/rain.mp3')
+    assert index.search('rai') == set()
+    
+def test_short_terms_match_token_prefixes_with_or_without_other_terms():
+    index = SearchIndex()
+    index.build([Track('/music/1.mp3', title='Cab Song'),
+                 Track('/music/2.mp3', title='Abba Song'),
+                 Track('/music/3.mp3', title='rehab')])
+    
+    assert index.search('ab') == {'/music/2.mp3'}
+    assert index.search('ab song') == {'/music/2.mp3'}
+    assert index.search('song ab') == {'/music/2.mp3'}
+    # 三个字符以上按子串匹配
+    assert index.search('hab') == {'/music/3.mp3'}
@@ -0,0 +1,72 @@
+import time
+
+from core.library_index import LibraryIndex, LibraryDelta
+from core.smart_playlists import SmartPlaylists, SmartPlaylist
+from core.track import Track
+
+RECENT = SmartPlaylist('最近添加', [{'field': 'added', 'op': 'within', 'value': '7'}])
+
+def make_playlists(tmp_path, tracks):
+    library = LibraryIndex()
+    for track in tracks:
+        library.add(track)
+    playlists = SmartPlaylists(library, db_path=tmp_path / 'library.db')
+    playlists.save(SmartPlaylist(RECENT.name, RECENT.conditions))
+    return library, playlists
+
+def test_recently_added_uses_first_seen_time_not_mtime(tmp_path):
+    old = time.time() - 365 * 86400
+    library, playlists = make_playlists(tmp_path, [Track('/music/old.mp3', mtime=old)])
+    playlists.rebuild('/music')
+    # 已有的歌曲按修改时间估计
+    assert playlists.members(RECENT.name) == set()
+    
+    # 重新写标签：修改时间变新，但不是新加入的歌曲
+    library.get('/music/old.mp3').mtime = time.time()
+    playlists.apply_delta(LibraryDelta(modified=['/music/old.mp3']))
+    assert playlists.members(RECENT.name) == set()
+    
+    # 硬链接导入的文件保留原文件的修改时间，仍然算作刚加入
+    library.add(Track('/music/imported.mp3', mtime=old))
+    playlists.apply_delta(LibraryDelta(added=['/music/imported.mp3']))
+    assert playlists.members(RECENT.name) == {'/music/imported.mp3'}
+    
+def test_added_time_survives_rename_and_restart(tmp_path):
+    old = time.time() - 365 * 86400
+    library, playlists = make_playlists(tmp_path, [Track('/music/a.mp3', mtime=old)])
+    playlists.rebuild('/music')
+    library.add(Track('/music/new.mp3', mtime=old))
+    playlists.apply_delta(LibraryDelta(added=['/music/new.mp3']))
+    
+    library.rename('/music/new.mp3', '/music/renamed.mp3')
+    library.rename('/music/a.mp3', '/music/b.mp3')
+    playlists.apply_delta(LibraryDelta(renamed=[('/music/new.mp3', '/music/renamed.mp3'),
+                                                ('/music/a.mp3', '/music/b.mp3')]))
+    assert playlists.members(RECENT.name) == {'/music/renamed.mp3'}
+    playlists.close()
+    
+    reopened = SmartPlaylists(library, db_path=tmp_path / 'library.db')
+    reopened.rebuild('/music')
+    assert reopened.members(RECENT.name) == {'/music/renamed.mp3'}
+    assert reopened.added_time('/music/b.mp3') == old
+    assert reopened.added_time('/music/a.mp3') is None
+    
+def test_switching_library_roots_keeps_added_times(tmp_path):
+    old = time.time() - 365 * 86400
+    library, playlists = make_playlists(tmp_path, [Track('/music/a.mp3', mtime=old)])
+    playlists.rebuild('/music')
+    
+    # 切换到另一个目录：快照和完整扫描中的歌曲按修改时间估计，不算作刚加入
+    library.clear()
+    library.add(Track('/other/b.mp3', mtime=old))
+    playlists.rebuild('/other')
+    library.add(Track('/other/c.mp3', mtime=old))
+    playlists.apply_delta(LibraryDelta(added=['/other/c.mp3']), scanned=True)
+    assert playlists.members(RECENT.name) == set()
+    # 另一个目录的记录没有被清理
+    assert playlists.added_time('/music/a.mp3') == old
+    
+    # 目录监视发现的新文件记为当前时间
+    library.add(Track('/other/d.mp3', mtime=old))
+    playlists.apply_delta(LibraryDelta(added=['/other/d.mp3']))
+    assert playlists.members(RECENT.name) == {'/other/d.mp3'}
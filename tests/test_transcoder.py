@@ -0,0 +1,39 @@
+from PyQt5.QtCore import QCoreApplication
+
+from core import transcoder
+from core.transcoder import TranscodeJob, TranscodeThread, output_dir_problem
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+def test_output_dir_must_be_outside_library_and_sources(tmp_path):
+    library = tmp_path / 'library'
+    (library / 'album').mkdir(parents=True)
+    source = library / 'album' / 'a.mp3'
+    outside = tmp_path / 'outside'
+    
+    assert output_dir_problem(library, library, [source])
+    assert output_dir_problem(library / 'album', library, [source])
+    assert output_dir_problem(tmp_path, library, [source])
+    assert output_dir_problem(outside, library, [source]) is None
+    
+def test_worker_never_overwrites_source(tmp_path, monkeypatch):
+    source = tmp_path / 'a.mp3'
+    source.write_bytes(b'original')
+    monkeypatch.setattr(transcoder, 'TRANSCODE_JOB_FILE', tmp_path / 'job.json')
+    monkeypatch.setattr(transcoder, 'require_ffmpeg', lambda: 'ffmpeg')
+    
+    class Index:
+        def transcoded(self, pairs, preset):
+            return set()
+            
+    # 旧版保存的任务没有检查过输出目录
+    thread = TranscodeThread(TranscodeJob([source], tmp_path, tmp_path, 'mp3'), Index())
+    started = []
+    monkeypatch.setattr(thread, '_transcode', lambda todo: started.extend(todo) or [])
+    results = []
+    thread.finished_job.connect(lambda *args: results.append(args))
+    thread.run()
+    
+    assert started == []
+    assert results == [(0, 0, [(str(source), "输出文件与源文件相同，已跳过")])]
+    assert source.read_bytes() == b'original'